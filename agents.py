@@ -1,9 +1,17 @@
-import re
 import json
 import os
+import asyncio
 import requests
+from collections import namedtuple
 from datetime import datetime
-from utils.wasteking_api import complete_booking, create_booking, get_pricing
+from utils.wasteking_api import complete_booking, create_booking, get_pricing, resume_booking, acquire_booking
+from utils.wasteking_api import remember_price_matrix, price_from_matrix, fetch_comparison_quote, speculative_pricer
+from utils.wasteking_async import async_client
+from utils.conversation_store import MemoryConversationStore
+from utils.keyword_matcher import KeywordMatcher
+from utils.rules_registry import RulesRegistry
+from utils.extraction import Extractor
+from utils.postcodes import postcode_index
 
 # COMPLETE HARDCODED BUSINESS RULES - EVERY SINGLE RULE FROM PDF + NEW RULES
 OFFICE_HOURS = {
@@ -315,13 +323,251 @@ SURCHARGE_ITEMS = {
     'sofas': 15
 }
 
+# NEW: SIZES CUSTOMERS ASK FOR BY NAME - FIRST MATCH WINS
+SIZE_PHRASES = {
+    '8yd': ['8-yard', '8 yard', '8yd', 'eight yard', 'eight-yard'],
+    '6yd': ['6-yard', '6 yard', '6yd'],
+    '4yd': ['4-yard', '4 yard', '4yd'],
+    '12yd': ['12-yard', '12 yard', '12yd']
+}
+
+
+# NEW: SKIP VS MAN & VAN COMPARISON QUOTE (mav_suggestion RULE)
+COMPARISON_TRIGGERS = ['compare', 'quote both', 'both options', 'both prices', 'both quotes', 'skip or man', 'skip or a man', 'skip vs', 'skip versus', 'cheaper option']
+COMPARISON_NAMES = {'skip': 'skip hire', 'mav': 'man & van'}
+
+# SUPPLEMENTS (SPECIAL ITEMS) THAT AFFECT PRICING - PHRASE -> SUPPLEMENT CODE
+SUPPLEMENT_MAPPINGS = {
+    'fridge': 'fridge',
+    'freezer': 'freezer', 
+    'fridges': 'fridge',
+    'freezers': 'freezer',
+    'sofa': 'sofa',
+    'sofas': 'sofa',
+    'mattress': 'mattress',
+    'mattresses': 'mattress',
+    'upholstered furniture': 'upholstered_furniture',
+    'upholstered chair': 'upholstered_furniture',
+    'upholstered chairs': 'upholstered_furniture',
+    'chair': 'chair',  # Will be checked for upholstery context
+    'chairs': 'chairs'  # Will be checked for upholstery context
+}
+
+# SERVICE DETECTION PHRASES - CRITICAL FOR PROPER ROUTING
+SKIP_SERVICE_PHRASES = ['skip', 'skip hire', 'container hire']
+# Man & Van indicators (HOUSE CLEARANCE = MAV, NOT GRAB!) - EXPANDED LIST
+MAV_SERVICE_PHRASES = [
+    'house clearance', 'furniture removal', 'furniture collection', 'house clear',
+    'clearance', 'man and van', 'man & van', 'mav', 'loading service',
+    'furniture', 'wardrobe', 'wardrobes', 'sofa', 'mattress', 'appliances', 'white goods',
+    'office clearance', 'flat clearance', 'garage clear', 'shed clear',
+    'we do the loading', 'you load', 'collection service',
+    'chest of drawers', 'bed', 'table', 'chair', 'bookshelf', 'dresser',
+    'dining table', 'bedroom furniture', 'living room', 'kitchen appliances',
+    'washing machine', 'fridge', 'cooker', 'dishwasher', 'tumble dryer',
+    'remove furniture', 'furniture pick up', 'furniture disposal',
+    'house move', 'moving furniture', 'furniture clearance',
+    'two wardrobes', 'three piece suite'
+]
+# Grab hire indicators (ONLY for soil/rubble/muckaway) - STRICT LIST
+GRAB_SERVICE_PHRASES = [
+    'grab hire', 'grab lorry', 'soil removal', 'rubble removal', 'muckaway', 
+    'dirt removal', 'earth removal', 'excavation waste', 'heavy materials removal',
+    'concrete removal', 'hardcore removal', 'aggregates', 'topsoil removal', 'subsoil',
+    'building rubble', 'demolition waste', 'construction rubble'
+]
+
+# EVERY KEYWORD LIST THE AGENTS CHECK - COMPILED ONCE PER RULE SET, ONE PASS PER MESSAGE FINDS EVERY CATEGORY
+def keyword_tables(rules):
+    return {
+        **{f'size_{size}': phrases for size, phrases in SIZE_PHRASES.items()},
+        'comparison': COMPARISON_TRIGGERS,
+        'director': rules['TRANSFER_RULES']['management_director']['triggers'],
+        'complaint': ['complaint', 'complain', 'unhappy', 'disappointed', 'frustrated', 'angry'],
+        'specialist_service': rules['TRANSFER_RULES']['specialist_services']['services'],
+        'prohibited_skip': rules['PROHIBITED_ITEMS_SKIP'],
+        'soil_heavy': rules['SKIP_SIZE_RULES']['heavy_materials'] + ['tons', 'tonnes'],
+        'info_request': [
+            'what are', 'what is', 'can i put', 'do i need', 'tell me about',
+            'explain', 'how much is', 'what size', 'how large', 'how wide',
+            'what waste can', 'can you take', 'requirements', 'allowance',
+            'prohibited', 'largest', 'smallest', 'information', 'details'
+        ],
+        'supplement': list(SUPPLEMENT_MAPPINGS),
+        'upholstery_context': ['upholstered', 'fabric', 'leather', 'cushioned'],
+        'name_kanchan': ['kanchen', 'kanchan'],
+        'name_jackie': ['jackie'],
+        'service_skip': SKIP_SERVICE_PHRASES,
+        'service_mav': MAV_SERVICE_PHRASES,
+        'service_grab': GRAB_SERVICE_PHRASES,
+        'furniture': ['furniture', 'wardrobe', 'bed', 'sofa', 'table'],
+        'waste': ['plastic', 'brick', 'waste', 'rubbish', 'items', 'normal', 'household', 'soil', 'old', 'furniture', 'clothes', 'books', 'toys', 'cardboard', 'paper', 'bricks', 'brick', 'renovation', 'rubble', 'concrete', 'tiles', 'wardrobe', 'clearance'],
+        'location': [
+            'in the garage', 'in garage', 'garage', 'half a garage',
+            'in the garden', 'garden', 'back garden', 'front garden',
+            'in the house', 'inside', 'indoors', 'house clearance',
+            'outside', 'outdoors', 'on the drive', 'driveway',
+            'easy access', 'easy to access', 'accessible',
+            'ground floor', 'upstairs', 'basement', 'flat', 'apartment'
+        ],
+        # Direct booking requests
+        'booking': [
+            'payment link', 'pay link', 'booking', 'book it', 'book this',
+            'send payment', 'complete booking', 'finish booking', 'proceed with booking',
+            'confirm booking', 'make booking', 'create booking', 'place order',
+            'send me the link', 'i want to book', 'ready to book', 'lets book',
+            'checkout', 'complete order', 'finalize booking', 'secure booking',
+            'reserve this', 'confirm this', 'i\'ll take it', 'that works',
+            'perfect', 'sounds good', 'thats fine', 'arrange this',
+            'wants to book', 'please send payment'
+        ],
+        # Positive responses
+        'positive': ['yes', 'yeah', 'yep', 'ok', 'okay', 'alright', 'sure', 'lets do it', 'go ahead', 'proceed'],
+        'mav_heavy': ['soil', 'rubble', 'bricks', 'concrete', 'tiles', 'heavy'],
+        'soil_rubble': ['soil', 'rubble', 'muckaway', 'dirt', 'earth', 'concrete'],
+        'other_materials': ['wood', 'furniture', 'plastic', 'metal', 'general', 'mixed'],
+        # Skip hire information requests
+        'skip_info_prohibited': ['prohibited', 'what can', 'can i put', 'allowed'],
+        'skip_info_heavy': ['largest skip', 'biggest skip', 'soil', 'rubble', 'heavy'],
+        'skip_info_smallest': ['smallest'],
+        'skip_info_permit': ['permit', 'road', 'driveway'],
+        'skip_info_cubic_yard': ['cubic yard'],
+        'skip_info_drop_door': ['dropped down door', 'drop down door'],
+        'skip_info_soil_tons': ['tons of soil', 'tonnes of soil'],
+        # Man & van information requests
+        'mav_info_weight': ['weight allowance', 'weight limit', 'how much weight'],
+        'mav_info_estimate': ['estimate', 'how much waste', 'how to calculate'],
+        'mav_info_upholstery': ['chairs', 'sofa', 'upholstered', 'extra charge'],
+        'mav_info_fridge': ['fridge'],
+        'mav_info_cost': ['how much', 'price', 'cost'],
+        'mav_info_how': ['how does it work', 'how do you charge'],
+        'mav_info_soil': ['soil'],
+        # Grab hire information requests
+        'grab_info_size': ['how large', 'how big', 'size', 'tonnes', 'capacity'],
+        'grab_info_access': ['access', 'requirements', 'space needed'],
+        'grab_info_waste': ['what waste', 'what can', 'green waste', 'materials'],
+        'grab_info_mixed': ['soil and hardcore', 'mixed materials'],
+        'grab_info_small': ['small amount', 'not much', 'little bit']
+    }
+
+def compile_rules(rules):
+    return {'keywords': KeywordMatcher(keyword_tables(rules))}
+
+# BUSINESS RULES HOT-RELOADED FROM THE RULES FILE ("agents" SECTION) - ALWAYS READ THROUGH rules_registry.current
+rules_registry = RulesRegistry('agents', {
+    'TRANSFER_RULES': TRANSFER_RULES,
+    'PROHIBITED_ITEMS_SKIP': PROHIBITED_ITEMS_SKIP,
+    'SKIP_SIZE_RULES': SKIP_SIZE_RULES,
+    'MAV_WEIGHT_ALLOWANCES': MAV_WEIGHT_ALLOWANCES,
+    'SKIP_HIRE_RULES': SKIP_HIRE_RULES,
+    'MAV_RULES': MAV_RULES,
+    'GRAB_RULES': GRAB_RULES
+}, compile_rules)
+rules_registry.start()
+
+# CUSTOMER DETAILS PULLED OUT OF EVERY MESSAGE - COMPILED ONCE INTO ONE SCANNER, FIRST PATTERN LISTED WINS
+EXTRACTION_PATTERNS = {
+    # Postcode - requires complete postcode format like LS14ED
+    'postcode': [r'([A-Za-z]{1,2}\d{1,2}[A-Za-z]?\s*\d[A-Za-z]{2})'],
+    # Phone - handle multiple formats
+    'phone': [
+        r'\b(\d{11})\b',                    # 01442216784 (11 consecutive digits)
+        r'\b(\d{10})\b',                    # 0144216784 (10 consecutive digits)
+        r'\b(\d{5})\s+(\d{6})\b',           # 01442 216784 (5 + 6 digits with space)
+        r'\b(\d{4})\s+(\d{6})\b',           # 0144 216784 (4 + 6 digits with space)
+        r'\b(\d{5})-(\d{6})\b',             # 01442-216784 (5 + 6 digits with hyphen)
+        r'\b(\d{4})-(\d{6})\b',             # 0144-216784 (4 + 6 digits with hyphen)
+        r'\((\d{4,5})\)\s*(\d{6})\b',       # (01442) 216784 (brackets format)
+    ],
+    # Name - common words like "Yes" are never taken as a name
+    'firstName': [
+        r'[Nn]ame\s+(?:is\s+)?([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)',
+        r'[Cc]ustomer\s+(?:name\s+)?(?:is\s+)?([A-Z][a-z]+)',
+        r'^([A-Z][a-z]+)\s+(?:wants|needs)',
+        r'^([A-Z][a-z]+),',
+        r'for\s+([A-Z][a-z]+),',
+        r'([A-Z][a-z]+)\s+phone',
+        r'phone\s+([A-Z][a-z]+)',
+    ]
+}
+extractor = Extractor(EXTRACTION_PATTERNS)
+
+
+def detect_size(message):
+    """Size the customer actually said, or None"""
+    hits = rules_registry.current.keywords.scan(message)
+    for size in SIZE_PHRASES:
+        if f'size_{size}' in hits:
+            return size
+    return None
+
+
+# A turn that needs the WasteKing API: 'price', 'compare' or 'book'
+ApiStep = namedtuple('ApiStep', ['kind', 'wants_to_book'], defaults=[False])
+
 
 class BaseAgent:
     def __init__(self):
-        self.conversations = {}  # Store conversation state
+        self.conversations = MemoryConversationStore()  # Store conversation state - bounded by idle TTL and max entries
+        self.prefetched_quotes = {}  # conversation_id -> quote fetched by the async path
+        self.prefetched_bookings = {}  # conversation_id -> booking result fetched by the async path
+        self.prefetched_comparisons = {}  # conversation_id -> skip and MAV quotes fetched by the async path
+
+    async def process_message_async(self, message, conversation_id="default"):
+        """ASYNC ENTRY POINT - THE SAME TURN AS process_message, API ROUND TRIPS AWAITED ON THE EVENT LOOP"""
+        state, step = await asyncio.to_thread(self.plan_turn, message, conversation_id)
+        try:
+            if isinstance(step, ApiStep):
+                await self.prefetch(step, state, conversation_id)
+            # Anything the prefetch didn't cover still blocks - keep it off the event loop
+            response = await asyncio.to_thread(self.run_step, step, state, conversation_id)
+        finally:
+            # Never carry an unused prefetch into a later turn
+            self.prefetched_quotes.pop(conversation_id, None)
+            self.prefetched_comparisons.pop(conversation_id, None)
+            self.prefetched_bookings.pop(conversation_id, None)
+        await asyncio.to_thread(self.finish_turn, state, conversation_id)
+        return response
+
+    async def prefetch(self, step, state, conversation_id):
+        """Await the API calls run_step is about to make, so it finds their results instead of blocking"""
+        if async_client is None:
+            return
+        try:
+            if step.kind == 'compare':
+                self.prefetched_comparisons[conversation_id] = await async_client.fetch_comparison_quote(
+                    state['postcode'], state.get('type', self.default_type))
+            elif step.kind == 'book':
+                customer_data = self.customer_data(state)
+                if state.get('booking_ref') and state.get('price'):
+                    self.prefetched_bookings[conversation_id] = await async_client.resume_booking(
+                        customer_data, state['booking_ref'], state['price'], state.get('booking_bound', True))
+                else:
+                    self.prefetched_bookings[conversation_id] = await async_client.complete_booking(customer_data)
+            elif postcode_index.validate(state.get('postcode')) and not self.matrix_quote(state):
+                service_type = state.get('type', self.default_type)
+                quote = None
+                if speculative_pricer.pending(conversation_id, state['postcode'], state['service'], service_type):
+                    # claim() may wait for a speculation that is still in flight
+                    quote = await asyncio.to_thread(speculative_pricer.claim, conversation_id, state['postcode'], state['service'], service_type)
+                self.prefetched_quotes[conversation_id] = quote or await async_client.fetch_quote(
+                    state['postcode'], state['service'], service_type)
+        except Exception as e:
+            # run_step falls back to the blocking calls
+            print(f"❌ ASYNC PREFETCH ERROR: {e}")
 
     def process_message(self, message, conversation_id="default"):
         """MAIN ENTRY POINT - FOLLOW ALL BUSINESS RULES"""
+        state, step = self.plan_turn(message, conversation_id)
+
+        # Get next response following ALL RULES
+        response = self.run_step(step, state, conversation_id)
+        
+        self.finish_turn(state, conversation_id)
+        return response
+
+    def plan_turn(self, message, conversation_id):
+        """MERGE THIS MESSAGE INTO THE STATE AND DECIDE THE REPLY - NO API CALLS HERE"""
         state = self.conversations.get(conversation_id, {})
         print(f"📂 LOADED STATE: {state}")
 
@@ -329,23 +575,42 @@ class BaseAgent:
         new_data = self.extract_data(message)
         print(f"🔍 NEW DATA: {new_data}")
 
+        # A default size never overrides one we already have - only a size the customer said does
+        if state.get('type') and not detect_size(message):
+            new_data.pop('type', None)
+        if state.get('price') and new_data.get('type') and new_data['type'] != state.get('type'):
+            print(f"📐 SIZE CHANGE {state.get('type')} -> {new_data['type']} - RE-QUOTING")
+            state.pop('price')
+
         # Merge state - PRESERVE EXISTING DATA PROPERLY
         for key, value in new_data.items():
             if value and value.strip():  # Only update if new value is not empty/whitespace
                 state[key] = value
         print(f"🔄 MERGED STATE: {state}")
 
+        # NEW: Price in the background while we still ask for name and phone
+        if state.get('postcode') and state.get('service') and not state.get('price') and not self.check_completion_status(state)[1]:
+            speculative_pricer.speculate(conversation_id, state['postcode'], state['service'], state.get('type', self.default_type))
+
         # CRITICAL: Ensure state persistence
-        self.conversations[conversation_id] = state.copy()
+        self.conversations[conversation_id] = state
 
-        # Get next response following ALL RULES
-        response = self.get_next_response(message, state, conversation_id)
-        
+        return state, self.next_step(message, state, conversation_id)
+
+    def run_step(self, step, state, conversation_id):
+        """CARRY OUT WHAT next_step DECIDED - TEXT IS THE REPLY, AN ApiStep MAKES ITS API CALLS"""
+        if not isinstance(step, ApiStep):
+            return step
+        if step.kind == 'compare':
+            return self.get_comparison_quote(state, conversation_id)
+        if step.kind == 'book':
+            return self.complete_booking(state, conversation_id)
+        return self.get_pricing(state, conversation_id, step.wants_to_book)
+
+    def finish_turn(self, state, conversation_id):
         # Save state again after processing - DOUBLE CHECK
-        self.conversations[conversation_id] = state.copy()
+        self.conversations[conversation_id] = state
         print(f"💾 FINAL STATE SAVED: {self.conversations[conversation_id]}")
-        
-        return response
 
     def check_completion_status(self, state):
         """Track what we have and what we need"""
@@ -364,231 +629,116 @@ class BaseAgent:
     # NEW: Check if question is asking for information (not booking)
     def is_information_request(self, message):
         """Check if customer is asking for information rather than booking"""
-        info_keywords = [
-            'what are', 'what is', 'can i put', 'do i need', 'tell me about',
-            'explain', 'how much is', 'what size', 'how large', 'how wide',
-            'what waste can', 'can you take', 'requirements', 'allowance',
-            'prohibited', 'largest', 'smallest', 'information', 'details'
-        ]
-        return any(keyword in message.lower() for keyword in info_keywords)
+        return 'info_request' in rules_registry.current.keywords.scan(message)
 
     # NEW: Check for prohibited items in skip
     def check_prohibited_items_skip(self, message):
         """Check if message mentions items prohibited in skips"""
-        message_lower = message.lower()
-        prohibited_found = []
-        
-        for item in PROHIBITED_ITEMS_SKIP:
-            if item in message_lower:
-                prohibited_found.append(item)
-        
-        return prohibited_found
+        return list(rules_registry.current.keywords.scan(message).get('prohibited_skip', ()))
 
     # NEW: Check if soil/heavy materials for service recommendation
     def check_soil_heavy_materials(self, message):
         """Check if message mentions soil or heavy materials"""
-        message_lower = message.lower()
-        heavy_materials = ['soil', 'rubble', 'concrete', 'bricks', 'hardcore', 'dirt', 'earth', 'tons', 'tonnes']
-        
-        for material in heavy_materials:
-            if material in message_lower:
-                return True
-        return False
+        return 'soil_heavy' in rules_registry.current.keywords.scan(message)
 
     def extract_data(self, message):
         """EXTRACT ALL CUSTOMER DATA - FOLLOW EXTRACTION RULES"""
         data = {}
-        message_lower = message.lower()
+        # ONE PASS OVER THE MESSAGE - EVERY KEYWORD CHECK BELOW READS THESE HITS
+        hits = rules_registry.current.keywords.scan(message)
 
         # NEW: Extract special items (supplements) that affect pricing
         supplements = []
-        supplement_mappings = {
-            'fridge': 'fridge',
-            'freezer': 'freezer', 
-            'fridges': 'fridge',
-            'freezers': 'freezer',
-            'sofa': 'sofa',
-            'sofas': 'sofa',
-            'mattress': 'mattress',
-            'mattresses': 'mattress',
-            'upholstered furniture': 'upholstered_furniture',
-            'upholstered chair': 'upholstered_furniture',
-            'upholstered chairs': 'upholstered_furniture',
-            'chair': 'chair',  # Will be checked for upholstery context
-            'chairs': 'chairs'  # Will be checked for upholstery context
-        }
         
-        for item_phrase, supplement_code in supplement_mappings.items():
-            if item_phrase in message_lower:
-                # Special handling for chairs - only if upholstered context
-                if supplement_code in ['chair', 'chairs']:
-                    if any(context in message_lower for context in ['upholstered', 'fabric', 'leather', 'cushioned']):
-                        supplements.append('upholstered_furniture')
-                    # Otherwise assume furniture chairs need surcharge
-                    else:
-                        supplements.append('upholstered_furniture')  # Safe assumption for pricing
+        for item_phrase in hits.get('supplement', ()):
+            supplement_code = SUPPLEMENT_MAPPINGS[item_phrase]
+            # Special handling for chairs - only if upholstered context
+            if supplement_code in ['chair', 'chairs']:
+                if 'upholstery_context' in hits:
+                    supplements.append('upholstered_furniture')
+                # Otherwise assume furniture chairs need surcharge
                 else:
-                    supplements.append(supplement_code)
+                    supplements.append('upholstered_furniture')  # Safe assumption for pricing
+            else:
+                supplements.append(supplement_code)
         
         # Remove duplicates
         if supplements:
             data['supplements'] = list(set(supplements))
             print(f"✅ Extracted supplements: {data['supplements']}")
 
-        # Postcode regex - requires complete postcode format like LS14ED
-        postcode_match = re.search(r'([A-Z]{1,2}\d{1,2}[A-Z]?\s*\d[A-Z]{2})', message.upper())
-        if postcode_match:
-            postcode = postcode_match.group(1).replace(' ', '')
-            if len(postcode) >= 5:
+        # Postcode, phone and name - ONE SCAN OF THE MESSAGE
+        fields = extractor.extract(message)
+
+        if 'postcode' in fields:
+            # RULE: Only real postcodes are kept - a mistyped one is asked for again, NEVER priced
+            postcode = postcode_index.validate(fields['postcode'].value)
+            if postcode:
                 data['postcode'] = postcode
                 print(f"✅ Extracted complete postcode: {data['postcode']}")
+            else:
+                print(f"⚠️ REJECTED POSTCODE: {fields['postcode'].value} - not a UK postcode")
 
-        # Phone extraction - handle multiple formats
-        phone_patterns = [
-            r'\b(\d{11})\b',                    # 01442216784 (11 consecutive digits)
-            r'\b(\d{10})\b',                    # 0144216784 (10 consecutive digits)
-            r'\b(\d{5})\s+(\d{6})\b',           # 01442 216784 (5 + 6 digits with space)
-            r'\b(\d{4})\s+(\d{6})\b',           # 0144 216784 (4 + 6 digits with space)
-            r'\b(\d{5})-(\d{6})\b',             # 01442-216784 (5 + 6 digits with hyphen)
-            r'\b(\d{4})-(\d{6})\b',             # 0144-216784 (4 + 6 digits with hyphen)
-            r'\((\d{4,5})\)\s*(\d{6})\b',       # (01442) 216784 (brackets format)
-        ]
-        
-        for pattern in phone_patterns:
-            phone_match = re.search(pattern, message)
-            if phone_match:
-                # Combine all captured groups and remove any non-digits
-                phone_parts = [group for group in phone_match.groups() if group]
-                phone_number = ''.join(phone_parts)
-                if len(phone_number) >= 10:  # Valid UK phone number
-                    data['phone'] = phone_number
-                    print(f"✅ Extracted phone: {data['phone']}")
-                    break
+        if 'phone' in fields:
+            data['phone'] = fields['phone'].value
+            print(f"✅ Extracted phone: {data['phone']}")
 
         # Name extraction - FIXED: Don't extract "Yes" as name
-        if 'kanchen' in message_lower or 'kanchan' in message_lower:
+        if 'name_kanchan' in hits:
             data['firstName'] = 'Kanchan'
             print(f"✅ Extracted name: Kanchan")
-        elif 'jackie' in message_lower:
+        elif 'name_jackie' in hits:
             data['firstName'] = 'Jackie'
             print(f"✅ Extracted name: Jackie")
-        else:
-            name_patterns = [
-                r'[Nn]ame\s+(?:is\s+)?([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)',
-                r'[Cc]ustomer\s+(?:name\s+)?(?:is\s+)?([A-Z][a-z]+)',
-                r'^([A-Z][a-z]+)\s+(?:wants|needs)',
-                r'^([A-Z][a-z]+),',
-                r'for\s+([A-Z][a-z]+),',
-                r'([A-Z][a-z]+)\s+phone',
-                r'phone\s+([A-Z][a-z]+)',
-            ]
-            for pattern in name_patterns:
-                name_match = re.search(pattern, message)
-                if name_match:
-                    potential_name = name_match.group(1).strip().title()
-                    # RULE: Don't extract common words as names
-                    if potential_name.lower() not in ['yes', 'no', 'there', 'what', 'how', 'confirmed', 'phone', 'please']:
-                        data['firstName'] = potential_name
-                        print(f"✅ Extracted name: {data['firstName']}")
-                        break
+        elif 'firstName' in fields:
+            data['firstName'] = fields['firstName'].value
+            print(f"✅ Extracted name: {data['firstName']}")
 
         # SERVICE DETECTION - CRITICAL FOR PROPER ROUTING
         # Skip hire indicators
-        if any(word in message_lower for word in ['skip', 'skip hire', 'container hire']):
+        if 'service_skip' in hits:
             data['service'] = 'skip'
             # Detect skip size
-            if any(size in message_lower for size in ['8-yard', '8 yard', '8yd', 'eight yard', 'eight-yard']):
-                data['type'] = '8yd'
-            elif any(size in message_lower for size in ['6-yard', '6 yard', '6yd']):
-                data['type'] = '6yd'
-            elif any(size in message_lower for size in ['4-yard', '4 yard', '4yd']):
-                data['type'] = '4yd'
-            elif any(size in message_lower for size in ['12-yard', '12 yard', '12yd']):
-                data['type'] = '12yd'
-            else:
-                data['type'] = '8yd'  # Default
+            data['type'] = detect_size(message) or '8yd'  # Default
         
-        # Man & Van indicators (HOUSE CLEARANCE = MAV, NOT GRAB!) - EXPANDED LIST
-        elif any(phrase in message_lower for phrase in [
-            'house clearance', 'furniture removal', 'furniture collection', 'house clear',
-            'clearance', 'man and van', 'man & van', 'mav', 'loading service',
-            'furniture', 'wardrobe', 'wardrobes', 'sofa', 'mattress', 'appliances', 'white goods',
-            'office clearance', 'flat clearance', 'garage clear', 'shed clear',
-            'we do the loading', 'you load', 'collection service',
-            'chest of drawers', 'bed', 'table', 'chair', 'bookshelf', 'dresser',
-            'dining table', 'bedroom furniture', 'living room', 'kitchen appliances',
-            'washing machine', 'fridge', 'cooker', 'dishwasher', 'tumble dryer',
-            'remove furniture', 'furniture pick up', 'furniture disposal',
-            'house move', 'moving furniture', 'furniture clearance',
-            'two wardrobes', 'three piece suite'
-        ]):
+        # Man & Van indicators (HOUSE CLEARANCE = MAV, NOT GRAB!)
+        elif 'service_mav' in hits:
             data['service'] = 'mav'
             data['type'] = '4yd'  # Default
         
-        # Grab hire indicators (ONLY for soil/rubble/muckaway) - STRICT LIST
-        elif any(phrase in message_lower for phrase in [
-            'grab hire', 'grab lorry', 'soil removal', 'rubble removal', 'muckaway', 
-            'dirt removal', 'earth removal', 'excavation waste', 'heavy materials removal',
-            'concrete removal', 'hardcore removal', 'aggregates', 'topsoil removal', 'subsoil',
-            'building rubble', 'demolition waste', 'construction rubble'
-        ]) and not any(furniture in message_lower for furniture in ['furniture', 'wardrobe', 'bed', 'sofa', 'table']):
+        # Grab hire indicators (ONLY for soil/rubble/muckaway) - NEVER WHEN FURNITURE IS MENTIONED
+        elif 'service_grab' in hits and 'furniture' not in hits:
             data['service'] = 'grab'
             data['type'] = '6yd'  # Default
 
+        # SIZE ON ITS OWN - "actually make it a 6 yard" changes the quote
+        elif detect_size(message):
+            data['type'] = detect_size(message)
+
         # Extract waste type information - FOLLOW WASTE TYPE RULES
-        waste_keywords = ['plastic', 'brick', 'waste', 'rubbish', 'items', 'normal', 'household', 'soil', 'old', 'furniture', 'clothes', 'books', 'toys', 'cardboard', 'paper', 'bricks', 'brick', 'renovation', 'rubble', 'concrete', 'tiles', 'wardrobe', 'clearance']
-        found_waste = []
-        
-        for keyword in waste_keywords:
-            if keyword in message_lower:
-                found_waste.append(keyword)
+        found_waste = list(hits.get('waste', ()))
         
         if found_waste:
             data['waste_type'] = ', '.join(found_waste)
             print(f"✅ Extracted waste type: {data['waste_type']}")
 
         # Extract location information
-        location_phrases = [
-            'in the garage', 'in garage', 'garage', 'half a garage',
-            'in the garden', 'garden', 'back garden', 'front garden',
-            'in the house', 'inside', 'indoors', 'house clearance',
-            'outside', 'outdoors', 'on the drive', 'driveway',
-            'easy access', 'easy to access', 'accessible',
-            'ground floor', 'upstairs', 'basement', 'flat', 'apartment'
-        ]
-        for phrase in location_phrases:
-            if phrase in message_lower:
-                data['location'] = message.strip()
-                print(f"✅ Extracted location: {data['location']}")
-                break
+        if 'location' in hits:
+            data['location'] = message.strip()
+            print(f"✅ Extracted location: {data['location']}")
 
         return data
 
     def should_book(self, message):
         """Check if user wants to proceed with booking"""
-        message_lower = message.lower()
-        
-        # Direct booking requests
-        booking_phrases = [
-            'payment link', 'pay link', 'booking', 'book it', 'book this',
-            'send payment', 'complete booking', 'finish booking', 'proceed with booking',
-            'confirm booking', 'make booking', 'create booking', 'place order',
-            'send me the link', 'i want to book', 'ready to book', 'lets book',
-            'checkout', 'complete order', 'finalize booking', 'secure booking',
-            'reserve this', 'confirm this', 'i\'ll take it', 'that works',
-            'perfect', 'sounds good', 'thats fine', 'arrange this',
-            'wants to book', 'please send payment'
-        ]
-        
-        # Positive responses
-        positive_words = ['yes', 'yeah', 'yep', 'ok', 'okay', 'alright', 'sure', 'lets do it', 'go ahead', 'proceed']
-        
+        hits = rules_registry.current.keywords.scan(message)
+
         # Check for explicit booking requests
-        if any(phrase in message_lower for phrase in booking_phrases):
+        if 'booking' in hits:
             return True
             
         # Check for positive responses - but only if we already have pricing
-        return any(word in message_lower for word in positive_words)
+        return 'positive' in hits
 
     def is_business_hours(self):
         """Check if it's business hours"""
@@ -614,6 +764,37 @@ class BaseAgent:
             return True   # Grab: transfer needed for £300+
         return False
 
+    def wants_comparison(self, message):
+        """Customer asked for skip and man & van prices side by side"""
+        return self.service_type in COMPARISON_NAMES and 'comparison' in rules_registry.current.keywords.scan(message)
+
+    def get_comparison_quote(self, state, conversation_id):
+        """RULE mav_suggestion: quote skip AND man & van in one turn - both lookups run at the same time"""
+        other = 'mav' if self.service_type == 'skip' else 'skip'
+        quotes = self.prefetched_comparisons.pop(conversation_id, None)
+        if quotes is None:
+            try:
+                quotes = fetch_comparison_quote(state['postcode'], state.get('type', self.default_type))
+            except Exception as e:
+                print(f"❌ COMPARISON QUOTE ERROR: {e}")
+                quotes = {}
+
+        # Our own service goes through the normal pricing turn, just without its API calls
+        state.pop('price', None)
+        if quotes.get(self.service_type):
+            self.prefetched_quotes[conversation_id] = quotes[self.service_type]
+        response = self.get_pricing(state, conversation_id)
+        self.prefetched_quotes.pop(conversation_id, None)
+
+        alternative = (quotes.get(other) or {}).get('pricing') or {}
+        if not (state.get('price') and alternative.get('success') and response.endswith("Would you like to book this?")):
+            return response
+        alt_price = alternative['price']
+        if other == 'mav' and float(str(alt_price).replace('£', '').replace(',', '')) >= 500:
+            return response  # MAV £500+ is a specialist quote, not a comparison
+        print(f"⚖️ COMPARISON: {self.service_type} {state['price']} vs {other} {alt_price}")
+        return response[:-len("Would you like to book this?")] + f"Or {alternative.get('type')} {COMPARISON_NAMES[other]}: {alt_price}. Which would you prefer?"
+
     def validate_postcode_with_customer(self, current_postcode):
         """Ask customer to confirm postcode if pricing fails"""
         if not current_postcode or len(current_postcode) < 5:
@@ -625,21 +806,38 @@ class BaseAgent:
     def get_pricing(self, state, conversation_id, wants_to_book=False):
         """CORE FUNCTION: Get pricing and present to user - ACTUAL API CALLS WITH SUPPLEMENTS"""
         try:
-            print("📞 CALLING CREATE_BOOKING API...")
-            booking_result = create_booking()
+            # RULE: Never spend SMP calls on a postcode that cannot exist
+            if not postcode_index.validate(state.get('postcode')):
+                print(f"⚠️ INVALID POSTCODE {state.get('postcode')} - NOT CALLING THE API")
+                return self.validate_postcode_with_customer(state.get('postcode'))
+            service_type = state.get('type', self.default_type)
+            prefetched = None
+            # RULE: Size changes on a live quote come from its price matrix - NO API CALLS
+            price_result = self.matrix_quote(state)
+            if price_result:
+                booking_result = {'success': True, 'booking_ref': state['booking_ref']}
+            else:
+                prefetched = self.prefetched_quotes.pop(conversation_id, None)
+                if prefetched is None:
+                    prefetched = speculative_pricer.claim(conversation_id, state['postcode'], state['service'], service_type)
+                print("📞 CALLING CREATE_BOOKING API...")
+                booking_result = prefetched['booking'] if prefetched else acquire_booking()
             if not booking_result.get('success'):
                 print("❌ CREATE_BOOKING FAILED")
                 return "Unable to get pricing right now. Let me put you through to our team."
             
             booking_ref = booking_result['booking_ref']
-            service_type = state.get('type', self.default_type)
             
             # NEW: Include supplements in pricing call
             supplements = state.get('supplements', [])
-            print(f"📞 CALLING GET_PRICING API... postcode={state['postcode']}, service={state['service']}, type={service_type}, supplements={supplements}")
-            price_result = get_pricing(booking_ref, state['postcode'], state['service'], service_type, supplements)
+            if price_result is None:
+                print(f"📞 CALLING GET_PRICING API... postcode={state['postcode']}, service={state['service']}, type={service_type}, supplements={supplements}")
+                price_result = prefetched['pricing'] if prefetched else get_pricing(booking_ref, state['postcode'], state['service'], service_type)
             
             if not price_result.get('success'):
+                if price_result.get('circuit_open'):
+                    print("⛔ PRICING API CIRCUIT OPEN - TRANSFERRING")
+                    return "Unable to get pricing right now. Let me put you through to our team."
                 print("❌ GET_PRICING FAILED - POSTCODE ISSUE")
                 return self.validate_postcode_with_customer(state.get('postcode'))
             
@@ -652,6 +850,7 @@ class BaseAgent:
                 state['price'] = price
                 state['type'] = price_result.get('type', service_type)
                 state['booking_ref'] = booking_ref
+                self.remember_quote(state, price_result)
                 self.conversations[conversation_id] = state
                 
                 # Apply transfer logic correctly
@@ -664,7 +863,7 @@ class BaseAgent:
                         print("🌙 OUT OF HOURS - MAKE THE SALE INSTEAD")
                         if wants_to_book:
                             print("🚀 USER ALREADY WANTS TO BOOK - COMPLETING IMMEDIATELY")
-                            return self.complete_booking(state)
+                            return self.complete_booking(state, conversation_id)
                         else:
                             # NEW: Mention supplements in pricing response if any
                             response = f"{state['type']} {self.service_name} at {state['postcode']}: {state['price']}"
@@ -678,7 +877,7 @@ class BaseAgent:
                     # No transfer needed
                     if wants_to_book:
                         print("🚀 USER ALREADY WANTS TO BOOK - COMPLETING IMMEDIATELY")
-                        return self.complete_booking(state)
+                        return self.complete_booking(state, conversation_id)
                     else:
                         print("✅ NO TRANSFER NEEDED - PRESENTING PRICE TO USER")
                         # NEW: Mention supplements in pricing response if any
@@ -697,26 +896,40 @@ class BaseAgent:
             print(f"❌ PRICING ERROR: {e}")
             return "Unable to get pricing right now. Let me put you through to our team."
 
+    def matrix_quote(self, state):
+        if not state.get('booking_ref'):
+            return None
+        return price_from_matrix(state.get('price_matrix'), state['postcode'], state['service'], state.get('type', self.default_type))
+
+    def remember_quote(self, state, price_result):
+        """Track which size the booking ref was searched for, and keep every size quoted"""
+        if price_result.get('from_matrix'):
+            # Same booking ref - still bound only if its search was for this size
+            state['booking_bound'] = price_result['type'] == state.get('bound_type')
+            return
+        # A cached quote has not been searched against this booking ref yet
+        state['booking_bound'] = not price_result.get('cached')
+        state['bound_type'] = price_result.get('type') if state['booking_bound'] else None
+        if price_result.get('price_matrix'):
+            state['price_matrix'] = remember_price_matrix(price_result, state.get('postcode'), state.get('service'))
+
     # CORE FUNCTION 2: COMPLETE BOOKING ONLY
-    def complete_booking(self, state):
+    def complete_booking(self, state, conversation_id):
         """CORE FUNCTION: Complete booking with payment link - MUST CALL ACTUAL API WITH SUPPLEMENTS"""
         try:
             print("🚀 COMPLETING BOOKING...")
             
-            # Prepare customer data including supplements
-            customer_data = {
-                'firstName': state.get('firstName'),
-                'phone': state.get('phone'),
-                'postcode': state.get('postcode'),
-                'service': state.get('service'),
-                'type': state.get('type'),
-                'supplements': state.get('supplements', [])  # NEW: Include supplements
-            }
-            
+            customer_data = self.customer_data(state)
             print(f"📋 CUSTOMER DATA WITH SUPPLEMENTS: {customer_data}")
             
-            # RULE: Call the complete booking API - ACTUAL API CALL
-            result = complete_booking(customer_data)
+            # RULE: Resume from the ref and price we already quoted - ACTUAL API CALL
+            prefetched = self.prefetched_bookings.pop(conversation_id, None)
+            if prefetched is not None:
+                result = prefetched
+            elif state.get('booking_ref') and state.get('price'):
+                result = resume_booking(customer_data, state['booking_ref'], state['price'], state.get('booking_bound', True))
+            else:
+                result = complete_booking(customer_data)
             
             if result.get('success'):
                 booking_ref = result['booking_ref']
@@ -747,6 +960,17 @@ class BaseAgent:
             print(f"❌ BOOKING ERROR: {e}")
             return "Booking issue occurred. Our team will contact you."
 
+    def customer_data(self, state):
+        """Prepare customer data for the booking API, including supplements"""
+        return {
+            'firstName': state.get('firstName'),
+            'phone': state.get('phone'),
+            'postcode': state.get('postcode'),
+            'service': state.get('service'),
+            'type': state.get('type'),
+            'supplements': state.get('supplements', [])  # NEW: Include supplements
+        }
+
     def send_sms(self, name, phone, booking_ref, price, payment_link):
         """RULE: Send SMS with payment link - ACTUAL API CALL"""
         try:
@@ -775,10 +999,11 @@ class SkipAgent(BaseAgent):
         self.service_name = 'skip hire'
         self.default_type = '8yd'
 
-    def get_next_response(self, message, state, conversation_id):
+    def next_step(self, message, state, conversation_id):
         """SKIP HIRE FLOW - FOLLOW ALL RULES A1-A7 EXACTLY + NEW INFORMATION HANDLING"""
+        rules = rules_registry.current
         wants_to_book = self.should_book(message)
-        message_lower = message.lower()
+        hits = rules.keywords.scan(message)
         
         # NEW: Handle information requests first (before booking flow)
         if self.is_information_request(message):
@@ -787,26 +1012,31 @@ class SkipAgent(BaseAgent):
         # Check completion status
         completion, all_ready = self.check_completion_status(state)
         
+        # RULE mav_suggestion: skip and man & van side by side when asked
+        if all_ready and self.wants_comparison(message):
+            print("⚖️ COMPARISON REQUESTED - QUOTING SKIP AND MAN & VAN TOGETHER")
+            return ApiStep('compare')
+
         # If user wants to book and we have pricing, complete booking immediately
         if wants_to_book and state.get('price') and state.get('booking_ref'):
             print("🚀 USER WANTS TO BOOK - COMPLETING BOOKING")
-            return self.complete_booking(state)
+            return ApiStep('book')
 
         # If all info collected but no pricing yet, get pricing
         if all_ready and not state.get('price'):
             print("🚀 ALL INFO COLLECTED - CALLING API FOR PRICING")
-            return self.get_pricing(state, conversation_id, wants_to_book)
+            return ApiStep('price', wants_to_book)
 
         # Check for Management/Director requests
-        if any(trigger in message.lower() for trigger in TRANSFER_RULES['management_director']['triggers']):
-            return TRANSFER_RULES['management_director']['out_of_hours']
+        if 'director' in hits:
+            return rules.TRANSFER_RULES['management_director']['out_of_hours']
 
         # Check for complaints
-        if any(complaint in message.lower() for complaint in ['complaint', 'complain', 'unhappy', 'disappointed', 'frustrated', 'angry']):
-            return TRANSFER_RULES['complaints']['out_of_hours']
+        if 'complaint' in hits:
+            return rules.TRANSFER_RULES['complaints']['out_of_hours']
 
         # Check for specialist services
-        if any(service in message.lower() for service in TRANSFER_RULES['specialist_services']['services']):
+        if 'specialist_service' in hits:
             return "We can help with that specialist service. Let me arrange for our team to call you back."
 
         # A1: INFORMATION GATHERING SEQUENCE
@@ -827,7 +1057,7 @@ class SkipAgent(BaseAgent):
         # If we have all required info, proceed to get price
         elif state.get('firstName') and state.get('postcode') and state.get('service') and state.get('phone'):
             if not state.get('price'):
-                return self.get_pricing(state, conversation_id, wants_to_book)
+                return ApiStep('price', wants_to_book)
             elif state.get('price'):
                 return f"{state.get('type', '8yd')} skip hire at {state['postcode']}: {state['price']}. Would you like to book this?"
 
@@ -836,10 +1066,10 @@ class SkipAgent(BaseAgent):
     # NEW: Handle information requests for skip hire
     def handle_information_request(self, message):
         """Handle information requests about skip hire"""
-        message_lower = message.lower()
+        hits = rules_registry.current.keywords.scan(message)
         
         # Prohibited items question
-        if any(phrase in message_lower for phrase in ['prohibited', 'what can', 'can i put', 'allowed']):
+        if 'skip_info_prohibited' in hits:
             prohibited_items = self.check_prohibited_items_skip(message)
             if prohibited_items:
                 if any(item in ['sofa', 'sofas', 'upholstered'] for item in prohibited_items):
@@ -850,30 +1080,30 @@ class SkipAgent(BaseAgent):
                 return "The prohibited items in skips include: Fridges/Freezers, TV/Screens, Carpets, Paint/Liquid, Plasterboard, Mattresses, Gas cylinders, Tyres, and Air Conditioning units."
         
         # Skip sizes for heavy materials
-        elif any(phrase in message_lower for phrase in ['largest skip', 'biggest skip', 'soil', 'rubble', 'heavy']):
+        elif 'skip_info_heavy' in hits:
             if self.check_soil_heavy_materials(message):
                 return "For soil removal, the largest skip is 8-yard. Larger skips than that are suitable only for light waste, not heavy materials like soil and rubble."
             else:
                 return "The largest skip is RORO 40-yard. However, for heavy materials like soil and rubble, the largest skip is 8-yard."
         
         # Smallest skip
-        elif 'smallest' in message_lower:
+        elif 'skip_info_smallest' in hits:
             return "The smallest skip size available is a 2-yard skip, often called a 'mini skip', ideal for small amounts of waste and minor home projects."
         
         # Permit questions
-        elif any(phrase in message_lower for phrase in ['permit', 'road', 'driveway']):
+        elif 'skip_info_permit' in hits:
             return "The placement of the skip on your driveway will not require a permit. However, the placement of the skip on the road will require a permit from the council, which we'll arrange for you and include in your quote."
         
         # Cubic yard explanation
-        elif 'cubic yard' in message_lower:
+        elif 'skip_info_cubic_yard' in hits:
             return "A cubic yard is a unit of volume measurement. To visualize it, imagine a cube that measures one yard (3 feet) on each side. It's useful for understanding how much material can fit in a skip."
         
         # Drop-down door skips
-        elif 'dropped down door' in message_lower or 'drop down door' in message_lower:
+        elif 'skip_info_drop_door' in hits:
             return "Drop-down door skips are large waste containers with a convenient door that allows easy loading. They're ideal for heavy materials as you can walk directly into the skip instead of lifting waste over the sides."
         
         # Soil recommendation
-        elif 'tons of soil' in message_lower or 'tonnes of soil' in message_lower:
+        elif 'skip_info_soil_tons' in hits:
             return "For the removal of large amounts of soil, I would advise skip hire service. The largest skip you can have for soil is 8-yard."
         
         # General information
@@ -889,8 +1119,9 @@ class MAVAgent(BaseAgent):
         self.service_name = 'man & van'
         self.default_type = '4yd'
 
-    def get_next_response(self, message, state, conversation_id):
-        message_lower = message.lower()
+    def next_step(self, message, state, conversation_id):
+        rules = rules_registry.current
+        hits = rules.keywords.scan(message)
         wants_to_book = self.should_book(message)
 
         # NEW: Handle information requests first
@@ -899,25 +1130,30 @@ class MAVAgent(BaseAgent):
 
         completion, all_ready = self.check_completion_status(state)
 
+        # RULE mav_suggestion: skip and man & van side by side when asked
+        if all_ready and self.wants_comparison(message):
+            print("⚖️ COMPARISON REQUESTED - QUOTING MAN & VAN AND SKIP TOGETHER")
+            return ApiStep('compare')
+
         if wants_to_book and state.get('price') and state.get('booking_ref'):
             print("🚀 USER WANTS TO BOOK - COMPLETING BOOKING")
-            return self.complete_booking(state)
+            return ApiStep('book')
 
         # If all info collected but no pricing yet, get pricing
         if all_ready and not state.get('price'):
             print("🚀 ALL INFO COLLECTED - CALLING API FOR PRICING")
-            return self.get_pricing(state, conversation_id, wants_to_book)
+            return ApiStep('price', wants_to_book)
 
         # Check for Management/Director requests
-        if any(trigger in message.lower() for trigger in TRANSFER_RULES['management_director']['triggers']):
-            return TRANSFER_RULES['management_director']['out_of_hours']
+        if 'director' in hits:
+            return rules.TRANSFER_RULES['management_director']['out_of_hours']
 
         # Check for complaints
-        if any(complaint in message.lower() for complaint in ['complaint', 'complain', 'unhappy', 'disappointed', 'frustrated', 'angry']):
-            return TRANSFER_RULES['complaints']['out_of_hours']
+        if 'complaint' in hits:
+            return rules.TRANSFER_RULES['complaints']['out_of_hours']
 
         # Check for specialist services
-        if any(service in message.lower() for service in TRANSFER_RULES['specialist_services']['services']):
+        if 'specialist_service' in hits:
             return "We can help with that specialist service. Let me arrange for our team to call you back."
 
         # NEW: Heavy materials check
@@ -926,7 +1162,7 @@ class MAVAgent(BaseAgent):
 
         # B2: CHECK FOR HEAVY MATERIALS FIRST (Before info gathering)
         if state.get('firstName') and state.get('postcode') and state.get('phone') and state.get('service') and not state.get('heavy_materials_checked'):
-            if any(heavy in message.lower() for heavy in ['soil', 'rubble', 'bricks', 'concrete', 'tiles', 'heavy']):
+            if 'mav_heavy' in hits:
                 if self.is_business_hours():
                     return "For heavy materials with man & van service, let me put you through to our specialist team for the best solution."
                 else:
@@ -953,42 +1189,43 @@ class MAVAgent(BaseAgent):
         if state.get('firstName') and state.get('postcode') and state.get('service') and state.get('phone'):
             if not state.get('price'):
                 print("🚀 MAV: All info collected, getting pricing")
-                return self.get_pricing(state, conversation_id, wants_to_book)
+                return ApiStep('price', wants_to_book)
             elif state.get('price') and not wants_to_book:
                 return f"{state.get('type', '4yd')} man & van service at {state['postcode']}: {state['price']}. Would you like to book this?"
             elif state.get('price') and wants_to_book:
                 print("🚀 MAV: User wants to book, completing booking")
-                return self.complete_booking(state)
+                return ApiStep('book')
 
         return "I can help you with man & van service for furniture removal. What's your name?"
 
     # NEW: Handle information requests for man & van
     def handle_information_request(self, message):
         """Handle information requests about man & van service"""
-        message_lower = message.lower()
+        rules = rules_registry.current
+        hits = rules.keywords.scan(message)
         
         # Weight allowance questions
-        if any(phrase in message_lower for phrase in ['weight allowance', 'weight limit', 'how much weight']):
-            return MAV_WEIGHT_ALLOWANCES['standard_message']
+        if 'mav_info_weight' in hits:
+            return rules.MAV_WEIGHT_ALLOWANCES['standard_message']
         
         # Estimation help
-        elif any(phrase in message_lower for phrase in ['estimate', 'how much waste', 'how to calculate']):
+        elif 'mav_info_estimate' in hits:
             return ("Estimating your waste for man and van service: Try to visualize how many cubic yards your waste might fill - a cubic yard is roughly the size of a standard washing machine. Think in terms of washing machine loads or black bags. The national average is 6 yards for man & van service.")
         
         # Upholstered furniture charges
-        elif any(phrase in message_lower for phrase in ['chairs', 'sofa', 'upholstered', 'extra charge']):
+        elif 'mav_info_upholstery' in hits:
             return "The pricing for man and van service includes removal of typical household items. However, there is a surcharge for supplements - if chairs are upholstered, there will be an extra charge due to EA regulations for the way we dispose of them."
         
         # Fridge pricing - NEW RULE: Give immediate price + surcharge
-        elif 'fridge' in message_lower and any(phrase in message_lower for phrase in ['how much', 'price', 'cost']):
+        elif 'mav_info_fridge' in hits and 'mav_info_cost' in hits:
             return "For man and van service with a fridge, I'll need your postcode to give you the exact price. There's a £20 surcharge for fridges due to degassing requirements."
         
         # How service works
-        elif any(phrase in message_lower for phrase in ['how does it work', 'how do you charge']):
-            return ("Our man and van service works by the cubic yard. " + MAV_WEIGHT_ALLOWANCES['standard_message'] + " We allow generous labour time and 95% of all jobs are done within the time frame, although if collection goes over our labour time, there is a £19 charge per 15 minutes.")
+        elif 'mav_info_how' in hits:
+            return ("Our man and van service works by the cubic yard. " + rules.MAV_WEIGHT_ALLOWANCES['standard_message'] + " We allow generous labour time and 95% of all jobs are done within the time frame, although if collection goes over our labour time, there is a £19 charge per 15 minutes.")
         
         # Soil question - redirect to skip hire
-        elif 'soil' in message_lower:
+        elif 'mav_info_soil' in hits:
             return "For the removal of soil, I would advise skip hire service. The largest skip you can have for soil is 8-yard. Skip hire is the best option to remove soil and heavy materials."
         
         else:
@@ -1003,9 +1240,10 @@ class GrabAgent(BaseAgent):
         self.service_name = 'grab hire'
         self.default_type = ''
 
-    def get_next_response(self, message, state, conversation_id):
+    def next_step(self, message, state, conversation_id):
         """GRAB HIRE FLOW - FOLLOW ALL RULES C1-C5 EXACTLY - FIXED VERSION + INFO HANDLING"""
-        message_lower = message.lower()
+        rules = rules_registry.current
+        hits = rules.keywords.scan(message)
         wants_to_book = self.should_book(message)
         print(f"🔍 GRAB AGENT - wants_to_book: {wants_to_book}")
         
@@ -1020,30 +1258,30 @@ class GrabAgent(BaseAgent):
         # If user wants to book and we have pricing, complete booking immediately
         if wants_to_book and state.get('price') and state.get('booking_ref'):
             print("🚀 GRAB: USER WANTS TO BOOK - COMPLETING BOOKING")
-            return self.complete_booking(state)
+            return ApiStep('book')
 
         # If all info collected but no pricing yet, get pricing
         if all_ready and not state.get('price'):
             print("🚀 GRAB: ALL INFO COLLECTED - CALLING API FOR PRICING")
-            return self.get_pricing(state, conversation_id, wants_to_book)
+            return ApiStep('price', wants_to_book)
 
         # Check for Management/Director requests
-        if any(trigger in message.lower() for trigger in TRANSFER_RULES['management_director']['triggers']):
-            return TRANSFER_RULES['management_director']['out_of_hours']
+        if 'director' in hits:
+            return rules.TRANSFER_RULES['management_director']['out_of_hours']
 
         # Check for complaints
-        if any(complaint in message.lower() for complaint in ['complaint', 'complain', 'unhappy', 'disappointed', 'frustrated', 'angry']):
-            return TRANSFER_RULES['complaints']['out_of_hours']
+        if 'complaint' in hits:
+            return rules.TRANSFER_RULES['complaints']['out_of_hours']
 
         # Check for specialist services
-        if any(service in message.lower() for service in TRANSFER_RULES['specialist_services']['services']):
+        if 'specialist_service' in hits:
             return "We can help with that specialist service. Let me arrange for our team to call you back."
 
         # C3: MATERIALS ASSESSMENT - Check for mixed materials (transfer needed)
         if state.get('firstName') and state.get('postcode') and state.get('phone') and not state.get('materials_checked'):
             # Check for mixed materials (soil/rubble + other items)
-            has_soil_rubble = any(material in message.lower() for material in ['soil', 'rubble', 'muckaway', 'dirt', 'earth', 'concrete'])
-            has_other_items = any(item in message.lower() for item in ['wood', 'furniture', 'plastic', 'metal', 'general', 'mixed'])
+            has_soil_rubble = 'soil_rubble' in hits
+            has_other_items = 'other_materials' in hits
             
             if has_soil_rubble and has_other_items:
                 if self.is_business_hours():
@@ -1072,38 +1310,38 @@ class GrabAgent(BaseAgent):
         if state.get('firstName') and state.get('postcode') and state.get('service') and state.get('phone'):
             if not state.get('price'):
                 print("🚀 GRAB: All info collected, getting pricing")
-                return self.get_pricing(state, conversation_id, wants_to_book)
+                return ApiStep('price', wants_to_book)
             elif state.get('price') and not wants_to_book:
                 return f"{state.get('type', '')} grab lorry service at {state['postcode']}: {state['price']}. Would you like to book this?"
             elif state.get('price') and wants_to_book:
                 print("🚀 GRAB: User wants to book, completing booking")
-                return self.complete_booking(state)
+                return ApiStep('book')
 
         return "I can help you with grab lorry service for soil and rubble removal. Can I take your name please?"
 
     # NEW: Handle information requests for grab hire
     def handle_information_request(self, message):
         """Handle information requests about grab hire"""
-        message_lower = message.lower()
+        hits = rules_registry.current.keywords.scan(message)
         
         # Grab lorry sizes and capacity
-        if any(phrase in message_lower for phrase in ['how large', 'how big', 'size', 'tonnes', 'capacity']):
+        if 'grab_info_size' in hits:
             return "A 6-wheel grab lorry typically has a capacity of around 12 to 14 tonnes, while an 8-wheel grab lorry can usually carry approximately 16 to 18 tonnes. These capacities can vary based on the specific vehicle and the type of material being collected."
         
         # Access requirements
-        elif any(phrase in message_lower for phrase in ['access', 'requirements', 'space needed']):
+        elif 'grab_info_access' in hits:
             return ("Access requirements for grab lorries generally include: Width clearance of around 3 meters, stable ground conditions to support the lorry weight, sufficient space for the grab arm to operate safely (usually requires about 6 meters radius), and a clear access route suitable for heavy vehicles. If you have concerns about access, it might be helpful to discuss them directly with our team at 0370 343 9990.")
         
         # What waste can grab take
-        elif any(phrase in message_lower for phrase in ['what waste', 'what can', 'green waste', 'materials']):
+        elif 'grab_info_waste' in hits:
             return "For more information around grab lorries and what materials they can take, I recommend contacting our team directly at 0370 343 9990 for the most accurate information."
         
         # Soil and hardcore question
-        elif any(phrase in message_lower for phrase in ['soil and hardcore', 'mixed materials']):
+        elif 'grab_info_mixed' in hits:
             return "For inquiries about specific materials like soil and hardcore being collected in one load, I recommend contacting our team directly at 0370 343 9990. They will provide the most accurate information about material combinations."
         
         # Small amount recommendation
-        elif any(phrase in message_lower for phrase in ['small amount', 'not much', 'little bit']):
+        elif 'grab_info_small' in hits:
             return "If you have a smaller amount of soil to remove, skip hire is the best option to remove small amounts of heavy materials. The largest skip you can have for soil is 8-yard."
         
         else:
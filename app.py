@@ -1,26 +1,61 @@
 import os
-import re
 import json
+import asyncio
 import requests
 import traceback
+import itertools
+import base64
+import time
+import bisect
+import threading
+from collections import OrderedDict, namedtuple
 from datetime import datetime
 from typing import Dict, List, Optional
 from openai import OpenAI
-from flask import Flask, request, jsonify, render_template_string, redirect, url_for
+from flask import Flask, Response, request, jsonify, render_template_string, redirect, url_for
 from flask_cors import CORS
+from utils.conversation_store import create_conversation_store, MemoryConversationStore
+from utils.conversation_state import ConversationState
+from utils.conversation_ids import conversation_ids
+from utils.keyword_matcher import KeywordMatcher
+from utils.rules_registry import RulesRegistry
+from utils.extraction import Extractor
+from utils.postcodes import postcode_index
+from utils.live_feed import LiveFeed
+from utils.dashboard_events import create_dashboard_events, DASHBOARD_SYNC_INTERVAL
+from utils.time_series import RollingCounters, window_label
+from utils.state_cache import BoundedStateCache, SpillFile, call_finished, LIVE_CALLS_TTL, LIVE_CALLS_MAX_ENTRIES
 
 # API Integration
 try:
-    from utils.wasteking_api import complete_booking, create_booking, get_pricing, create_payment_link
+    from utils.wasteking_api import complete_booking, create_booking, get_pricing, create_payment_link, resume_booking, acquire_booking
+    from utils.wasteking_api import booking_pool, pricing_flight, remember_price_matrix, price_from_matrix, fetch_comparison_quote
+    from utils.wasteking_api import speculative_pricer
+    from utils.wasteking_async import async_client, worker_loop, ASYNC_TURNS_ENABLED
+    from utils.circuit_breaker import circuit_breaker
+    from utils.price_cache import price_cache
     API_AVAILABLE = True
 except ImportError:
     API_AVAILABLE = False
+    price_cache = None
+    booking_pool = None
+    pricing_flight = None
+    speculative_pricer = None
+    async_client = None
+    worker_loop = None
+    ASYNC_TURNS_ENABLED = False
+    circuit_breaker = None
     print("WARNING: Live wasteking_api module not found. The system cannot process bookings.")
     print("API calls will fail gracefully, routing customers to a human agent.")
     def create_booking(): return {'success': False, 'error': 'API unavailable'}
     def get_pricing(*args, **kwargs): return {'success': False, 'error': 'API unavailable'}
     def complete_booking(*args, **kwargs): return {'success': False, 'error': 'API unavailable'}
     def create_payment_link(*args, **kwargs): return {'success': False, 'error': 'API unavailable'}
+    def resume_booking(*args, **kwargs): return {'success': False, 'error': 'API unavailable'}
+    def acquire_booking(): return {'success': False, 'error': 'API unavailable'}
+    def remember_price_matrix(*args, **kwargs): return None
+    def price_from_matrix(*args, **kwargs): return None
+    def fetch_comparison_quote(*args, **kwargs): return {}
 
 # --- HARDCODED BUSINESS RULES ---
 OFFICE_HOURS = {
@@ -179,6 +214,79 @@ CONVERSATION_STANDARDS = {
     'human_request': "Yes I can see if someone is available. What is your company name? What is the call regarding?"
 }
 
+# Skip / man & van sizes customers ask for by name
+SIZE_PHRASES = {
+    '8yd': ['8-yard', '8 yard', '8yd', 'eight yard', 'eight-yard'],
+    '6yd': ['6-yard', '6 yard', '6yd'],
+    '4yd': ['4-yard', '4 yard', '4yd'],
+    '12yd': ['12-yard', '12 yard', '12yd']
+}
+
+# Skip vs man & van comparison quote (mav_suggestion rule)
+COMPARISON_TRIGGERS = ['compare', 'quote both', 'both options', 'both prices', 'both quotes', 'skip or man', 'skip or a man', 'skip vs', 'skip versus', 'cheaper option']
+COMPARISON_LABELS = {'skip': 'skip', 'mav': 'man & van'}
+
+# Every keyword list the agents check, compiled once per rule set - one pass per message finds every category
+def keyword_tables(rules):
+    return {
+        'director': rules['TRANSFER_RULES']['management_director']['triggers'],
+        'complaint': rules['TRANSFER_RULES']['complaints']['triggers'],
+        **{f'lg_{service_type}': config['triggers'] for service_type, config in rules['LG_SERVICES'].items()},
+        'location_query': ['depot close by', 'local to me', 'near me'],
+        'human_request': ['speak to human', 'talk to person', 'human agent'],
+        'name_kanchan': ['kanchen', 'kanchan'],
+        'name_jackie': ['jackie'],
+        'service_skip': ['skip', 'skip hire', 'container hire'],
+        'service_mav': ['house clearance', 'man and van', 'mav', 'furniture', 'appliance', 'van collection'],
+        'service_grab': ['grab hire', 'grab lorry', '8 wheeler', '6 wheeler', 'soil removal', 'rubble removal'],
+        **{f'size_{size}': phrases for size, phrases in SIZE_PHRASES.items()},
+        'route_skip': ['skip', 'skip hire', 'yard skip', 'cubic yard'],
+        'route_mav': ['man and van', 'mav', 'man & van', 'van collection', 'house clearance', 'clearance'],
+        'booking': ['payment link', 'pay link', 'book it', 'book this', 'complete booking', 'proceed with booking', 'confirm booking'],
+        'positive': ['yes', 'yeah', 'yep', 'ok', 'okay', 'alright', 'sure'],
+        'comparison': COMPARISON_TRIGGERS,
+        'skip_heavy': ['soil', 'rubble', 'concrete', 'bricks', 'heavy'],
+        'plasterboard': ['plasterboard'],
+        'restricted_items': ['fridge', 'mattress', 'freezer'],
+        'upholstery': ['sofa', 'chair', 'upholstery', 'furniture'],
+        'prohibited_query': ['what cannot put', 'what can\'t put', 'prohibited', 'not allowed'],
+        'permit': ['permit'],
+        'cost_query': ['cost', 'price', 'charge'],
+        'mav_heavy': ['soil', 'rubble', 'bricks', 'concrete', 'tiles', 'heavy'],
+        'sunday': ['sunday'],
+        'time_query': ['what time', 'specific time', 'exact time', 'morning', 'afternoon'],
+        'wheeler_8': ['8 wheeler', '8-wheeler'],
+        'wheeler_6': ['6 wheeler', '6-wheeler'],
+        'soil_rubble': ['soil', 'rubble', 'muckaway', 'dirt', 'earth', 'concrete'],
+        'other_materials': ['wood', 'furniture', 'plastic', 'metal', 'general', 'mixed']
+    }
+
+def compile_rules(rules):
+    return {'keywords': KeywordMatcher(keyword_tables(rules))}
+
+# Business rules hot-reloaded from the rules file ("app" section) - read through rules_registry.current
+rules_registry = RulesRegistry('app', {
+    'TRANSFER_RULES': TRANSFER_RULES,
+    'LG_SERVICES': LG_SERVICES,
+    'SKIP_HIRE_RULES': SKIP_HIRE_RULES,
+    'MAV_RULES': MAV_RULES,
+    'GRAB_RULES': GRAB_RULES
+}, compile_rules)
+
+# Customer details pulled out of each message - compiled once into one scanner, first pattern listed wins
+EXTRACTION_PATTERNS = {
+    'postcode': [r'([A-Za-z]{1,2}\d{1,2}[A-Za-z]?\s*\d[A-Za-z]{2})'],
+    'phone': [r'\b(\d{11})\b', r'\b(\d{5})\s+(\d{6})\b', r'\b(\d{4})\s+(\d{6})\b', r'\((\d{4,5})\)\s*(\d{6})\b'],
+    'firstName': [r'[Nn]ame\s+(?:is\s+)?([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)', r'^([A-Z][a-z]+)\s+']
+}
+extractor = Extractor(EXTRACTION_PATTERNS)
+
+def detect_size(message):
+    hits = rules_registry.current.keywords.scan(message)
+    for size in SIZE_PHRASES:
+        if f'size_{size}' in hits: return size
+    return None
+
 # --- WEBHOOK & SMS NOTIFICATION ---
 def is_business_hours():
     now = datetime.now()
@@ -241,143 +349,507 @@ class OpenAIQuestionValidator:
             print(f"OpenAI response generation error: {e}")
             return f"Thank you! I have all your details and I'm getting your {service_type} quote now."
 
+# Dashboard call listing - NO HARDCODING
+DASHBOARD_PAGE_SIZE = int(os.getenv('WASTEKING_DASHBOARD_PAGE_SIZE', '50'))
+DASHBOARD_MAX_PAGE_SIZE = int(os.getenv('WASTEKING_DASHBOARD_MAX_PAGE_SIZE', '200'))
+
+# Fields a call can be projected to; the summary leaves out the full history
+CALL_SUMMARY_FIELDS = ('id', 'timestamp', 'updated_at', 'stage', 'status', 'collected_data', 'price', 'last_message', 'message_count')
+CALL_FIELDS = CALL_SUMMARY_FIELDS + ('history',)
+_DERIVED_CALL_FIELDS = {
+    'last_message': lambda call: call['history'][-1] if call['history'] else None,
+    'message_count': lambda call: len(call['history'])
+}
+
+
+def project_call(call, fields=CALL_SUMMARY_FIELDS):
+    return {field: _DERIVED_CALL_FIELDS[field](call) if field in _DERIVED_CALL_FIELDS else call.get(field) for field in fields}
+
+
+def parse_call_fields(fields_param):
+    """'id,stage,price' -> field tuple; ValueError for unknown fields"""
+    if not fields_param:
+        return CALL_SUMMARY_FIELDS
+    fields = tuple(field.strip() for field in fields_param.split(',') if field.strip())
+    unknown = [field for field in fields if field not in CALL_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)} (allowed: {', '.join(CALL_FIELDS)})")
+    return fields
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, conversation_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (str(timestamp), str(conversation_id))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
 # DASHBOARD MANAGER
 class DashboardManager:
-    def __init__(self):
-        self.live_calls = {}
+    """Every worker keeps the same dashboard by replaying one shared log of call updates, in order"""
+
+    def __init__(self, events=None):
+        # Call updates from every worker (sqlite), or just this one's with the memory conversation store
+        self.events = events if events is not None else create_dashboard_events()
+        # Running aggregates over live_calls, kept in step by update_call and evictions - O(1) to read.
+        # These go down when a call ages out, so they describe the tracked window, not all time
+        self.completed_count = 0
+        self.service_counts = {}
+        self.stage_counts = {}
+        # Last-updated order: an update moves the call to the end, so "latest N" is N steps from the end
+        self.updated_calls = OrderedDict()  # id -> call, least recently updated first
+        self.active_calls = OrderedDict()  # same order, active calls only
+        self.call_index = []  # sorted (started timestamp, id) of every live call - cursor paging
+        # User dashboard push channel - deltas from update_call instead of clients polling
+        self.feed = LiveFeed()
+        # Rolling 5m / 1h / 24h counts per service - ('skip', 'completed') etc, 'all' for every service
+        self.analytics = RollingCounters()
+        # Bounded: idle calls age out, the least recently updated go first when full
+        self.live_calls = BoundedStateCache('live_calls', LIVE_CALLS_TTL, LIVE_CALLS_MAX_ENTRIES,
+                                            SpillFile('live_calls.jsonl'), self._spill_here, self._uncount_call)
+        # All-time counts under the analytics keys - only ever go up, evictions never touch them.
+        # Taken from the log at startup; the replay below only adds updates made after that
+        self._totals_seq, self.totals = self.events.snapshot()
+        self.counting_since = datetime.fromtimestamp(self.events.since).isoformat()
+        self._applied_seq = 0
+        self._sync_lock = threading.RLock()
+        self._syncer = None
+        self._syncer_pid = None
+        self._watching = False
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork_in_child)
+        self.sync()
+
+    def _spill_here(self, call):
+        # Every worker evicts its copy - only the one that wrote the last update spills it
+        return call_finished(call) and call.get('worker') == os.getpid()
+    
+    def _count_call(self, call, delta):
+        if call['status'] == 'completed':
+            self.completed_count += delta
+        elif delta > 0:
+            self.active_calls[call['id']] = call
+        else:
+            self.active_calls.pop(call['id'], None)
+        for counts, key in ((self.service_counts, call.get('collected_data', {}).get('service', 'unknown')),
+                            (self.stage_counts, call.get('stage', 'unknown'))):
+            counts[key] = counts.get(key, 0) + delta
+            if not counts[key]:
+                del counts[key]
+    
+    def _uncount_call(self, conversation_id, call):
+        # Runs under the live_calls lock whenever a call is evicted or removed
+        self._count_call(call, -1)
+        self.updated_calls.pop(conversation_id, None)
+        key = (call['timestamp'], conversation_id)
+        position = bisect.bisect_left(self.call_index, key)
+        if position < len(self.call_index) and self.call_index[position] == key:
+            del self.call_index[position]
+        self.feed.publish('call_removed', {'id': conversation_id, **self._counts()})
+    
+    def _counts(self):
+        return {'active_calls': len(self.active_calls), 'total_calls': self.totals.get(('all', 'calls'), 0),
+                'tracked_calls': len(self.live_calls)}
+    
+    def _analytics_events(self, existing_call, call):
+        service = call['collected_data'].get('service') or 'unknown'
+        events = []
+        if not existing_call:
+            events.append(('all', 'calls'))
+        if service != 'unknown' and existing_call.get('collected_data', {}).get('service') != service:
+            events.append((service, 'calls'))
+        if call['stage'] != existing_call.get('stage'):
+            if call['stage'] == 'completed':
+                events += [(service, 'completed'), ('all', 'completed')]
+            elif call['stage'] == 'transfer_completed':
+                events += [(service, 'transferred'), ('all', 'transferred')]
+        if call['price'] and not existing_call.get('price'):
+            events += [(service, 'quoted'), ('all', 'quoted')]
+        return events
     
     def update_call(self, conversation_id, data):
         status = 'active' if data.get('stage') not in ['completed', 'transfer_completed'] else 'completed'
         
-        existing_call = self.live_calls.get(conversation_id, {})
-        merged_data = {
-            'id': conversation_id,
-            'timestamp': existing_call.get('timestamp', datetime.now().isoformat()),
-            'stage': data.get('stage', existing_call.get('stage', 'unknown')),
-            'collected_data': {**existing_call.get('collected_data', {}), **data.get('collected_data', {})},
-            'history': data.get('history', existing_call.get('history', [])),
-            'price': data.get('price', existing_call.get('price')),
-            'status': status
-        }
-        self.live_calls[conversation_id] = merged_data
+        with self._sync_lock:
+            # Merge onto the latest version, whichever worker wrote it
+            self.sync()
+            with self.live_calls.lock:
+                existing_call = self.live_calls.get(conversation_id, {})
+                merged_data = {
+                    'id': conversation_id,
+                    'timestamp': existing_call.get('timestamp', datetime.now().isoformat()),
+                    'updated_at': datetime.now().isoformat(),
+                    'stage': data.get('stage', existing_call.get('stage', 'unknown')),
+                    'collected_data': {**existing_call.get('collected_data', {}), **data.get('collected_data', {})},
+                    'history': list(data.get('history', existing_call.get('history', []))),
+                    'price': data.get('price', existing_call.get('price')),
+                    'status': status,
+                    'worker': os.getpid()
+                }
+                metrics = self._analytics_events(existing_call, merged_data)
+            self.events.append(merged_data, metrics, time.time())
+            self.sync()
+    
+    def sync(self):
+        """Apply every call update logged since the last sync - this worker's and the others'"""
+        with self._sync_lock:
+            for seq, call, metrics, at in self.events.read_since(self._applied_seq):
+                self._apply(seq, call, metrics, at)
+                self._applied_seq = seq
+    
+    def _apply(self, seq, call, metrics, at):
+        with self.live_calls.lock:
+            conversation_id = call['id']
+            existing_call = self.live_calls.peek(conversation_id)
+            if existing_call is not None and existing_call['timestamp'] != call['timestamp']:
+                # Aged out on the worker that wrote this update and started again - ours goes the same way
+                self.live_calls.pop(conversation_id)
+                existing_call = None
+            if existing_call is not None:
+                self._count_call(existing_call, -1)
+            else:
+                # New calls start now, so this is almost always an append
+                bisect.insort(self.call_index, (call['timestamp'], conversation_id))
+            self.live_calls.put(conversation_id, call, age=max(time.time() - at, 0))
+            self.updated_calls[conversation_id] = call
+            self.updated_calls.move_to_end(conversation_id)
+            self._count_call(call, 1)
+            # Cohort analytics: everything a call does counts in the bucket where it started, so a
+            # window's rates are over the calls that started in it and can't pass 100%
+            started_at = datetime.fromisoformat(call['timestamp']).timestamp()
+            for key in metrics:
+                self.analytics.add(key, at=started_at)
+                if seq > self._totals_seq:
+                    self.totals[key] = self.totals.get(key, 0) + 1
+            
+            if self.feed.has_clients:
+                if existing_call is None:
+                    event = 'call_started'
+                elif call['stage'] != existing_call.get('stage'):
+                    event = 'stage_changed'
+                elif call['price'] != existing_call.get('price'):
+                    event = 'price_set'
+                else:
+                    event = 'call_updated'
+                self.feed.publish(event, {'call': project_call(call), **self._counts()})
+    
+    def start(self):
+        """Push other workers' call updates to this worker's live feed clients as they happen"""
+        if self.events.shared and DASHBOARD_SYNC_INTERVAL > 0:
+            self._watching = True
+            self._ensure_syncer()
+    
+    def _after_fork_in_child(self):
+        # Threads don't survive fork - the child replays the log from where the parent was
+        self._sync_lock = threading.RLock()
+        self._syncer = None
+        self._syncer_pid = None
+        if self._watching:
+            self._ensure_syncer()
+    
+    def _ensure_syncer(self):
+        pid = os.getpid()
+        if self._syncer is None or self._syncer_pid != pid or not self._syncer.is_alive():
+            self._syncer = threading.Thread(target=self._sync_loop, name='dashboard-sync', daemon=True)
+            self._syncer_pid = pid
+            self._syncer.start()
+    
+    def _sync_loop(self):
+        while True:
+            time.sleep(DASHBOARD_SYNC_INTERVAL)
+            if not self.feed.has_clients:
+                # Nobody is watching - reads catch up for themselves
+                continue
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"⚠️ DASHBOARD SYNC ERROR: {e}")
+    
+    def recent_calls(self, count, active_only=False):
+        """The `count` most recently updated calls (optionally active only), oldest first - O(count)"""
+        index = self.active_calls if active_only else self.updated_calls
+        with self.live_calls.lock:
+            return [index[key] for key in itertools.islice(reversed(index), count)][::-1]
     
     def get_user_dashboard_data(self):
-        active_calls = [call for call in self.live_calls.values() if call['status'] == 'active']
+        self.sync()
+        with self.live_calls.lock:
+            return {
+                **self._counts(),
+                'live_calls': self.recent_calls(10),
+                'timestamp': datetime.now().isoformat(),
+                'has_data': len(self.live_calls) > 0
+            }
+    
+    def get_user_feed_snapshot(self):
+        self.sync()
+        with self.live_calls.lock:
+            return {'calls': [project_call(call) for call in self.recent_calls(10)], **self._counts()}
+    
+    def list_calls(self, cursor=None, limit=DASHBOARD_PAGE_SIZE, fields=CALL_SUMMARY_FIELDS, status=None):
+        """One page of calls, newest started first; pass next_cursor back for the following page"""
+        self.sync()
+        limit = max(1, min(limit, DASHBOARD_MAX_PAGE_SIZE))
+        with self.live_calls.lock:
+            position = bisect.bisect_left(self.call_index, decode_cursor(cursor)) if cursor else len(self.call_index)
+            calls = []
+            while position > 0 and len(calls) < limit:
+                position -= 1
+                key = self.call_index[position]
+                call = self.live_calls.peek(key[1])
+                if call is not None and (status is None or call['status'] == status):
+                    calls.append(project_call(call, fields))
+            next_cursor = encode_cursor(key) if position > 0 and len(calls) == limit else None
+            tracked_calls = len(self.live_calls)
+        return {'calls': calls, 'next_cursor': next_cursor, 'tracked_calls': tracked_calls}
+    
+    def get_call(self, conversation_id, fields=CALL_FIELDS):
+        """One call with its full history (by default), or None - doesn't keep the call alive"""
+        self.sync()
+        call = self.live_calls.peek(conversation_id)
+        return project_call(call, fields) if call is not None else None
+    
+    def get_analytics(self):
+        """Throughput, conversion and transfer rate per service for the calls that started in each rolling window"""
+        self.sync()
+        services = sorted({service for service, _ in self.analytics.keys()} - {'all'})
+        windows = {}
+        for service in ['all'] + services:
+            totals = {metric: self.analytics.totals((service, metric)) for metric in ('calls', 'quoted', 'completed', 'transferred')}
+            for seconds in self.analytics.windows:
+                calls = totals['calls'][seconds]
+                windows.setdefault(window_label(seconds), {})[service] = {
+                    **{metric: counts[seconds] for metric, counts in totals.items()},
+                    'calls_per_hour': round(calls * 3600 / seconds, 1),
+                    'conversion_rate': round(min(totals['completed'][seconds] / calls * 100, 100), 1) if calls > 0 else 0,
+                    'transfer_rate': round(min(totals['transferred'][seconds] / calls * 100, 100), 1) if calls > 0 else 0
+                }
         return {
-            'active_calls': len(active_calls),
-            'live_calls': list(self.live_calls.values())[-10:] if self.live_calls else [],
-            'timestamp': datetime.now().isoformat(),
-            'total_calls': len(self.live_calls),
-            'has_data': len(self.live_calls) > 0
+            'windows': windows,
+            'resolution_seconds': self.analytics.resolution,
+            'calls_last_hour': self.analytics.series(('all', 'calls'), 3600),
+            'timestamp': datetime.now().isoformat()
         }
     
     def get_manager_dashboard_data(self):
-        total_calls = len(self.live_calls)
-        completed_calls = len([call for call in self.live_calls.values() if call['status'] == 'completed'])
-        
-        services = {}
-        for call in self.live_calls.values():
-            service = call.get('collected_data', {}).get('service', 'unknown')
-            services[service] = services.get(service, 0) + 1
+        """All-time totals, the tracked window's breakdowns and the latest calls - the same cost with 100 or 1,000,000 calls"""
+        self.sync()
+        with self.live_calls.lock:
+            self.live_calls.sweep()
+            # All time since counting_since
+            total_calls = self.totals.get(('all', 'calls'), 0)
+            completed_calls = self.totals.get(('all', 'completed'), 0)
+            services = {service: count for (service, metric), count in self.totals.items() if metric == 'calls' and service != 'all'}
+            # Calls still tracked in live_calls - these shrink as calls age out
+            tracked_calls = len(self.live_calls)
+            tracked_completed = self.completed_count
+            tracked_services = dict(self.service_counts)
+            stages = dict(self.stage_counts)
+            active_count = len(self.active_calls)
+            active_calls = [project_call(call) for call in self.recent_calls(20, active_only=True)]
+            recent_calls = [project_call(call) for call in self.recent_calls(20)]
             
         return {
             'total_calls': total_calls,
             'completed_calls': completed_calls,
-            'conversion_rate': (completed_calls / total_calls * 100) if total_calls > 0 else 0,
+            'conversion_rate': min(completed_calls / total_calls * 100, 100) if total_calls > 0 else 0,
             'service_breakdown': services,
+            'counting_since': self.counting_since,
+            'tracked_calls': tracked_calls,
+            'tracked_completed_calls': tracked_completed,
+            'tracked_service_breakdown': tracked_services,
+            'tracked_stage_breakdown': stages,
+            'active_count': active_count,
             'timestamp': datetime.now().isoformat(),
-            'individual_calls': list(self.live_calls.values()),
-            'recent_calls': list(self.live_calls.values())[-20:],
-            'active_calls': [call for call in self.live_calls.values() if call['status'] == 'active']
+            'recent_calls': recent_calls,
+            'active_calls': active_calls,
+            'api_health': circuit_breaker.snapshot() if circuit_breaker is not None else []
         }
 
+# A turn that needs the WasteKing API: 'price', 'compare' or 'book'
+ApiStep = namedtuple('ApiStep', ['kind', 'wants_to_book'], defaults=[False])
+
 # --- AGENT BASE CLASS ---
 class BaseAgent:
     def __init__(self):
-        self.conversations = {}
+        self.conversations = MemoryConversationStore()
+        self.prefetched_quotes = {}
+        self.prefetched_bookings = {}
+        self.prefetched_comparisons = {}
+
+    async def process_message_async(self, message, conversation_id):
+        """Async entry point: the same turn as process_message, with its WasteKing round trips awaited on the event loop"""
+        state, response, step = await asyncio.to_thread(self.plan_turn, message, conversation_id)
+        if response is not None:
+            return response
+        try:
+            if isinstance(step, ApiStep):
+                await self.prefetch(step, state, conversation_id)
+            # Anything the prefetch didn't cover, plus webhooks and SMS, still blocks - keep it off the event loop
+            response = await asyncio.to_thread(self.run_step, step, state, conversation_id)
+        finally:
+            # Never carry an unused prefetch into a later turn
+            self.prefetched_quotes.pop(conversation_id, None)
+            self.prefetched_comparisons.pop(conversation_id, None)
+            self.prefetched_bookings.pop(conversation_id, None)
+        return await asyncio.to_thread(self.finish_turn, state, response, conversation_id)
+
+    async def prefetch(self, step, state, conversation_id):
+        """Await the API calls run_step is about to make, so it finds their results instead of blocking"""
+        if async_client is None or not API_AVAILABLE:
+            return
+        collected = state['collected_data']
+        try:
+            if step.kind == 'compare':
+                self.prefetched_comparisons[conversation_id] = await async_client.fetch_comparison_quote(
+                    collected.get('postcode'), collected.get('type') or self.default_type)
+            elif step.kind == 'book':
+                customer_data = {**collected, 'price': state.get('price'), 'booking_ref': state.get('booking_ref')}
+                if state.get('booking_ref') and state.get('price'):
+                    self.prefetched_bookings[conversation_id] = await async_client.resume_booking(
+                        customer_data, state['booking_ref'], state['price'], state.get('booking_bound', True))
+                else:
+                    self.prefetched_bookings[conversation_id] = await async_client.complete_booking(customer_data)
+            elif postcode_index.validate(collected.get('postcode')) and not self.matrix_quote(state):
+                quote = None
+                if speculative_pricer is not None and speculative_pricer.pending(
+                        conversation_id, collected.get('postcode'), collected.get('service'), collected.get('type')):
+                    # claim() may wait for a speculation that is still in flight
+                    quote = await asyncio.to_thread(speculative_pricer.claim, conversation_id, collected.get('postcode'),
+                                                    collected.get('service'), collected.get('type'))
+                self.prefetched_quotes[conversation_id] = quote or await async_client.fetch_quote(
+                    collected.get('postcode'), collected.get('service'), collected.get('type'))
+        except Exception:
+            # run_step falls back to the blocking calls
+            traceback.print_exc()
 
     def process_message(self, message, conversation_id):
-        state = self.conversations.get(conversation_id, {'history': [], 'collected_data': {}, 'stage': 'initial'})
+        state, response, step = self.plan_turn(message, conversation_id)
+        if response is not None:
+            return response
+        response = self.run_step(step, state, conversation_id)
+        return self.finish_turn(state, response, conversation_id)
+
+    def plan_turn(self, message, conversation_id):
+        """Apply the message to the state and decide the reply: (state, finished response or None, next step)"""
+        state = self.conversations.get(conversation_id) or ConversationState()
         state['history'].append(f"Customer: {message}")
         
         special_response = self.check_special_rules(message, state)
         if special_response:
             state['history'].append(f"Agent: {special_response['response']}")
             state['stage'] = special_response.get('stage', 'transfer_completed')
-            send_webhook(conversation_id, {'collected_data': state['collected_data'], 'history': state['history'], 'stage': state['stage']}, special_response.get('reason', 'transfer'))
-            self.conversations[conversation_id] = state.copy()
-            return special_response['response']
+            send_webhook(conversation_id, {'collected_data': state['collected_data'], 'history': list(state['history']), 'stage': state['stage']}, special_response.get('reason', 'transfer'))
+            if speculative_pricer is not None and state['stage'] == 'transfer_completed':
+                speculative_pricer.discard(conversation_id)
+            self.conversations[conversation_id] = state
+            return state, special_response['response'], None
 
         new_data = self.extract_data(message)
-        state['collected_data'].update(new_data)
-        
-        response = self.get_next_response(message, state, conversation_id)
+        self.switch_service(state, new_data)
+        if state.get('price') and new_data.get('type') and new_data['type'] != state['collected_data'].get('type'):
+            # Size change after a quote - re-quote, from the stored price matrix while it is fresh
+            state.pop('price')
+        state.collect(new_data)
+        self.speculate_pricing(state, conversation_id)
         
+        return state, None, self.next_step(message, state, conversation_id)
+
+    def run_step(self, step, state, conversation_id):
+        """Carry out what next_step decided - text is the reply itself, an ApiStep makes its API calls"""
+        if not isinstance(step, ApiStep):
+            return step
+        if step.kind == 'compare':
+            return self.get_comparison_quote(state, conversation_id)
+        if step.kind == 'book':
+            return self.complete_booking(state, conversation_id)
+        return self.get_pricing(state, conversation_id, step.wants_to_book)
+
+    def finish_turn(self, state, response, conversation_id):
         state['history'].append(f"Agent: {response}")
         state['stage'] = self.get_stage_from_response(response, state)
-        self.conversations[conversation_id] = state.copy()
+        self.conversations[conversation_id] = state
         
         return response
 
+    def speculate_pricing(self, state, conversation_id):
+        """Price in the background as soon as postcode and service are known, while we still ask for name and phone"""
+        collected = state['collected_data']
+        if speculative_pricer is None or state.get('price') or not collected.get('postcode') or not collected.get('service'):
+            return
+        if all(collected.get(f) for f in REQUIRED_FIELDS.get(self.service_type, [])):
+            return  # this turn prices anyway
+        speculative_pricer.speculate(conversation_id, collected['postcode'], collected['service'], collected.get('type'))
+
+    def switch_service(self, state, new_data):
+        """Service change after a quote: re-quote, taking over the comparison quote for that service if there is one"""
+        service = new_data.get('service')
+        if not service or service == state['collected_data'].get('service'):
+            return
+        state.pop('price', None)
+        alternative = state.pop('comparison', {}).get(service)
+        if alternative:
+            state['booking_ref'] = alternative['booking_ref']
+            state['bound_type'] = alternative['bound_type']
+            state['price_matrix'] = alternative['price_matrix']
+            state['collected_data']['type'] = alternative['type']
+            # They have already seen this price - no need to explain volumes first
+            state['collected_data']['volume_provided'] = True
+
     def check_special_rules(self, message, state):
-        message_lower = message.lower()
+        rules = rules_registry.current
+        hits = rules.keywords.scan(message)
         
-        if any(trigger in message_lower for trigger in TRANSFER_RULES['management_director']['triggers']):
-            return {'response': TRANSFER_RULES['management_director']['out_of_hours'], 'stage': 'transfer_completed', 'reason': 'director_request'}
-        if any(complaint in message_lower for complaint in TRANSFER_RULES['complaints']['triggers']):
-            return {'response': TRANSFER_RULES['complaints']['out_of_hours'], 'stage': 'transfer_completed', 'reason': 'complaint'}
-        for service_type, config in LG_SERVICES.items():
-            if any(trigger in message_lower for trigger in config['triggers']):
+        if 'director' in hits:
+            return {'response': rules.TRANSFER_RULES['management_director']['out_of_hours'], 'stage': 'transfer_completed', 'reason': 'director_request'}
+        if 'complaint' in hits:
+            return {'response': rules.TRANSFER_RULES['complaints']['out_of_hours'], 'stage': 'transfer_completed', 'reason': 'complaint'}
+        for service_type, config in rules.LG_SERVICES.items():
+            if f'lg_{service_type}' in hits:
                 if service_type == 'waste_bags':
-                    return {'response': LG_SERVICES['waste_bags']['scripts']['info'], 'stage': 'info_provided', 'reason': 'waste_bags'}
+                    return {'response': rules.LG_SERVICES['waste_bags']['scripts']['info'], 'stage': 'info_provided', 'reason': 'waste_bags'}
                 return {'response': config['scripts']['transfer'], 'stage': 'transfer_completed', 'reason': f'lg_service_{service_type}'}
 
-        if any(term in message_lower for term in ['depot close by', 'local to me', 'near me']):
+        if 'location_query' in hits:
             return {'response': CONVERSATION_STANDARDS['location_response'], 'stage': 'info_provided', 'reason': 'location_query'}
-        if any(term in message_lower for term in ['speak to human', 'talk to person', 'human agent']):
+        if 'human_request' in hits:
             return {'response': CONVERSATION_STANDARDS['human_request'], 'stage': 'transfer_completed', 'reason': 'human_request'}
         
         return None
 
-    def get_next_response(self, message, state, conversation_id):
-        raise NotImplementedError("Subclass must implement get_next_response method")
+    def next_step(self, message, state, conversation_id):
+        """The reply text, or the ApiStep that produces it - decided without calling the API"""
+        raise NotImplementedError("Subclass must implement next_step method")
     
     def extract_data(self, message):
         data = {}
-        message_lower = message.lower()
+        hits = rules_registry.current.keywords.scan(message)
+        fields = extractor.extract(message)
         
-        postcode_match = re.search(r'([A-Z]{1,2}\d{1,2}[A-Z]?\s*\d[A-Z]{2})', message.upper())
-        if postcode_match:
-            postcode = postcode_match.group(1).replace(' ', '')
-            if len(postcode) >= 5: data['postcode'] = postcode
+        if 'postcode' in fields:
+            # Only real postcodes are kept - a mistyped one is asked for again, not priced
+            postcode = postcode_index.validate(fields['postcode'].value)
+            if postcode: data['postcode'] = postcode
+            else: data['rejected_postcode'] = fields['postcode'].value
+        if 'phone' in fields: data['phone'] = fields['phone'].value
         
-        phone_patterns = [r'\b(\d{11})\b', r'\b(\d{5})\s+(\d{6})\b', r'\b(\d{4})\s+(\d{6})\b', r'\((\d{4,5})\)\s*(\d{6})\b']
-        for pattern in phone_patterns:
-            phone_match = re.search(pattern, message)
-            if phone_match:
-                phone_number = ''.join([group for group in phone_match.groups() if group])
-                if len(phone_number) >= 10: data['phone'] = phone_number; break
+        if 'name_kanchan' in hits: data['firstName'] = 'Kanchan'
+        elif 'name_jackie' in hits: data['firstName'] = 'Jackie'
+        elif 'firstName' in fields: data['firstName'] = fields['firstName'].value
         
-        if 'kanchen' in message_lower or 'kanchan' in message_lower: data['firstName'] = 'Kanchan'
-        elif 'jackie' in message_lower: data['firstName'] = 'Jackie'
-        else:
-            name_patterns = [r'[Nn]ame\s+(?:is\s+)?([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)', r'^([A-Z][a-z]+)\s+']
-            for pattern in name_patterns:
-                name_match = re.search(pattern, message)
-                if name_match:
-                    potential_name = name_match.group(1).strip().title()
-                    if potential_name.lower() not in ['yes', 'no', 'there', 'what', 'how', 'confirmed', 'phone', 'please']:
-                        data['firstName'] = potential_name; break
+        if 'service_skip' in hits: data['service'] = 'skip'
+        elif 'service_mav' in hits: data['service'] = 'mav'
+        elif 'service_grab' in hits: data['service'] = 'grab'
         
-        if any(word in message_lower for word in ['skip', 'skip hire', 'container hire']): data['service'] = 'skip'
-        elif any(phrase in message_lower for phrase in ['house clearance', 'man and van', 'mav', 'furniture', 'appliance', 'van collection']): data['service'] = 'mav'
-        elif any(phrase in message_lower for phrase in ['grab hire', 'grab lorry', '8 wheeler', '6 wheeler', 'soil removal', 'rubble removal']): data['service'] = 'grab'
-        
-        if data.get('service') == 'skip':
-            if any(size in message_lower for size in ['8-yard', '8 yard', '8yd', 'eight yard', 'eight-yard']): data['type'] = '8yd'
-            elif any(size in message_lower for size in ['6-yard', '6 yard', '6yd']): data['type'] = '6yd'
-            elif any(size in message_lower for size in ['4-yard', '4 yard', '4yd']): data['type'] = '4yd'
-            elif any(size in message_lower for size in ['12-yard', '12 yard', '12yd']): data['type'] = '12yd'
+        # Sizes count on their own too, so "actually make it a 6 yard" changes the quote
+        if data.get('service') != 'grab':
+            size = detect_size(message)
+            if size: data['type'] = size
         
         return data
 
@@ -393,10 +865,11 @@ class BaseAgent:
         return 'processing'
 
     def should_book(self, message):
-        booking_phrases = ['payment link', 'pay link', 'book it', 'book this', 'complete booking', 'proceed with booking', 'confirm booking']
-        if any(phrase in message.lower() for phrase in booking_phrases): return True
-        return any(word in message.lower() for word in ['yes', 'yeah', 'yep', 'ok', 'okay', 'alright', 'sure'])
+        return rules_registry.current.keywords.scan(message).any('booking', 'positive')
     
+    def wants_comparison(self, message):
+        return self.service_type in COMPARISON_LABELS and 'comparison' in rules_registry.current.keywords.scan(message)
+
     def needs_transfer(self, service_type, price):
         if service_type == 'skip': return False
         if service_type == 'mav' and price >= 500: return True
@@ -409,17 +882,32 @@ class BaseAgent:
             return "I'm sorry, our pricing system is currently unavailable. Let me connect you with our team."
             
         try:
-            booking_result = create_booking()
+            collected = state.get('collected_data', {})
+            if not postcode_index.validate(collected.get('postcode')):
+                return "I'm having trouble finding pricing for that. Could you please confirm your complete postcode is correct?"
+            service_type = collected.get('type')
+            prefetched = None
+            # Size changes on a live quote are answered from its price matrix - no API calls
+            price_result = self.matrix_quote(state)
+            if price_result:
+                booking_result = {'success': True, 'booking_ref': state['booking_ref']}
+            else:
+                prefetched = self.prefetched_quotes.pop(conversation_id, None)
+                if prefetched is None and speculative_pricer is not None:
+                    prefetched = speculative_pricer.claim(conversation_id, collected.get('postcode'), collected.get('service'), service_type)
+                booking_result = prefetched['booking'] if prefetched else acquire_booking()
             if not booking_result.get('success'):
                 send_webhook(conversation_id, state, 'api_pricing_failure')
                 return "Unable to get pricing right now. Let me put you through to our team."
             
             booking_ref = booking_result['booking_ref']
-            service_type = state.get('collected_data', {}).get('type')
             
-            price_result = get_pricing(booking_ref, state.get('collected_data', {}).get('postcode'), state.get('collected_data', {}).get('service'), service_type)
+            if price_result is None:
+                price_result = prefetched['pricing'] if prefetched else get_pricing(booking_ref, collected.get('postcode'), collected.get('service'), service_type)
             if not price_result.get('success'):
                 send_webhook(conversation_id, state, 'api_pricing_failure')
+                if price_result.get('circuit_open'):
+                    return "Unable to get pricing right now. Let me put you through to our team."
                 return "I'm having trouble finding pricing for that. Could you please confirm your complete postcode is correct?"
             
             price = price_result['price']
@@ -427,6 +915,7 @@ class BaseAgent:
             state['price'] = price
             state['collected_data']['type'] = price_result.get('type', service_type)
             state['booking_ref'] = booking_ref
+            self.remember_quote(state, price_result)
             self.conversations[conversation_id] = state
             
             if self.needs_transfer(state.get('collected_data', {}).get('service'), price_num):
@@ -447,6 +936,62 @@ class BaseAgent:
             traceback.print_exc()
             return "I'm sorry, I'm having a technical issue. Let me connect you with our team for immediate help."
 
+    def matrix_quote(self, state):
+        collected = state.get('collected_data', {})
+        if not state.get('booking_ref'):
+            return None
+        return price_from_matrix(state.get('price_matrix'), collected.get('postcode'), collected.get('service'), collected.get('type'))
+
+    def get_comparison_quote(self, state, conversation_id):
+        """Skip and man & van prices side by side in one turn - both lookups run at the same time"""
+        collected = state.get('collected_data', {})
+        current = collected.get('service') or self.service_type
+        other = 'mav' if current == 'skip' else 'skip'
+        quotes = self.prefetched_comparisons.pop(conversation_id, None)
+        if quotes is None and API_AVAILABLE:
+            try:
+                quotes = fetch_comparison_quote(collected.get('postcode'), collected.get('type') or self.default_type)
+            except Exception:
+                traceback.print_exc()
+        quotes = quotes or {}
+
+        # Our own service goes through the normal pricing turn, just without its API calls
+        state.pop('price', None)
+        if quotes.get(current):
+            self.prefetched_quotes[conversation_id] = quotes[current]
+        response = self.get_pricing(state, conversation_id)
+        self.prefetched_quotes.pop(conversation_id, None)
+
+        alternative = (quotes.get(other) or {}).get('pricing') or {}
+        if not (state.get('price') and alternative.get('success') and response.endswith("Would you like to book this?")):
+            return response
+        alt_price = alternative['price']
+        if self.needs_transfer(other, float(alt_price.replace('£', '').replace(',', ''))):
+            return response
+
+        state['comparison'] = {other: {
+            'booking_ref': quotes[other]['booking']['booking_ref'],
+            'bound_type': None if alternative.get('cached') else alternative.get('type'),
+            'price_matrix': remember_price_matrix(alternative, collected.get('postcode'), other),
+            'type': alternative.get('type')
+        }}
+        self.conversations[conversation_id] = state
+        vat_note = " (+ VAT)" if other == 'skip' or rules_registry.current.MAV_RULES['B1_information_gathering'].get('vat_note') else ""
+        return response[:-len("Would you like to book this?")] + f"Or {alternative.get('type')} {COMPARISON_LABELS[other]}: {alt_price}{vat_note}. Which would you prefer?"
+
+    def remember_quote(self, state, price_result):
+        """Track which size the booking ref was searched for, and keep every size quoted"""
+        if price_result.get('from_matrix'):
+            # Same booking ref - still bound only if its search was for this size
+            state['booking_bound'] = price_result['type'] == state.get('bound_type')
+            return
+        # A cached quote has not been searched against this booking ref yet
+        state['booking_bound'] = not price_result.get('cached')
+        state['bound_type'] = price_result.get('type') if state['booking_bound'] else None
+        if price_result.get('price_matrix'):
+            collected = state.get('collected_data', {})
+            state['price_matrix'] = remember_price_matrix(price_result, collected.get('postcode'), collected.get('service'))
+
     def complete_booking(self, state, conversation_id):
         if not API_AVAILABLE:
             send_webhook(conversation_id, state, 'api_unavailable')
@@ -457,7 +1002,13 @@ class BaseAgent:
             customer_data['price'] = state['price']
             customer_data['booking_ref'] = state['booking_ref']
             
-            result = complete_booking(customer_data)
+            prefetched = self.prefetched_bookings.pop(conversation_id, None)
+            if prefetched is not None:
+                result = prefetched
+            elif state.get('booking_ref') and state.get('price'):
+                result = resume_booking(customer_data, state['booking_ref'], state['price'], state.get('booking_bound', True))
+            else:
+                result = complete_booking(customer_data)
             
             if result.get('success'):
                 booking_ref = result['booking_ref']
@@ -488,7 +1039,10 @@ class BaseAgent:
         
         first_missing = missing_fields[0]
         if first_missing == 'firstName': return f"{CONVERSATION_STANDARDS['greeting_response']}. What's your name?"
-        if first_missing == 'postcode': return "What's your complete postcode? For example, LS14ED rather than just LS1."
+        if first_missing == 'postcode':
+            rejected = state.get('collected_data', {}).get('rejected_postcode')
+            if rejected: return f"I couldn't find the postcode {postcode_index.display(rejected)}. Could you check your complete postcode? For example, LS14ED."
+            return "What's your complete postcode? For example, LS14ED rather than just LS1."
         if first_missing == 'phone': return "What's the best phone number to contact you on?"
         return None
 
@@ -499,7 +1053,8 @@ class SkipAgent(BaseAgent):
         self.service_type = 'skip'
         self.default_type = '8yd'
 
-    def get_next_response(self, message, state, conversation_id):
+    def next_step(self, message, state, conversation_id):
+        rules = rules_registry.current
         wants_to_book = self.should_book(message)
         has_all_required_data = all(state.get('collected_data', {}).get(f) for f in REQUIRED_FIELDS['skip'])
 
@@ -507,25 +1062,29 @@ class SkipAgent(BaseAgent):
         if missing_info_response:
             return missing_info_response
 
+        if has_all_required_data and self.wants_comparison(message):
+            return ApiStep('compare')
+
         if has_all_required_data and not state.get('price'):
-            if state.get('collected_data', {}).get('type') in ['10yd', '12yd'] and any(material in message.lower() for material in ['soil', 'rubble', 'concrete', 'bricks', 'heavy']):
-                 return SKIP_HIRE_RULES['A2_heavy_materials']['heavy_materials_max']
+            if state.get('collected_data', {}).get('type') in ['10yd', '12yd'] and 'skip_heavy' in rules.keywords.scan(message):
+                 return rules.SKIP_HIRE_RULES['A2_heavy_materials']['heavy_materials_max']
             
-            return self.get_pricing(state, conversation_id, wants_to_book)
+            return ApiStep('price', wants_to_book)
         
         if wants_to_book and state.get('price'):
-            return self.complete_booking(state, conversation_id)
+            return ApiStep('book')
         
-        if 'plasterboard' in message.lower(): return SKIP_HIRE_RULES['A5_prohibited_items']['plasterboard_response']
-        if any(item in message.lower() for item in ['fridge', 'mattress', 'freezer']): return SKIP_HIRE_RULES['A5_prohibited_items']['restrictions_response']
-        if any(item in message.lower() for item in ['sofa', 'chair', 'upholstery', 'furniture']): return "These can't be kept in skip, sorry"
-        if any(phrase in message.lower() for phrase in ['what cannot put', 'what can\'t put', 'prohibited', 'not allowed']):
-            prohibited_items = ', '.join(SKIP_HIRE_RULES['A5_prohibited_items']['prohibited_list'])
+        hits = rules.keywords.scan(message)
+        if 'plasterboard' in hits: return rules.SKIP_HIRE_RULES['A5_prohibited_items']['plasterboard_response']
+        if 'restricted_items' in hits: return rules.SKIP_HIRE_RULES['A5_prohibited_items']['restrictions_response']
+        if 'upholstery' in hits: return "These can't be kept in skip, sorry"
+        if 'prohibited_query' in hits:
+            prohibited_items = ', '.join(rules.SKIP_HIRE_RULES['A5_prohibited_items']['prohibited_list'])
             return f"The following items may not be permitted in skips, or may carry a surcharge: {prohibited_items}"
-        if 'permit' in message.lower() and any(term in message.lower() for term in ['cost', 'price', 'charge']):
+        if 'permit' in hits and 'cost_query' in hits:
              return "We'll arrange the permit for you and include the cost in your quote. The price varies by council."
             
-        return self.get_pricing(state, conversation_id, wants_to_book)
+        return ApiStep('price', wants_to_book)
 
 class MAVAgent(BaseAgent):
     def __init__(self):
@@ -534,35 +1093,40 @@ class MAVAgent(BaseAgent):
         self.default_type = '4yd'
         self.service_name = 'man & van'
 
-    def get_next_response(self, message, state, conversation_id):
+    def next_step(self, message, state, conversation_id):
+        rules = rules_registry.current
         wants_to_book = self.should_book(message)
         has_all_required_data = all(state.get('collected_data', {}).get(f) for f in REQUIRED_FIELDS['mav'])
 
+        if has_all_required_data and self.wants_comparison(message):
+            return ApiStep('compare')
+
         if has_all_required_data and not state.get('price'):
-            if any(heavy in message.lower() for heavy in ['soil', 'rubble', 'bricks', 'concrete', 'tiles', 'heavy']):
-                return MAV_RULES['B2_heavy_materials']['script']
+            if 'mav_heavy' in rules.keywords.scan(message):
+                return rules.MAV_RULES['B2_heavy_materials']['script']
             if not state.get('collected_data', {}).get('volume_provided'):
                  state['collected_data']['volume_provided'] = True
-                 return MAV_RULES['B1_information_gathering']['cubic_yard_explanation']
+                 return rules.MAV_RULES['B1_information_gathering']['cubic_yard_explanation']
             
-            return self.get_pricing(state, conversation_id, wants_to_book)
+            return ApiStep('price', wants_to_book)
 
         if wants_to_book and state.get('price'):
-            return self.complete_booking(state, conversation_id)
+            return ApiStep('book')
 
         if state.get('price'):
-            vat_note = " (+ VAT)" if MAV_RULES['B1_information_gathering'].get('vat_note') else ""
+            vat_note = " (+ VAT)" if rules.MAV_RULES['B1_information_gathering'].get('vat_note') else ""
             return f"{state.get('collected_data', {}).get('type', '4yd')} {self.service_name} at {state['collected_data']['postcode']}: {state['price']}{vat_note}. Would you like to book this?"
 
-        if 'sunday' in message.lower(): return MAV_RULES['B5_additional_timing']['sunday_collections']['script']
-        if any(time_phrase in message.lower() for time_phrase in ['what time', 'specific time', 'exact time', 'morning', 'afternoon']):
-            return MAV_RULES['B5_additional_timing']['time_script']
+        hits = rules.keywords.scan(message)
+        if 'sunday' in hits: return rules.MAV_RULES['B5_additional_timing']['sunday_collections']['script']
+        if 'time_query' in hits:
+            return rules.MAV_RULES['B5_additional_timing']['time_script']
 
         missing_info_response = self.check_for_missing_info(state, self.service_type)
         if missing_info_response:
             return missing_info_response
         
-        return self.get_pricing(state, conversation_id, wants_to_book)
+        return ApiStep('price', wants_to_book)
 
 class GrabAgent(BaseAgent):
     def __init__(self):
@@ -571,12 +1135,13 @@ class GrabAgent(BaseAgent):
         self.default_type = '6wheeler'
         self.service_name = 'grab hire'
 
-    def get_next_response(self, message, state, conversation_id):
+    def next_step(self, message, state, conversation_id):
+        rules = rules_registry.current
         wants_to_book = self.should_book(message)
         has_all_required_data = all(state.get('collected_data', {}).get(f) for f in REQUIRED_FIELDS['grab'])
 
         if wants_to_book and state.get('price'):
-            return self.complete_booking(state, conversation_id)
+            return ApiStep('book')
         
         if has_all_required_data and not state.get('price'):
             if not state.get('grab_transferred'):
@@ -587,62 +1152,71 @@ class GrabAgent(BaseAgent):
             return f"{state.get('collected_data', {}).get('type', '6wheeler')} {self.service_name} at {state['collected_data']['postcode']}: {state['price']}. Would you like to book this?"
 
         if not state.get('collected_data', {}).get('wheeler_explained'):
-            if '8 wheeler' in message.lower() or '8-wheeler' in message.lower():
+            hits = rules.keywords.scan(message)
+            if 'wheeler_8' in hits:
                 state['collected_data']['wheeler_explained'] = True
-                return GRAB_RULES['C2_grab_size_exact_scripts']['mandatory_exact_scripts']['8_wheeler']
-            if '6 wheeler' in message.lower() or '6-wheeler' in message.lower():
+                return rules.GRAB_RULES['C2_grab_size_exact_scripts']['mandatory_exact_scripts']['8_wheeler']
+            if 'wheeler_6' in hits:
                 state['collected_data']['wheeler_explained'] = True
-                return GRAB_RULES['C2_grab_size_exact_scripts']['mandatory_exact_scripts']['6_wheeler']
+                return rules.GRAB_RULES['C2_grab_size_exact_scripts']['mandatory_exact_scripts']['6_wheeler']
 
         if has_all_required_data and not state.get('collected_data', {}).get('materials_checked'):
-            has_soil_rubble = any(material in message.lower() for material in ['soil', 'rubble', 'muckaway', 'dirt', 'earth', 'concrete'])
-            has_other_items = any(item in message.lower() for item in ['wood', 'furniture', 'plastic', 'metal', 'general', 'mixed'])
+            hits = rules.keywords.scan(message)
+            has_soil_rubble = 'soil_rubble' in hits
+            has_other_items = 'other_materials' in hits
             if has_soil_rubble and has_other_items:
                 state['collected_data']['materials_checked'] = True
-                return GRAB_RULES['C3_materials_assessment']['mixed_materials']['script']
+                return rules.GRAB_RULES['C3_materials_assessment']['mixed_materials']['script']
             state['collected_data']['materials_checked'] = True
 
         missing_info_response = self.check_for_missing_info(state, self.service_type)
         if missing_info_response:
             return missing_info_response
         
-        return self.get_pricing(state, conversation_id, wants_to_book)
+        return ApiStep('price', wants_to_book)
 
 # --- FLASK APP AND ROUTING ---
 app = Flask(__name__)
 CORS(app)
 
-shared_conversations = {}
+# Shared by all agents and, with the sqlite backend, by every gunicorn worker
+conversation_store = create_conversation_store(state_type=ConversationState)
 skip_agent = SkipAgent()
 mav_agent = MAVAgent()
 grab_agent = GrabAgent()
-skip_agent.conversations = shared_conversations
-mav_agent.conversations = shared_conversations
-grab_agent.conversations = shared_conversations
+skip_agent.conversations = conversation_store
+mav_agent.conversations = conversation_store
+grab_agent.conversations = conversation_store
 
 dashboard_manager = DashboardManager()
-conversation_counter = 0
-
+dashboard_manager.start()
+if booking_pool is not None:
+    booking_pool.start()
+rules_registry.start()
 def get_next_conversation_id():
-    global conversation_counter
-    conversation_counter += 1
-    return f"conv{conversation_counter:08d}"
+    # Unique across gunicorn workers and sortable by creation time
+    return conversation_ids.next_id()
 
 def route_to_agent(message, conversation_id):
-    message_lower = message.lower()
-    context = shared_conversations.get(conversation_id, {})
+    hits = rules_registry.current.keywords.scan(message)
+    context = conversation_store.get(conversation_id, {})
     existing_service = context.get('collected_data', {}).get('service')
     
-    if any(word in message_lower for word in ['skip', 'skip hire', 'yard skip', 'cubic yard']):
-        return skip_agent.process_message(message, conversation_id)
-    elif any(word in message_lower for word in ['man and van', 'mav', 'man & van', 'van collection', 'house clearance', 'clearance']):
-        return mav_agent.process_message(message, conversation_id)
+    if 'route_skip' in hits:
+        agent = skip_agent
+    elif 'route_mav' in hits:
+        agent = mav_agent
     elif existing_service == 'skip':
-        return skip_agent.process_message(message, conversation_id)
+        agent = skip_agent
     elif existing_service == 'mav':
-        return mav_agent.process_message(message, conversation_id)
+        agent = mav_agent
     else:
-        return grab_agent.process_message(message, conversation_id)
+        agent = grab_agent
+    
+    # WasteKing round trips are awaited on this worker's event loop rather than blocking a thread each
+    if worker_loop is not None and ASYNC_TURNS_ENABLED:
+        return worker_loop.run(agent.process_message_async(message, conversation_id))
+    return agent.process_message(message, conversation_id)
 
 @app.route('/')
 def index():
@@ -659,9 +1233,10 @@ def process_message_endpoint():
         
         if not customer_message: return jsonify({"success": False, "message": "No message provided"}), 400
         
-        response = route_to_agent(customer_message, conversation_id)
-        
-        state = shared_conversations.get(conversation_id, {})
+        # One turn at a time per conversation, whichever worker it lands on
+        with conversation_store.lock(conversation_id):
+            response = route_to_agent(customer_message, conversation_id)
+            state = conversation_store.get(conversation_id, {})
         dashboard_manager.update_call(conversation_id, state)
         
         return jsonify({"success": True, "message": response, "conversation_id": conversation_id, "timestamp": datetime.now().isoformat(), 'stage': state.get('stage'), 'price': state.get('price')})
@@ -769,8 +1344,7 @@ def user_dashboard_page():
                     if (data.success) {
                         lastKnownCalls = data.data.live_calls;
                         updateCallsDisplay(lastKnownCalls);
-                        document.getElementById('active-calls').textContent = `${data.data.active_calls} Active Calls`;
-                        document.getElementById('last-update').textContent = `Last update: ${new Date().toLocaleTimeString()}`;
+                        showCounts(data.data);
                     }
                 })
                 .catch(error => console.error('Dashboard error:', error));
@@ -800,7 +1374,7 @@ def user_dashboard_page():
             container.prepend(callEl); // newest first
         }
         const collected_data = call.collected_data || {};
-        const last_message = (call.history || []).slice(-1)[0] || 'No transcript yet...';
+        const last_message = call.last_message || (call.history || []).slice(-1)[0] || 'No transcript yet...';
         callEl.innerHTML = `
             <div class="call-header">
                 <div class="call-id">${call.id}</div>
@@ -849,8 +1423,48 @@ def user_dashboard_page():
             });
         }
         
-        document.addEventListener('DOMContentLoaded', loadDashboard);
-        setInterval(loadDashboard, 2000);
+        function showCounts(data) {
+            document.getElementById('active-calls').textContent = `${data.active_calls} Active Calls`;
+            document.getElementById('last-update').textContent = `Last update: ${new Date().toLocaleTimeString()}`;
+        }
+        
+        // Live feed: a snapshot, then one event per changed call - polling only if the stream is refused
+        function connectLiveFeed() {
+            if (!window.EventSource) {
+                setInterval(loadDashboard, 2000);
+                return loadDashboard();
+            }
+            const source = new EventSource('/api/dashboard/user/stream');
+            source.addEventListener('snapshot', event => {
+                const data = JSON.parse(event.data);
+                lastKnownCalls = data.calls;
+                updateCallsDisplay(lastKnownCalls);
+                showCounts(data);
+            });
+            ['call_started', 'stage_changed', 'price_set', 'call_updated'].forEach(type => {
+                source.addEventListener(type, event => {
+                    const data = JSON.parse(event.data);
+                    lastKnownCalls = lastKnownCalls.filter(call => call.id !== data.call.id).concat([data.call]).slice(-10);
+                    updateCallsDisplay(lastKnownCalls);
+                    showCounts(data);
+                });
+            });
+            source.addEventListener('call_removed', event => {
+                const data = JSON.parse(event.data);
+                lastKnownCalls = lastKnownCalls.filter(call => call.id !== data.id);
+                updateCallsDisplay(lastKnownCalls);
+                showCounts(data);
+            });
+            source.onerror = () => {
+                if (source.readyState === EventSource.CLOSED) {
+                    console.error('Live feed unavailable - polling instead');
+                    setInterval(loadDashboard, 2000);
+                    loadDashboard();
+                }
+            };
+        }
+        
+        document.addEventListener('DOMContentLoaded', connectLiveFeed);
     </script>
 </body>
 </html>
@@ -888,6 +1502,14 @@ def manager_dashboard_page():
         .perf-excellent { background: #28a745; }
         .perf-good { background: #ffc107; }
         .perf-poor { background: #dc3545; }
+        .window-btn { background: #f0f0f5; border: none; padding: 4px 12px; margin-left: 6px; border-radius: 12px; cursor: pointer; font-size: 12px; }
+        .window-btn.active { background: #667eea; color: white; }
+        .rolling-row { margin-bottom: 14px; padding: 10px; background: #f8f9fa; border-radius: 8px; }
+        .rolling-metric { display: grid; grid-template-columns: 110px 1fr 70px; align-items: center; gap: 10px; font-size: 12px; color: #666; margin-top: 6px; }
+        .bar-track { background: #e9ecef; border-radius: 4px; height: 10px; overflow: hidden; }
+        .bar { height: 100%; border-radius: 4px; }
+        .spark { display: flex; align-items: flex-end; gap: 1px; height: 60px; margin-top: 10px; }
+        .spark-bar { flex: 1; background: #667eea; min-height: 1px; }
     </style>
 </head>
 <body>
@@ -903,7 +1525,7 @@ def manager_dashboard_page():
             <div class="metrics-grid">
                 <div class="card">
                     <div class="metric-value" style="color: #667eea;" id="total-calls">0</div>
-                    <div class="metric-label">Total Calls Today</div>
+                    <div class="metric-label" id="total-calls-label">Total Calls</div>
                 </div>
                 
                 <div class="card">
@@ -926,6 +1548,19 @@ def manager_dashboard_page():
                 <h3>Service Performance Breakdown</h3>
                 <div id="service-breakdown">Loading...</div>
             </div>
+            
+            <div class="card">
+                <h3>Rolling Performance <span id="window-buttons"></span></h3>
+                <div style="font-size: 12px; color: #666; margin-bottom: 10px;">Rates are for the calls that started in the window</div>
+                <div id="rolling-analytics">Loading...</div>
+                <div style="font-size: 12px; color: #666; margin-top: 15px;">Calls started per minute - last hour</div>
+                <div class="spark" id="throughput-chart"></div>
+            </div>
+            
+            <div class="card">
+                <h3>SMP API Health</h3>
+                <div id="api-health">Loading...</div>
+            </div>
         </div>
         
         <div class="calls-section">
@@ -941,9 +1576,10 @@ def manager_dashboard_page():
                 .then(data => {
                     if (data.success) {
                         document.getElementById('total-calls').textContent = data.data.total_calls;
+                        document.getElementById('total-calls-label').textContent = `Total Calls since ${new Date(data.data.counting_since).toLocaleString()}`;
                         document.getElementById('completed-calls').textContent = data.data.completed_calls;
                         document.getElementById('conversion-rate').textContent = data.data.conversion_rate.toFixed(1) + '%';
-                        document.getElementById('active-now').textContent = (data.data.active_calls || []).length;
+                        document.getElementById('active-now').textContent = data.data.active_count || 0;
                         
                         const services = data.data.service_breakdown || {};
                         document.getElementById('service-breakdown').innerHTML = Object.entries(services).map(([service, count]) => {
@@ -959,12 +1595,79 @@ def manager_dashboard_page():
                             `;
                         }).join('') || '<div style="color: #666;">No service data yet</div>';
                         
+                        const breakerColours = { closed: '#28a745', half_open: '#ffc107', open: '#dc3545' };
+                        document.getElementById('api-health').innerHTML = (data.data.api_health || []).map(endpoint => `
+                            <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 10px; padding: 10px; background: #f8f9fa; border-radius: 8px;">
+                                <div style="flex: 1;">
+                                    <strong>${endpoint.endpoint}</strong>
+                                    <div style="font-size: 12px; color: #666;">${endpoint.failure_rate}% failures, p99 ${endpoint.p99_ms === null ? 'n/a' : endpoint.p99_ms + 'ms'}, ${endpoint.rejected} fast-failed</div>
+                                </div>
+                                <div style="font-weight: bold; color: ${breakerColours[endpoint.state] || '#666'};">${endpoint.state.replace('_', '-').toUpperCase()}</div>
+                            </div>
+                        `).join('') || '<div style="color: #666;">No API calls yet</div>';
+                        
                         updateCallsList(data.data.recent_calls || []);
                     }
                 })
                 .catch(error => {
                     console.error('Analytics error:', error);
                 });
+            loadRollingAnalytics();
+        }
+        
+        let analyticsWindow = '1h';
+        let lastRollingAnalytics = null;
+        
+        function loadRollingAnalytics() {
+            fetch('/api/dashboard/analytics')
+                .then(response => response.json())
+                .then(data => {
+                    if (data.success) {
+                        lastRollingAnalytics = data.data;
+                        renderRollingAnalytics();
+                    }
+                })
+                .catch(error => console.error('Rolling analytics error:', error));
+        }
+        
+        function selectAnalyticsWindow(label) {
+            analyticsWindow = label;
+            renderRollingAnalytics();
+        }
+        
+        function rollingMetric(label, width, value, colour) {
+            return `
+                <div class="rolling-metric">
+                    <div>${label}</div>
+                    <div class="bar-track"><div class="bar" style="width: ${Math.min(100, width)}%; background: ${colour};"></div></div>
+                    <div style="text-align: right;">${value}</div>
+                </div>
+            `;
+        }
+        
+        function renderRollingAnalytics() {
+            const windows = lastRollingAnalytics.windows || {};
+            if (!windows[analyticsWindow]) analyticsWindow = Object.keys(windows)[0];
+            document.getElementById('window-buttons').innerHTML = Object.keys(windows).map(label =>
+                `<button class="window-btn ${label === analyticsWindow ? 'active' : ''}" onclick="selectAnalyticsWindow('${label}')">${label}</button>`
+            ).join('');
+            
+            const services = windows[analyticsWindow] || {};
+            const busiest = Math.max(1, ...Object.values(services).map(stats => stats.calls));
+            document.getElementById('rolling-analytics').innerHTML = Object.entries(services).map(([service, stats]) => `
+                <div class="rolling-row">
+                    <strong>${service === 'all' ? 'All services' : service}</strong>
+                    ${rollingMetric('Throughput', stats.calls / busiest * 100, `${stats.calls} (${stats.calls_per_hour}/h)`, '#667eea')}
+                    ${rollingMetric('Conversion', stats.conversion_rate, `${stats.conversion_rate}%`, '#4caf50')}
+                    ${rollingMetric('Transfer rate', stats.transfer_rate, `${stats.transfer_rate}%`, '#ff9800')}
+                </div>
+            `).join('') || '<div style="color: #666;">No calls in this window</div>';
+            
+            const perMinute = lastRollingAnalytics.calls_last_hour || [];
+            const peak = Math.max(1, ...perMinute);
+            document.getElementById('throughput-chart').innerHTML = perMinute.map(count =>
+                `<div class="spark-bar" style="height: ${count / peak * 100}%;" title="${count} calls"></div>`
+            ).join('');
         }
         
         function updateCallsList(calls) {
@@ -999,7 +1702,7 @@ def manager_dashboard_page():
                         <div class="call-metrics">
                             <div><strong>Duration:</strong> ${duration}m</div>
                             <div><strong>Stage:</strong> ${call.stage || 'Unknown'}</div>
-                            <div><strong>Messages:</strong> ${(call.history || []).length}</div>
+                            <div><strong>Messages:</strong> ${call.message_count ?? (call.history || []).length}</div>
                         </div>
                         <div style="font-size: 11px; color: #999; margin-top: 8px;">
                             ${call.timestamp ? new Date(call.timestamp).toLocaleString() : 'Unknown time'}
@@ -1170,6 +1873,20 @@ def test_interface_page():
 """)
 
 
+@app.route('/api/dashboard/user/stream')
+def user_dashboard_stream():
+    client = dashboard_manager.feed.subscribe()
+    if client is None:
+        # Over the per-worker cap - the page falls back to polling
+        return jsonify({"success": False, "error": "Too many live dashboard connections"}), 503
+    return Response(dashboard_manager.feed.stream(client, dashboard_manager.get_user_feed_snapshot),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/live-feed', methods=['GET'])
+def live_feed_stats_api():
+    return jsonify({"success": True, "data": dashboard_manager.feed.stats()})
+
 @app.route('/api/dashboard/user')
 def user_dashboard_api():
     try:
@@ -1186,7 +1903,95 @@ def manager_dashboard_api():
         return jsonify({"success": True, "data": dashboard_data})
     except Exception as e:
         traceback.print_exc()
-        return jsonify({"success": False, "data": {"total_calls": 0, "completed_calls": 0, "conversion_rate": 0, "service_breakdown": {}, "individual_calls": [], "recent_calls": [], "active_calls": []}})
+        return jsonify({"success": False, "data": {"total_calls": 0, "completed_calls": 0, "active_count": 0, "conversion_rate": 0, "service_breakdown": {}, "tracked_calls": 0, "tracked_completed_calls": 0, "tracked_service_breakdown": {}, "tracked_stage_breakdown": {}, "recent_calls": [], "active_calls": [], "api_health": []}})
+
+@app.route('/api/dashboard/analytics', methods=['GET'])
+def dashboard_analytics_api():
+    return jsonify({"success": True, "data": dashboard_manager.get_analytics()})
+
+@app.route('/api/dashboard/calls', methods=['GET'])
+def dashboard_calls_api():
+    try:
+        fields = parse_call_fields(request.args.get('fields'))
+        limit = int(request.args.get('limit', DASHBOARD_PAGE_SIZE))
+        status = request.args.get('status') or None
+        page = dashboard_manager.list_calls(request.args.get('cursor'), limit, fields, status)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"success": True, "data": page})
+
+@app.route('/api/dashboard/calls/<conversation_id>', methods=['GET'])
+def dashboard_call_detail_api(conversation_id):
+    try:
+        fields = parse_call_fields(request.args.get('fields')) if request.args.get('fields') else CALL_FIELDS
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    call = dashboard_manager.get_call(conversation_id, fields)
+    if call is None:
+        return jsonify({"success": False, "error": "Call not found"}), 404
+    return jsonify({"success": True, "data": call})
+
+@app.route('/api/price-cache', methods=['GET'])
+def price_cache_stats_api():
+    if price_cache is None:
+        return jsonify({"success": False, "data": {}})
+    return jsonify({"success": True, "data": price_cache.stats()})
+
+@app.route('/api/price-cache/invalidate', methods=['POST'])
+def price_cache_invalidate_api():
+    if price_cache is None:
+        return jsonify({"success": False, "removed": 0})
+    data = request.get_json(silent=True) or {}
+    removed = price_cache.invalidate(postcode=data.get('postcode'), service=data.get('service'))
+    return jsonify({"success": True, "removed": removed})
+
+@app.route('/api/pricing-coalescing', methods=['GET'])
+def pricing_coalescing_stats_api():
+    if pricing_flight is None:
+        return jsonify({"success": False, "data": {}})
+    return jsonify({"success": True, "data": pricing_flight.stats()})
+
+@app.route('/api/speculative-pricing', methods=['GET'])
+def speculative_pricing_stats_api():
+    if speculative_pricer is None:
+        return jsonify({"success": False, "data": {}})
+    return jsonify({"success": True, "data": speculative_pricer.stats()})
+
+@app.route('/api/conversation-store', methods=['GET'])
+def conversation_store_stats_api():
+    return jsonify({"success": True, "data": conversation_store.stats()})
+
+@app.route('/api/state-caches', methods=['GET'])
+def state_caches_stats_api():
+    dashboard_manager.live_calls.sweep()
+    return jsonify({"success": True, "data": {
+        "conversations": conversation_store.stats(),
+        "live_calls": dashboard_manager.live_calls.stats()
+    }})
+
+@app.route('/api/postcode-index', methods=['GET'])
+def postcode_index_stats_api():
+    return jsonify({"success": True, "data": postcode_index.stats()})
+
+@app.route('/api/keyword-matcher', methods=['GET'])
+def keyword_matcher_stats_api():
+    return jsonify({"success": True, "data": rules_registry.current.keywords.stats()})
+
+@app.route('/api/rules', methods=['GET'])
+def rules_registry_stats_api():
+    return jsonify({"success": True, "data": rules_registry.stats()})
+
+@app.route('/api/rules/reload', methods=['POST'])
+def rules_registry_reload_api():
+    # Reloads this worker now; the other workers pick the change up on their next watcher poll
+    reloaded = rules_registry.reload(force=True)
+    return jsonify({"success": reloaded, "data": rules_registry.stats()})
+
+@app.route('/api/booking-pool', methods=['GET'])
+def booking_pool_stats_api():
+    if booking_pool is None:
+        return jsonify({"success": False, "data": {}})
+    return jsonify({"success": True, "data": booking_pool.stats()})
 
 
 if __name__ == '__main__':
@@ -0,0 +1,77 @@
+"""In-flight pricing calls per worker: the async client against gunicorn-style blocking threads.
+
+    python benchmarks/bench_async_concurrency.py [--calls 400] [--latency 0.2] [--threads 16] [--pool 400]
+
+Sends the same uncached step-2 pricing call to a local stub API that takes --latency seconds to
+answer. The blocking client can only have one call per thread in the air (a gthread worker has
+16); the async client runs them all on the worker's event loop at once, up to its connection pool
+(--pool sets WASTEKING_ASYNC_POOL_SIZE). The stub reports how many requests it was serving at the peak.
+"""
+import os
+import io
+import sys
+import time
+import asyncio
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.stub_api import start_stub
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=400)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--pool', type=int, default=400)
+    args = parser.parse_args()
+
+    server, base_url = start_stub(latency=args.latency)
+    os.environ['WASTEKING_BASE_URL'] = base_url
+    os.environ['WASTEKING_BOOKING_POOL_SIZE'] = '0'
+    os.environ['WASTEKING_ASYNC_POOL_SIZE'] = str(args.pool)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        from utils.wasteking_api import get_pricing
+        from utils.wasteking_async import worker_loop, async_client
+    if worker_loop is None:
+        sys.exit("aiohttp is not installed - nothing to compare")
+
+    def price(i):
+        return get_pricing(f"BR{i}", 'LS14ED', 'skip', '8yd', use_cache=False)
+
+    async def price_all():
+        return await asyncio.gather(*(
+            async_client.get_pricing(f"BR{i}", 'LS14ED', 'skip', '8yd', use_cache=False)
+            for i in range(args.calls)
+        ))
+
+    def blocking():
+        with ThreadPoolExecutor(args.threads) as pool:
+            return list(pool.map(price, range(args.calls)))
+
+    results = {}
+    for label, run in (
+        (f'blocking x{args.threads} threads', blocking),
+        ('async worker loop', lambda: worker_loop.run(price_all()))
+    ):
+        with contextlib.redirect_stdout(io.StringIO()):
+            run()  # warm-up: open the pooled connections
+            server.peak_in_flight = 0
+            started = time.perf_counter()
+            priced = run()
+            elapsed = time.perf_counter() - started
+        ok = sum(1 for result in priced if result.get('success'))
+        results[label] = elapsed
+        print(f"  {label:<22} {elapsed:6.2f} s  {args.calls / elapsed:7.1f} calls/s  "
+              f"peak in flight {server.peak_in_flight:4d}  priced {ok}/{args.calls}")
+
+    print(f"{args.calls} pricing calls, {args.latency * 1000:.0f} ms stub latency - "
+          f"async is {results[f'blocking x{args.threads} threads'] / results['async worker loop']:.1f}x faster")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
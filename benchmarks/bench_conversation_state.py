@@ -0,0 +1,73 @@
+"""Memory held by live conversations: the old state dict against ConversationState.
+
+    python benchmarks/bench_conversation_state.py [--conversations 100000] [--lines 10 60]
+
+Builds the same conversations both ways and measures them with tracemalloc. The old way is
+what app.py kept before: a plain dict with an unbounded history list, holding its own copy of
+every extracted string. ConversationState has slots, interns the shared values and keeps at
+most WASTEKING_HISTORY_MAX_LINES lines of transcript.
+"""
+import os
+import io
+import sys
+import argparse
+import tracemalloc
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def extracted(i):
+    # Values come out of message parsing - a new string object per conversation, like the real extractor returns
+    return {
+        'firstName': f"Customer{i}",
+        'phone': f"0771{i:07d}",
+        'postcode': f"LS{i % 30}{i % 9}ED",
+        'service': ''.join(['sk', 'ip']),
+        'type': ''.join(['8', 'yd'])
+    }
+
+
+def transcript(i, lines):
+    return [f"{'Customer' if n % 2 == 0 else 'Agent'}: message {n} of conversation {i}" for n in range(lines)]
+
+
+def old_state(i, lines):
+    return {'history': transcript(i, lines), 'collected_data': extracted(i), 'stage': ''.join(['collect', 'ing']),
+            'price': '£300.00'}
+
+
+def new_state(i, lines, state_type):
+    state = state_type(history=transcript(i, lines), stage=''.join(['collect', 'ing']), price='£300.00')
+    state.collect(extracted(i))
+    return state
+
+
+def measure(build, count):
+    tracemalloc.start()
+    conversations = {f"conv_{i}": build(i) for i in range(count)}
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del conversations
+    return current / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--conversations', type=int, default=100000)
+    parser.add_argument('--lines', type=int, nargs='+', default=[10, 60])
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        from utils.conversation_state import ConversationState, HISTORY_MAX_LINES
+
+    print(f"{args.conversations} live conversations, history capped at {HISTORY_MAX_LINES} lines")
+    for lines in args.lines:
+        old = measure(lambda i: old_state(i, lines), args.conversations)
+        new = measure(lambda i: new_state(i, lines, ConversationState), args.conversations)
+        print(f"  {lines:3d}-line transcripts  dict {old:7.0f} B  ConversationState {new:7.0f} B  "
+              f"saved {1 - new / old:5.1%}  ({(old - new) * args.conversations / 2 ** 20:.1f} MiB in total)")
+
+
+if __name__ == '__main__':
+    main()
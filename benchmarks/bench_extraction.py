@@ -0,0 +1,104 @@
+"""Postcode, phone and name extraction throughput: the old inline re.search calls against Extractor.
+
+    python benchmarks/bench_extraction.py [--messages 50000] [--rounds 3]
+
+The old way is what extract_data did before: re.search with the raw pattern strings on every
+turn, the postcode searched in message.upper(), and every phone and name pattern tried in turn.
+Both run over the same synthetic transcript corpus (about half the lines carry a postcode or a
+phone number) with each module's EXTRACTION_PATTERNS, and must agree on every message.
+"""
+import os
+import io
+import re
+import sys
+import time
+import random
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def corpus(count, seed=16):
+    rng = random.Random(seed)
+    names = ['Sam', 'Priya', 'Tom Baker', 'Ana', 'Jo']
+    postcodes = ['LS14ED', 'ls1 4ed', 'M1 1AE', 'SW1A 1AA', 'B33 8TH']
+    phones = ['07711222333', '01442 216784', '0144 216784', '(01442) 216784', '0144216784', '01442-216784']
+    templates = [
+        'yes please', 'what can I put in it?', 'how much for an 8 yard skip', 'Yes that is fine',
+        'my name is {name}', '{name}, I need a skip', 'postcode is {postcode}', 'it is {postcode} thanks',
+        'call me on {phone}', '{name} wants a skip at {postcode}', 'customer name is {name} phone {phone}',
+        'I have 3 bags and 2 sofas', 'Confirmed, go ahead'
+    ]
+    return [rng.choice(templates).format(name=rng.choice(names), postcode=rng.choice(postcodes), phone=rng.choice(phones))
+            for _ in range(count)]
+
+
+def inline_extractor(patterns, stopwords):
+    """extract_data's pattern matching as it was before Extractor"""
+    postcode_patterns = [pattern.replace('[A-Za-z]', '[A-Z]') for pattern in patterns['postcode']]
+
+    def extract(message):
+        data = {}
+        for pattern in postcode_patterns:
+            postcode_match = re.search(pattern, message.upper())
+            if postcode_match:
+                postcode = postcode_match.group(1).replace(' ', '')
+                if len(postcode) >= 5:
+                    data['postcode'] = postcode
+                break
+        for pattern in patterns['phone']:
+            phone_match = re.search(pattern, message)
+            if phone_match:
+                phone_number = ''.join([group for group in phone_match.groups() if group])
+                if len(phone_number) >= 10:
+                    data['phone'] = phone_number
+                    break
+        for pattern in patterns['firstName']:
+            name_match = re.search(pattern, message)
+            if name_match:
+                potential_name = name_match.group(1).strip().title()
+                if potential_name.lower() not in stopwords:
+                    data['firstName'] = potential_name
+                    break
+        return data
+    return extract
+
+
+def messages_per_second(extract, sample, rounds):
+    best = float('inf')
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for message in sample:
+            extract(message)
+        best = min(best, time.perf_counter() - started)
+    return len(sample) / best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=50000)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+        import agents
+        from utils.extraction import NAME_STOPWORDS
+
+    sample = corpus(args.messages)
+    with_digits = sum(1 for message in sample if re.search(r'\d', message)) / len(sample)
+    print(f"{args.messages} transcript lines, {with_digits:.0%} with digits")
+    for name, module in (('app.py', app), ('agents.py', agents)):
+        old = inline_extractor(module.EXTRACTION_PATTERNS, NAME_STOPWORDS)
+        new = lambda message: {field: found.value for field, found in module.extractor.extract(message).items()}
+        mismatches = sum(old(message) != new(message) for message in sample)
+
+        before = messages_per_second(old, sample, args.rounds)
+        after = messages_per_second(new, sample, args.rounds)
+        print(f"  {name:<10} inline re.search {before / 1000:6.1f}k msg/s  Extractor {after / 1000:6.1f}k msg/s  "
+              f"({after / before:.2f}x)  mismatches {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
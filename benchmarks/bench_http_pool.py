@@ -0,0 +1,70 @@
+"""Handshake savings of the pooled keep-alive session against a local stub API.
+
+    python benchmarks/bench_http_pool.py [--calls 300] [--no-tls]
+
+Times the same create-booking call sent the old way (a bare requests.post, so a new TCP + TLS
+handshake every time) and through wasteking_request's pooled session. TLS needs the openssl CLI
+for a throwaway self-signed certificate; without it the comparison runs over plain HTTP.
+"""
+import os
+import io
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.stub_api import start_stub, self_signed_cert
+
+
+def timed_calls(call, count):
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=300)
+    parser.add_argument('--no-tls', action='store_true')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='wk-bench-')
+    cert = None if args.no_tls else self_signed_cert(tmp)
+    server, base_url = start_stub(certfile=cert and cert[0], keyfile=cert and cert[1])
+    if cert:
+        os.environ['REQUESTS_CA_BUNDLE'] = cert[0]
+    os.environ['WASTEKING_BASE_URL'] = base_url
+
+    import requests
+    from utils.wasteking_api import wasteking_request, request_headers, CREATE_BOOKING_PAYLOAD
+
+    url = f"{base_url}/api/booking/create"
+    results = {}
+    for label, call in (
+        ('bare requests.post', lambda: requests.post(url, json=CREATE_BOOKING_PAYLOAD, headers=request_headers(), timeout=15)),
+        ('pooled session', lambda: wasteking_request('api/booking/create', CREATE_BOOKING_PAYLOAD))
+    ):
+        with contextlib.redirect_stdout(io.StringIO()):
+            call()  # warm-up: the pooled session opens its connection here
+            connections = server.connections
+            timings = timed_calls(call, args.calls)
+        results[label] = (timings, server.connections - connections)
+
+    print(f"{args.calls} sequential api/booking/create calls over {'https' if cert else 'http'} to {base_url}")
+    for label, (timings, connections) in results.items():
+        print(f"  {label:<20} median {statistics.median(timings):6.2f} ms  "
+              f"p95 {sorted(timings)[int(len(timings) * 0.95)]:6.2f} ms  connections opened {connections}")
+    bare = statistics.median(results['bare requests.post'][0])
+    pooled = statistics.median(results['pooled session'][0])
+    print(f"  saved per call {bare - pooled:.2f} ms - a 4-call complete_booking flow saves ~{(bare - pooled) * 4:.1f} ms")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
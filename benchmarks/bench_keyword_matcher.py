@@ -0,0 +1,78 @@
+"""Classifying a message against every keyword table: the old per-table substring scans against KeywordMatcher.
+
+    python benchmarks/bench_keyword_matcher.py [--messages 2000] [--rounds 5]
+
+The old way is what the agents did inline: lower-case the message for each check, then run
+`phrase in message_lower` down every list. KeywordMatcher does one pass per message; it is timed
+without its scan cache (every message new) and with it (every check after the first in a turn).
+"""
+import os
+import io
+import sys
+import time
+import random
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def messages(tables, count, seed):
+    phrases = sorted({phrase for table in tables.values() for phrase in table})
+    filler = ['hi there', 'my name is Sam Jones', 'postcode LS14ED', 'please', 'thanks very much', 'I have some']
+    rng = random.Random(seed)
+    result = []
+    for _ in range(count):
+        words = rng.sample(phrases, rng.randint(0, 3)) + rng.sample(filler, rng.randint(1, 3))
+        rng.shuffle(words)
+        result.append(' '.join(words))
+    return result
+
+
+def substring_scans(tables, message):
+    return {category: [phrase for phrase in phrases if phrase in message.lower()] for category, phrases in tables.items()}
+
+
+def per_message_us(classify, sample, rounds):
+    best = float('inf')
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for message in sample:
+            classify(message)
+        best = min(best, time.perf_counter() - started)
+    return best / len(sample) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+        import agents
+        from utils.keyword_matcher import KeywordMatcher
+
+    for name, module in (('app.py', app), ('agents.py', agents)):
+        tables = module.keyword_tables(module.rules_registry.current.rules)
+        sample = messages(tables, args.messages, name)
+        uncached = KeywordMatcher(tables, cache_size=0)
+        cached = KeywordMatcher(tables)
+        for message in sample[-256:]:
+            cached.scan(message)
+        warm = sample[-256:]
+
+        old = per_message_us(lambda message: substring_scans(tables, message), sample, args.rounds)
+        single_pass = per_message_us(uncached.scan, sample, args.rounds)
+        repeat = per_message_us(cached.scan, warm, args.rounds)
+        stats = uncached.stats()
+        print(f"{name}: {stats['categories']} tables, {stats['phrases']} phrases, "
+              f"{sum(map(len, sample)) / len(sample):.0f}-char messages")
+        print(f"  substring scans   {old:7.2f} us/message")
+        print(f"  matcher, new text {single_pass:7.2f} us/message  ({old / single_pass:.1f}x)")
+        print(f"  matcher, cached   {repeat:7.2f} us/message  ({old / repeat:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Worker startup cost of the rules: parsing the PDF against loading the compiled rules artifact.
+
+    python benchmarks/bench_rules_startup.py [--runs 5]
+
+Each run is a fresh interpreter (like a gunicorn worker booting) that imports
+utils.rules_processor and constructs one RulesProcessor. Cold runs point WASTEKING_RULES_CACHE at
+a missing file, so the PDF is parsed with PyPDF2; cached runs load the artifact the cold run wrote.
+Reports the median time inside the interpreter and the median wall time of the whole process.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import io, time, contextlib
+started = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    from utils.rules_processor import RulesProcessor
+    processor = RulesProcessor()
+print(f"{(time.perf_counter() - started) * 1000:.3f}")
+"""
+
+
+def boot(cache_path):
+    env = dict(os.environ, WASTEKING_RULES_CACHE=cache_path)
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    wall = (time.perf_counter() - started) * 1000
+    return float(result.stdout), wall
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    cache_path = os.path.join(tempfile.mkdtemp(prefix='wk-bench-'), 'compiled_rules.json')
+    runs = {'PDF parse (no artifact)': [], 'compiled artifact': []}
+    for _ in range(args.runs):
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+        runs['PDF parse (no artifact)'].append(boot(cache_path))
+        if not os.path.exists(cache_path):
+            sys.exit("the PDF parse wrote no compiled rules - is PyPDF2 installed?")
+        runs['compiled artifact'].append(boot(cache_path))
+
+    print(f"RulesProcessor startup, median of {args.runs} fresh interpreters")
+    for label, results in runs.items():
+        inside = statistics.median(result[0] for result in results)
+        wall = statistics.median(result[1] for result in results)
+        print(f"  {label:<24} import + construct {inside:8.1f} ms  whole process {wall:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+import os
+import ssl
+import json
+import time
+import shutil
+import itertools
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the WasteKing SMP API - benchmarks only, never imported by the app
+STUB_PRICES = [
+    {"type": "4yd", "price": "£200.00"},
+    {"type": "6yd", "price": "£250.00"},
+    {"type": "8yd", "price": "£300.00"},
+    {"type": "12yd", "price": "call"}
+]
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # hundreds of clients connect at once in the concurrency benchmark
+
+    def __init__(self, address, latency):
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.refs = itertools.count(1)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.in_flight += 1
+            self.server.peak_in_flight = max(self.server.peak_in_flight, self.server.in_flight)
+        try:
+            time.sleep(self.server.latency)
+            if self.path.endswith('/create'):
+                result = {"bookingRef": f"BR{next(self.server.refs)}"}
+            elif 'search' in body:
+                result = {"resultItems": STUB_PRICES}
+            elif body.get('action') == 'quote':
+                result = {"paymentLink": f"https://pay.example/{body.get('bookingRef')}"}
+            else:
+                result = {}
+        finally:
+            with self.server.lock:
+                self.server.in_flight -= 1
+        data = json.dumps(result).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_stub(latency=0.0, certfile=None, keyfile=None):
+    """Serve the stub on a free localhost port in a daemon thread; returns (server, base_url)"""
+    server = StubServer(('127.0.0.1', 0), latency)
+    scheme = 'http'
+    if certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = 'https'
+    threading.Thread(target=server.serve_forever, name='stub-api', daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}"
+
+
+def self_signed_cert(directory):
+    """(certfile, keyfile) for 127.0.0.1 made with the openssl CLI, or None when it isn't installed"""
+    if not shutil.which('openssl'):
+        return None
+    certfile, keyfile = os.path.join(directory, 'stub.crt'), os.path.join(directory, 'stub.key')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=127.0.0.1',
+         '-addext', 'subjectAltName=IP:127.0.0.1', '-keyout', keyfile, '-out', certfile],
+        check=True, capture_output=True
+    )
+    return certfile, keyfile
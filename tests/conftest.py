@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Tests never touch the real SMP API or the shared conversation database
+os.environ.setdefault('WASTEKING_CONVERSATION_STORE', 'memory')
+os.environ.setdefault('WASTEKING_BOOKING_POOL_SIZE', '0')
+os.environ.setdefault('WASTEKING_BASE_URL', 'http://127.0.0.1:9')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
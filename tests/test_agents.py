@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+import agents
+from agents import MAVAgent
+
+
+class BarrierClient:
+    """Async client whose bookings only return once every expected booking is in flight"""
+
+    def __init__(self, expected):
+        self.expected = expected
+        self.started = 0
+        self.all_started = None
+
+    async def complete_booking(self, customer_data):
+        self.all_started = self.all_started or asyncio.Event()
+        self.started += 1
+        if self.started == self.expected:
+            self.all_started.set()
+        await self.all_started.wait()
+        name = customer_data['firstName']
+        return {'success': True, 'booking_ref': f'BR-{name}', 'price': '£300.00', 'payment_link': f'https://pay.example/{name}'}
+
+
+def priced_without_ref(name):
+    return {'firstName': name, 'postcode': 'LS14ED', 'phone': '07700900000', 'service': 'mav', 'type': '4yd',
+            'price': '£300.00', 'heavy_materials_checked': True}
+
+
+def test_concurrent_ref_less_bookings_keep_their_own_results(monkeypatch):
+    monkeypatch.setattr(agents, 'async_client', BarrierClient(expected=2))
+    monkeypatch.setattr(agents, 'complete_booking', lambda customer_data: {'success': False, 'error': 'blocking call'})
+    monkeypatch.setattr(MAVAgent, 'send_sms', lambda *args: None)
+    # Both prefetched bookings are stored before either turn reads its own
+    both_prefetched = threading.Barrier(2, timeout=5)
+    run_step = MAVAgent.run_step
+
+    def run_step_after_both_prefetches(self, *args):
+        both_prefetched.wait()
+        return run_step(self, *args)
+
+    monkeypatch.setattr(MAVAgent, 'run_step', run_step_after_both_prefetches)
+    agent = MAVAgent()
+    for name in ('Alice', 'Bob'):
+        agent.conversations[f'conv-{name}'] = priced_without_ref(name)
+
+    async def both():
+        return await asyncio.gather(*(agent.process_message_async('book it', f'conv-{name}') for name in ('Alice', 'Bob')))
+
+    alice, bob = asyncio.run(both())
+
+    assert 'BR-Alice' in alice and 'pay.example/Alice' in alice and 'Bob' not in alice
+    assert 'BR-Bob' in bob and 'pay.example/Bob' in bob and 'Alice' not in bob
+    assert agent.conversations['conv-Alice']['booking_ref'] == 'BR-Alice'
+    assert agent.conversations['conv-Bob']['booking_ref'] == 'BR-Bob'
+    assert agent.prefetched_bookings == {}
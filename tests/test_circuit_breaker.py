@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+import utils.circuit_breaker as cb
+from utils.circuit_breaker import EndpointBreaker, Probe, CLOSED, OPEN, HALF_OPEN
+
+
+def open_breaker(monkeypatch):
+    monkeypatch.setattr(cb, 'BREAKER_OPEN_SECONDS', 0)
+    breaker = EndpointBreaker('api/booking/update')
+    for _ in range(cb.BREAKER_MIN_REQUESTS):
+        breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+    return breaker
+
+
+def test_only_the_probe_settles_half_open(monkeypatch):
+    breaker = open_breaker(monkeypatch)
+    probe = breaker.allow()
+    assert isinstance(probe, Probe) and breaker.state == HALF_OPEN
+
+    # A call let through while the circuit was still closed finishes now
+    breaker.record(True, 0.1, True)
+    assert breaker.state == HALF_OPEN
+
+    breaker.record(True, 0.1, probe)
+    assert breaker.state == CLOSED
+
+
+def test_probe_from_an_earlier_half_open_is_ignored(monkeypatch):
+    breaker = open_breaker(monkeypatch)
+    stale = breaker.allow()
+    breaker.record(False, 0.1, stale)
+    assert breaker.state == OPEN
+
+    current = breaker.allow()
+    assert current.generation != stale.generation
+    breaker.record(True, 0.1, stale)
+    assert breaker.state == HALF_OPEN
+    breaker.record(False, 0.1, current)
+    assert breaker.state == OPEN
+
+
+def test_probe_gets_the_configured_timeout(monkeypatch):
+    breaker = open_breaker(monkeypatch)
+    for _ in range(cb.ADAPTIVE_TIMEOUT_MIN_SAMPLES):
+        breaker.record(True, 0.01)
+    assert breaker.read_timeout(30) == cb.ADAPTIVE_TIMEOUT_MIN
+    assert breaker.read_timeout(30, breaker.allow()) == 30
+
+
+def test_timeouts_raise_the_adaptive_timeout():
+    breaker = EndpointBreaker('api/booking/update')
+    for _ in range(cb.ADAPTIVE_TIMEOUT_MIN_SAMPLES):
+        breaker.record(True, 0.05)
+    assert breaker.read_timeout(30) == cb.ADAPTIVE_TIMEOUT_MIN
+
+    # The API slows down and calls hit the adaptive timeout - failures count as samples too
+    breaker.record(False, breaker.read_timeout(30))
+    assert breaker.read_timeout(30) == cb.ADAPTIVE_TIMEOUT_MIN * cb.ADAPTIVE_TIMEOUT_MULTIPLIER
+    breaker.record(False, breaker.read_timeout(30))
+    breaker.record(False, breaker.read_timeout(30))
+    assert breaker.read_timeout(30) == 30
+
+
+def test_cached_p99_matches_a_full_sort():
+    breaker = EndpointBreaker('api/booking/update')
+    samples = [((i * 7919) % 1000) / 1000 for i in range(cb.LATENCY_SAMPLES * 3)]
+    for latency in samples:
+        breaker.record(True, latency)
+    window = sorted(samples[-cb.LATENCY_SAMPLES:])
+    assert breaker.p99() == window[min(int(len(window) * 0.99), len(window) - 1)]
+
+
+def test_released_probe_frees_its_slot(monkeypatch):
+    breaker = open_breaker(monkeypatch)
+    probe = breaker.allow()
+    assert breaker.allow() is False
+
+    breaker.release(probe)
+    assert breaker.state == HALF_OPEN
+    assert isinstance(breaker.allow(), Probe)
+
+
+def test_cancelled_async_probe_lets_the_breaker_probe_again(monkeypatch):
+    wasteking_async = pytest.importorskip('utils.wasteking_async')
+    monkeypatch.setattr(cb, 'BREAKER_OPEN_SECONDS', 0)
+    endpoint = 'api/test/cancelled-probe'
+    breaker = cb.circuit_breaker.get(endpoint)
+    for _ in range(cb.BREAKER_MIN_REQUESTS):
+        breaker.record(False, 0.1)
+
+    async def cancel_probe():
+        # Accepts the connection and never answers, like an API that hangs
+        server = await asyncio.start_server(lambda reader, writer: None, '127.0.0.1', 0)
+        client = wasteking_async.AsyncWasteKingClient(f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}")
+        probe = asyncio.ensure_future(client.request(endpoint, {}))
+        while breaker.probes_in_flight == 0:
+            await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        await client.close()
+        server.close()
+
+    asyncio.run(asyncio.wait_for(cancel_probe(), 5))
+    assert breaker.state == HALF_OPEN
+    assert isinstance(breaker.allow(), Probe)
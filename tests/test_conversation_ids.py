@@ -0,0 +1,72 @@
+import threading
+
+import utils.conversation_ids as ids
+from utils.conversation_ids import ConversationIdGenerator
+
+
+def test_ids_strictly_increase_within_a_millisecond(monkeypatch):
+    generator = ConversationIdGenerator()
+    monkeypatch.setattr(ids.time, 'time', lambda: 1700000000.0)
+    issued = [generator.next_id() for _ in range(1000)]
+    assert issued == sorted(issued) and len(set(issued)) == len(issued)
+    assert issued[0][16:21] == '00000'
+
+
+def test_sequence_restarts_each_millisecond(monkeypatch):
+    generator = ConversationIdGenerator()
+    now = [1700000000.0]
+    monkeypatch.setattr(ids.time, 'time', lambda: now[0])
+    generator.next_id()
+    generator.next_id()
+    now[0] += 0.001
+    assert generator.next_id()[16:21] == '00000'
+
+
+def test_exhausted_sequence_carries_into_the_next_millisecond(monkeypatch):
+    generator = ConversationIdGenerator()
+    monkeypatch.setattr(ids.time, 'time', lambda: 1700000000.0)
+    first = generator.next_id()
+    generator._local.sequence = ids._SEQUENCE_MAX
+    carried = generator.next_id()
+    assert carried > first
+    assert round(generator.created_at(carried) - generator.created_at(first), 3) == 0.001
+
+
+def test_clock_stepping_back_never_reorders(monkeypatch):
+    generator = ConversationIdGenerator()
+    now = [1700000000.0]
+    monkeypatch.setattr(ids.time, 'time', lambda: now[0])
+    before = generator.next_id()
+    now[0] -= 5
+    assert generator.next_id() > before
+
+
+def test_unique_across_threads():
+    generator = ConversationIdGenerator()
+    per_thread = []
+
+    def issue():
+        per_thread.append([generator.next_id() for _ in range(2000)])
+    threads = [threading.Thread(target=issue) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    issued = [conversation_id for ids_of_thread in per_thread for conversation_id in ids_of_thread]
+    assert len(set(issued)) == len(issued)
+    assert all(ids_of_thread == sorted(ids_of_thread) for ids_of_thread in per_thread)
+
+
+def test_threads_in_the_same_millisecond_get_different_ids(monkeypatch):
+    generator = ConversationIdGenerator()
+    monkeypatch.setattr(ids.time, 'time', lambda: 1700000000.0)
+    issued = []
+    thread = threading.Thread(target=lambda: issued.append(generator.next_id()))
+    thread.start()
+    thread.join()
+    issued.append(generator.next_id())
+
+    # Both threads start their sequence at 0 in the same millisecond - only the thread id tells them apart
+    assert issued[0][:21] == issued[1][:21]
+    assert issued[0] != issued[1]
+    assert generator.created_at(issued[0]) == generator.created_at(issued[1]) == 1700000000.0
@@ -0,0 +1,99 @@
+import threading
+import multiprocessing
+
+import pytest
+
+from utils.conversation_store import SQLiteConversationStore, MemoryConversationStore, FCNTL_AVAILABLE
+
+
+def increment(path, conversation_id, times):
+    store = SQLiteConversationStore(path)
+    for _ in range(times):
+        # A turn: read, change, write back - only safe while holding the conversation's lock
+        with store.lock(conversation_id):
+            state = store.get(conversation_id, {'turns': 0})
+            state['turns'] += 1
+            store[conversation_id] = state
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'conversations.db')
+
+
+def test_state_round_trips_between_instances(path):
+    SQLiteConversationStore(path)['c1'] = {'postcode': 'LS14ED', 'service': 'skip'}
+    other = SQLiteConversationStore(path)
+    assert other['c1'] == {'postcode': 'LS14ED', 'service': 'skip'}
+    assert 'c2' not in other
+    assert other.pop('c1')['service'] == 'skip'
+    assert len(other) == 0
+
+
+def test_lock_serialises_turns_across_threads(path):
+    store = SQLiteConversationStore(path)
+
+    def turns():
+        for _ in range(50):
+            with store.lock('c1'):
+                state = store.get('c1', {'turns': 0})
+                state['turns'] += 1
+                store['c1'] = state
+
+    threads = [threading.Thread(target=turns) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store['c1']['turns'] == 400
+
+
+@pytest.mark.skipif(not FCNTL_AVAILABLE, reason="cross-process locks need fcntl")
+def test_lock_serialises_turns_across_workers(path):
+    SQLiteConversationStore(path)
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=increment, args=(path, 'c1', 50)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+    assert SQLiteConversationStore(path)['c1']['turns'] == 200
+
+
+def test_other_conversations_are_not_blocked(path):
+    store = SQLiteConversationStore(path)
+    other = next(f'c{i}' for i in range(2, 100) if store._stripe(f'c{i}') != store._stripe('c1'))
+    other_done = threading.Event()
+
+    def other_turn():
+        with store.lock(other):
+            other_done.set()
+
+    with store.lock('c1'):
+        thread = threading.Thread(target=other_turn)
+        thread.start()
+        assert other_done.wait(5)
+    thread.join()
+
+
+def test_sweep_drops_idle_then_oldest(path, monkeypatch):
+    store = SQLiteConversationStore(path, ttl=60, max_entries=2)
+    for conversation_id in ('c1', 'c2', 'c3'):
+        store[conversation_id] = {'stage': 'collecting'}
+    store.sweep()
+    assert len(store) == 2 and 'c1' not in store
+
+    connection = store._connection()
+    connection.execute("UPDATE conversations SET updated_at = updated_at - 120 WHERE id = 'c2'")
+    store.sweep()
+    assert 'c2' not in store and 'c3' in store
+    assert (store.evicted_lru, store.evicted_ttl) == (1, 1)
+
+
+def test_memory_store_has_the_same_interface():
+    store = MemoryConversationStore()
+    with store.lock('c1'):
+        store['c1'] = {'turns': 1}
+    assert store.get('c1') == {'turns': 1}
+    assert store.stats()['backend'] == 'memory'
@@ -0,0 +1,188 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app
+from app import DashboardManager
+from utils.dashboard_events import SQLiteDashboardEvents
+
+
+@pytest.fixture
+def dashboard():
+    return DashboardManager()
+
+
+def call_data(stage='collecting', service='skip', price=None):
+    return {'stage': stage, 'collected_data': {'service': service}, 'price': price, 'history': []}
+
+
+def test_totals_stay_cumulative_when_calls_age_out(dashboard):
+    for i in range(4):
+        dashboard.update_call(f'c{i}', call_data('completed' if i % 2 else 'collecting'))
+    dashboard.live_calls.pop('c0')
+    dashboard.live_calls.pop('c1')
+
+    data = dashboard.get_manager_dashboard_data()
+    assert data['total_calls'] == 4
+    assert data['completed_calls'] == 2
+    assert data['service_breakdown'] == {'skip': 4}
+    assert data['tracked_calls'] == 2
+    assert data['tracked_completed_calls'] == 1
+    assert data['tracked_service_breakdown'] == {'skip': 2}
+
+
+def test_conversion_rate_never_exceeds_100(dashboard):
+    dashboard.update_call('c0', call_data('completed'))
+    dashboard.update_call('c0', call_data('collecting'))
+    dashboard.update_call('c0', call_data('completed'))
+    assert dashboard.get_manager_dashboard_data()['conversion_rate'] == 100
+
+
+def workers(tmp_path, count=2):
+    """Dashboards sharing one event log, like gunicorn workers on the same host"""
+    path = str(tmp_path / 'conversations.db')
+    return [DashboardManager(SQLiteDashboardEvents(path)) for _ in range(count)]
+
+
+def test_every_worker_sees_every_call(tmp_path):
+    first, second = workers(tmp_path)
+    first.update_call('c1', call_data(price='£300.00'))
+    second.update_call('c2', call_data('completed', 'mav'))
+    first.update_call('c2', call_data('transfer_completed', 'mav'))
+
+    for dashboard in (first, second):
+        data = dashboard.get_manager_dashboard_data()
+        assert data['total_calls'] == 2
+        assert data['tracked_stage_breakdown'] == {'collecting': 1, 'transfer_completed': 1}
+        assert [call['id'] for call in data['recent_calls']] == ['c1', 'c2']
+    assert first.get_analytics()['windows'] == second.get_analytics()['windows']
+
+
+def test_cursors_work_on_any_worker(tmp_path):
+    first, second = workers(tmp_path)
+    for i in range(5):
+        (first if i % 2 else second).update_call(f'c{i}', call_data())
+    page = first.list_calls(limit=2)
+    assert page == second.list_calls(limit=2)
+    assert second.list_calls(page['next_cursor'], limit=2) == first.list_calls(page['next_cursor'], limit=2)
+
+
+def test_a_restarted_worker_keeps_the_totals(tmp_path):
+    first, = workers(tmp_path, 1)
+    for i in range(3):
+        first.update_call(f'c{i}', call_data('completed'))
+    restarted, = workers(tmp_path, 1)
+    data = restarted.get_manager_dashboard_data()
+    assert (data['total_calls'], data['completed_calls'], data['tracked_calls']) == (3, 3, 3)
+    restarted.update_call('c3', call_data())
+    assert first.get_manager_dashboard_data()['total_calls'] == 4
+
+
+def test_feed_clients_get_other_workers_updates(tmp_path):
+    first, second = workers(tmp_path)
+    client = second.feed.subscribe()
+    first.update_call('c1', call_data())
+    second.sync()
+    assert 'event: call_started' in client.events.get_nowait()
+
+
+def test_window_rates_follow_the_calls_that_started_in_the_window(dashboard, monkeypatch):
+    class TwoHoursAgo(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) - timedelta(hours=2)
+
+    # Started two hours ago, completed just now: counts in the 24h window, not in the last hour
+    monkeypatch.setattr(app, 'datetime', TwoHoursAgo)
+    dashboard.update_call('old', call_data())
+    monkeypatch.undo()
+    dashboard.update_call('old', call_data('completed'))
+    dashboard.update_call('new', call_data())
+
+    windows = dashboard.get_analytics()['windows']
+    assert windows['1h']['all']['calls'] == 1
+    assert windows['1h']['all']['conversion_rate'] == 0
+    assert windows['24h']['all']['conversion_rate'] == 50.0
+
+
+def newest_first(dashboard):
+    return [key[1] for key in reversed(dashboard.call_index)]
+
+
+def page_through(dashboard, limit, **kwargs):
+    ids, cursor = [], None
+    while True:
+        page = dashboard.list_calls(cursor, limit, **kwargs)
+        ids += [call['id'] for call in page['calls']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            return ids
+
+
+def test_pages_cover_every_call_once_newest_started_first(dashboard):
+    for i in range(23):
+        dashboard.update_call(f'c{i}', call_data('completed' if i % 3 == 0 else 'collecting'))
+
+    assert page_through(dashboard, 5) == newest_first(dashboard)
+    assert dashboard.list_calls(limit=23)['next_cursor'] is None
+    assert dashboard.list_calls(limit=5)['tracked_calls'] == 23
+
+
+def test_status_filter_pages_only_matching_calls(dashboard):
+    for i in range(23):
+        dashboard.update_call(f'c{i}', call_data('completed' if i % 3 == 0 else 'collecting'))
+    completed = [call_id for call_id in newest_first(dashboard) if int(call_id[1:]) % 3 == 0]
+
+    assert page_through(dashboard, 3, status='completed') == completed
+    assert page_through(dashboard, 4, status='active') == [c for c in newest_first(dashboard) if c not in completed]
+
+
+def test_pages_stay_stable_while_calls_are_updated(dashboard):
+    for i in range(6):
+        dashboard.update_call(f'c{i}', call_data())
+    order = newest_first(dashboard)
+    first = dashboard.list_calls(limit=3)
+
+    dashboard.update_call(order[0], call_data('quoted', price='£300.00'))
+    dashboard.update_call(order[4], call_data('quoted', price='£300.00'))
+    second = dashboard.list_calls(first['next_cursor'], limit=3)
+
+    assert [call['id'] for call in first['calls'] + second['calls']] == order
+
+
+def test_fields_project_each_call(dashboard):
+    dashboard.update_call('c1', {**call_data(), 'history': ['Customer: hi', 'Agent: hello']})
+
+    assert dashboard.list_calls(fields=('id', 'message_count', 'last_message'))['calls'] == [
+        {'id': 'c1', 'message_count': 2, 'last_message': 'Agent: hello'}
+    ]
+    assert 'history' not in dashboard.list_calls()['calls'][0]
+    assert dashboard.get_call('c1')['history'] == ['Customer: hi', 'Agent: hello']
+    assert dashboard.get_call('missing') is None
+
+
+def test_parse_call_fields():
+    assert app.parse_call_fields(None) == app.CALL_SUMMARY_FIELDS
+    assert app.parse_call_fields(' id, stage ,,price') == ('id', 'stage', 'price')
+    with pytest.raises(ValueError, match='Unknown fields: secret'):
+        app.parse_call_fields('id,secret')
+
+
+@pytest.mark.parametrize('cursor', ['not-base64!', app.encode_cursor(('only one',))[:-2], 'W10='])
+def test_invalid_cursor_is_rejected(dashboard, cursor):
+    dashboard.update_call('c1', call_data())
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        dashboard.list_calls(cursor)
+
+
+def test_calls_api_answers_400_for_bad_input_and_404_for_missing_calls(dashboard, monkeypatch):
+    monkeypatch.setattr(app, 'dashboard_manager', dashboard)
+    dashboard.update_call('c1', call_data())
+    client = app.app.test_client()
+
+    assert client.get('/api/dashboard/calls?fields=id').get_json()['data']['calls'] == [{'id': 'c1'}]
+    assert client.get('/api/dashboard/calls?fields=nope').status_code == 400
+    assert client.get('/api/dashboard/calls?cursor=garbage').status_code == 400
+    assert client.get('/api/dashboard/calls?limit=many').status_code == 400
+    assert client.get('/api/dashboard/calls/c1').get_json()['data']['id'] == 'c1'
+    assert client.get('/api/dashboard/calls/missing').status_code == 404
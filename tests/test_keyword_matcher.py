@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+from utils.keyword_matcher import KeywordMatcher
+
+
+def substring_hits(tables, message):
+    """What the agents checked before the matcher: `phrase in message.lower()` per table, in table order"""
+    message_lower = message.lower()
+    hits = {}
+    for category, phrases in tables.items():
+        found = tuple(phrase.lower() for phrase in phrases if phrase.lower() in message_lower)
+        if found:
+            hits[category] = found
+    return hits
+
+
+def phrase_mixes(tables, count, seed):
+    phrases = sorted({phrase for table in tables.values() for phrase in table})
+    filler = ['hi', 'my name is Sam', 'at LS14ED', 'please', 'thanks', '', 'I have', 'in the back']
+    rng = random.Random(seed)
+    for _ in range(count):
+        words = rng.sample(phrases, rng.randint(0, 4)) + rng.sample(filler, rng.randint(0, 3))
+        rng.shuffle(words)
+        message = rng.choice([' ', '', ', ']).join(words)
+        yield message.upper() if rng.random() < 0.2 else message
+
+
+def agent_tables():
+    import app
+    import agents
+    return [
+        ('app', app.keyword_tables(app.rules_registry.current.rules)),
+        ('agents', agents.keyword_tables(agents.rules_registry.current.rules))
+    ]
+
+
+@pytest.mark.parametrize('name, tables', agent_tables())
+def test_matches_the_old_substring_checks_for_every_agent_table(name, tables):
+    matcher = KeywordMatcher(tables, cache_size=0)
+    for message in phrase_mixes(tables, 2000, seed=name):
+        assert dict(matcher.scan(message)) == substring_hits(tables, message), message
+
+
+def test_finds_every_overlapping_phrase_at_one_position():
+    tables = {'skip': ['skip', 'skip hire'], 'hire': ['hire'], 'mav': ['man & van', 'van']}
+    matcher = KeywordMatcher(tables)
+
+    hits = matcher.scan('Skip Hire or a MAN & VAN?')
+
+    assert hits == {'skip': ('skip', 'skip hire'), 'hire': ('hire',), 'mav': ('man & van', 'van')}
+    assert hits.any('nothing', 'mav')
+    assert not hits.any('nothing')
+
+
+def test_phrases_come_back_in_table_order_not_message_order():
+    matcher = KeywordMatcher({'waste': ['soil', 'brick', 'rubble']})
+
+    assert matcher.scan('rubble, bricks and soil')['waste'] == ('soil', 'brick', 'rubble')
+
+
+def test_regex_characters_in_phrases_are_literal():
+    matcher = KeywordMatcher({'booking': ["i'll take it", 'what can\'t put', '(urgent)', 'a.b']})
+
+    assert matcher.scan("I'll take it (urgent)")['booking'] == ("i'll take it", '(urgent)')
+    assert 'booking' not in matcher.scan('axb')
+
+
+def test_repeated_messages_are_served_from_the_scan_cache():
+    matcher = KeywordMatcher({'skip': ['skip']}, cache_size=8)
+
+    first = matcher.scan('a skip please')
+    assert matcher.scan('a skip please') is first
+    assert matcher.stats()['scan_cache_hits'] == 1
+    assert matcher.stats()['scan_cache_misses'] == 1
+
+
+def test_stats_count_tables_phrases_and_trie_nodes():
+    matcher = KeywordMatcher({'a': ['ab', 'abc'], 'b': ['b']}, cache_size=0)
+
+    assert matcher.stats() == {
+        'categories': 2, 'phrases': 3, 'trie_nodes': 5, 'scan_cache_hits': 0, 'scan_cache_misses': 0
+    }
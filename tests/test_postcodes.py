@@ -0,0 +1,89 @@
+import pytest
+
+from utils.postcodes import PostcodeIndex, POSTCODE_INDEX_FILE
+
+
+@pytest.fixture(scope='module')
+def areas():
+    return PostcodeIndex(POSTCODE_INDEX_FILE)
+
+
+def index_of(tmp_path, text):
+    path = tmp_path / 'postcodes.txt'
+    path.write_text(text)
+    return PostcodeIndex(str(path))
+
+
+@pytest.mark.parametrize('postcode, expected', [
+    ('LS1 4ED', 'LS14ED'),
+    ('ls14ed', 'LS14ED'),
+    (' M1 1AE ', 'M11AE'),
+    ('W1A 1AA', 'W1A1AA'),
+    ('EC1A 1BB', 'EC1A1BB'),
+    ('B33 8TH', 'B338TH')
+])
+def test_shipped_areas_accept_real_postcodes(areas, postcode, expected):
+    assert areas.validate(postcode) == expected
+
+
+@pytest.mark.parametrize('postcode', [
+    'QS1 4ED',   # Q never starts a postcode
+    'LS1 4CD',   # C never appears in the inward code
+    'LS1 ED',    # inward code too short
+    'LS14',      # outward code only
+    '12345',
+    '',
+    None
+])
+def test_badly_formed_postcodes_are_rejected(areas, postcode):
+    assert areas.validate(postcode) is None
+
+
+def test_well_formed_postcode_in_an_area_the_file_leaves_out_is_rejected(areas):
+    assert areas.validate('BF1 3AA') is None
+    assert areas.stats()['rejected_unknown'] >= 1
+
+
+def test_each_line_can_be_an_area_outward_code_or_full_postcode(tmp_path):
+    index = index_of(tmp_path, "# test index\nB\nLS1\nM1 1AE  # one building\n\nls1\n")
+
+    assert len(index) == 3
+    assert index.validate('B33 8TH') == 'B338TH'     # area
+    assert index.validate('BA1 1AA') is None         # B does not cover BA
+    assert index.validate('LS1 4ED') == 'LS14ED'     # outward code
+    assert index.validate('LS2 7AA') is None
+    assert index.validate('M1 1AE') == 'M11AE'       # full postcode
+    assert index.validate('M1 2AA') is None
+
+
+def test_lookups_find_every_entry_of_a_large_index(tmp_path):
+    codes = [f"{area}{district}" for area in ('AB', 'CM', 'LS', 'SW', 'YO') for district in range(1, 100)]
+    index = index_of(tmp_path, '\n'.join(reversed(codes)))
+
+    assert len(index) == len(codes)
+    assert all(code in index for code in codes)
+    assert 'LS100' not in index and 'AA1' not in index and 'ZZ1' not in index
+    assert index.stats()['bytes'] == 7 * len(codes)
+
+
+def test_missing_file_falls_back_to_the_format_check(tmp_path):
+    index = PostcodeIndex(str(tmp_path / 'missing.txt'))
+
+    assert len(index) == 0
+    assert index.validate('BF1 3AA') == 'BF13AA'
+    assert index.validate('QS1 4ED') is None
+
+
+def test_stats_count_lookups_and_rejections(tmp_path):
+    index = index_of(tmp_path, "LS\n")
+    for postcode in ('LS1 4ED', 'M1 1AE', 'not a postcode'):
+        index.validate(postcode)
+
+    stats = index.stats()
+    assert (stats['entries'], stats['lookups'], stats['rejected_format'], stats['rejected_unknown']) == (1, 3, 1, 1)
+
+
+def test_display_puts_the_space_back():
+    assert PostcodeIndex.display('LS14ED') == 'LS1 4ED'
+    assert PostcodeIndex.display('EC1A1BB') == 'EC1A 1BB'
+    assert PostcodeIndex.display(None) is None
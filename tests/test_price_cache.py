@@ -0,0 +1,78 @@
+import types
+
+import pytest
+
+import utils.price_cache as pc
+from utils.price_cache import PriceCache, price_key
+
+ITEMS = [{'type': '4yd', 'price': '£200.00'}, {'type': '8yd', 'price': '£300.00'}]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(pc, 'time', types.SimpleNamespace(monotonic=lambda: now.value, time=lambda: now.value))
+    return now
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = PriceCache(ttl=300, max_age=900)
+    cache.put('ls1 4ed', 'skip', '8yd', ITEMS)
+    clock.value += 300
+    assert cache.get('LS14ED', 'skip', '8yd') == ITEMS
+    clock.value += 1
+    assert cache.get('LS14ED', 'skip', '8yd') is None
+    assert cache.stats()['expired'] == 1 and cache.stats()['entries'] == 0
+
+
+def test_caller_ttl_can_shorten_but_never_pass_max_age(clock):
+    cache = PriceCache(ttl=300, max_age=900)
+    cache.put('LS14ED', 'mav', '4yd', ITEMS)
+    clock.value += 60
+    assert cache.get('LS14ED', 'mav', '4yd', ttl=30) is None
+    # A shorter caller TTL doesn't evict - the entry is still good for the default TTL
+    assert cache.get('LS14ED', 'mav', '4yd') == ITEMS
+
+    long_lived = PriceCache(ttl=3600, max_age=900)
+    long_lived.put('LS14ED', 'mav', '4yd', ITEMS)
+    clock.value += 901
+    assert long_lived.get('LS14ED', 'mav', '4yd', ttl=7200) is None
+
+
+def test_entry_age_is_reported(clock):
+    cache = PriceCache(ttl=300)
+    cache.put('LS14ED', 'skip', None, ITEMS)
+    clock.value += 42
+    assert cache.get_entry('LS14ED', 'skip') == (ITEMS, 42)
+
+
+def test_least_recently_used_goes_first_when_full(clock):
+    cache = PriceCache(max_entries=2)
+    cache.put('LS14ED', 'mav', '4yd', ITEMS)
+    cache.put('LS15ED', 'mav', '4yd', ITEMS)
+    cache.get('LS14ED', 'mav', '4yd')
+    cache.put('LS16ED', 'mav', '4yd', ITEMS)
+    assert cache.get('LS15ED', 'mav', '4yd') is None
+    assert cache.get('LS14ED', 'mav', '4yd') == ITEMS
+    assert cache.stats()['evictions'] == 1
+
+
+def test_skip_prices_are_shared_across_sizes():
+    assert price_key('ls1 4ed', 'skip', '8yd') == price_key('LS14ED', 'skip', '4yd')
+    assert price_key('LS14ED', 'mav', '8yd') != price_key('LS14ED', 'mav', '4yd')
+
+
+def test_invalidate_by_postcode(clock):
+    cache = PriceCache()
+    cache.put('LS14ED', 'skip', None, ITEMS)
+    cache.put('LS14ED', 'mav', '4yd', ITEMS)
+    cache.put('M11AA', 'skip', None, ITEMS)
+    assert cache.invalidate(postcode='ls1 4ed') == 2
+    assert cache.get('M11AA', 'skip') == ITEMS
+
+
+def test_quote_freshness_follows_the_ttl(clock, monkeypatch):
+    monkeypatch.setattr(pc, 'PRICE_CACHE_TTL', 300)
+    assert pc.quote_is_fresh(clock.value - 300)
+    assert not pc.quote_is_fresh(clock.value - 301)
+    assert not pc.quote_is_fresh(None)
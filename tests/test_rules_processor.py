@@ -0,0 +1,10 @@
+from utils.rules_processor import RulesProcessor
+
+
+def test_building_a_processor_does_not_start_the_watcher(tmp_path):
+    processor = RulesProcessor(pdf_path=str(tmp_path / 'missing.pdf'), cache_path=str(tmp_path / 'rules.json'))
+    assert not processor.registry.stats()['watching']
+
+    processor.start()
+    processor.start()
+    assert processor.registry.stats()['watching']
@@ -0,0 +1,113 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight('pricing')
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return {'price': '£300.00'}
+
+    def caller():
+        results.append(flight.do('LS14ED', fetch))
+
+    threads = [threading.Thread(target=caller) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: flight.stats()['coalesced_calls'] == 7)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert all(result == {'price': '£300.00'} for result, _ in results)
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight('pricing')
+    assert flight.do('LS14ED', lambda: 1) == (1, False)
+    assert flight.do('M11AA', lambda: 2) == (2, False)
+    # Finished flights are forgotten - the next call goes upstream again
+    assert flight.do('LS14ED', lambda: 3) == (3, False)
+
+
+def test_followers_see_the_leaders_error():
+    flight = SingleFlight('pricing')
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise ValueError('upstream down')
+
+    def follower():
+        try:
+            flight.do('LS14ED', lambda: 'never runs')
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=lambda: pytest.raises(ValueError, flight.do, 'LS14ED', fail))
+    leader.start()
+    started.wait(5)
+    thread = threading.Thread(target=follower)
+    thread.start()
+    wait_until(lambda: flight.stats()['coalesced_calls'] == 1)
+    release.set()
+    leader.join()
+    thread.join()
+    assert [str(e) for e in errors] == ['upstream down']
+
+
+def test_async_callers_share_one_call():
+    flight = SingleFlight('pricing')
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'quote'
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async('LS14ED', fetch) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert [shared for _, shared in results].count(False) == 1
+    assert all(result == 'quote' for result, _ in results)
+
+
+def test_cancelled_async_follower_does_not_cancel_the_call():
+    flight = SingleFlight('pricing')
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return 'quote'
+
+    async def main():
+        leader = asyncio.create_task(flight.do_async('LS14ED', fetch))
+        follower = asyncio.create_task(flight.do_async('LS14ED', fetch))
+        await asyncio.sleep(0)
+        follower.cancel()
+        return await leader
+
+    assert asyncio.run(main()) == ('quote', False)
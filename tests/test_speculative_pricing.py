@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+import utils.speculative_pricing as sp
+from utils.speculative_pricing import SpeculativePricer, SQLiteSpeculationStore, MemorySpeculationStore
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(sp, 'SPECULATIVE_PRICING_ENABLED', True)
+
+
+def fake_fetch(release=None):
+    calls = []
+
+    def fetch(postcode, service, skip_type):
+        calls.append((postcode, service, skip_type))
+        if release is not None:
+            release.wait(5)
+        return {'booking': {'success': True, 'booking_ref': f'BR{len(calls)}'}, 'pricing': {'success': True, 'price': '£300.00'}}
+    return fetch, calls
+
+
+def workers(tmp_path, fetch, count=2, **kwargs):
+    """Pricers sharing one database file, like gunicorn workers on the same host"""
+    path = str(tmp_path / 'conversations.db')
+    return [SpeculativePricer(fetch, store=SQLiteSpeculationStore(path), **kwargs) for _ in range(count)]
+
+
+def test_quote_started_on_one_worker_is_used_on_another(tmp_path):
+    fetch, calls = fake_fetch()
+    first, second = workers(tmp_path, fetch)
+    assert first.speculate('c1', 'LS14ED', 'skip', '8yd')
+    assert second.pending('c1', 'LS14ED', 'skip', '8yd')
+
+    quote = second.claim('c1', 'LS14ED', 'skip', '8yd')
+    assert quote['booking']['booking_ref'] == 'BR1'
+    assert len(calls) == 1
+    assert first.claim('c1', 'LS14ED', 'skip', '8yd') is None
+
+
+def test_other_worker_waits_for_a_quote_in_flight(tmp_path):
+    release = threading.Event()
+    fetch, _ = fake_fetch(release)
+    first, second = workers(tmp_path, fetch)
+    first.speculate('c1', 'LS14ED', 'skip', '8yd')
+    threading.Timer(0.2, release.set).start()
+
+    assert second.claim('c1', 'LS14ED', 'skip', '8yd') is not None
+    assert second.waited_on_claim == 1
+
+
+def test_speculation_already_running_elsewhere_is_not_repeated(tmp_path):
+    release = threading.Event()
+    fetch, calls = fake_fetch(release)
+    first, second = workers(tmp_path, fetch)
+    assert first.speculate('c1', 'LS14ED', 'skip', '8yd')
+    assert not second.speculate('c1', 'LS14ED', 'skip', '8yd')
+    release.set()
+    assert second.claim('c1', 'LS14ED', 'skip', '8yd') is not None
+    assert len(calls) == 1
+
+
+def test_mismatched_or_stale_speculation_is_wasted(tmp_path):
+    fetch, _ = fake_fetch()
+    first, second = workers(tmp_path, fetch, max_age=0)
+    first.speculate('c1', 'LS14ED', 'skip', '8yd')
+    assert second.claim('c1', 'LS14ED', 'mav', '8yd') is None
+    assert second.wasted == 1
+
+    first.speculate('c2', 'LS14ED', 'skip', '8yd')
+    assert second.claim('c2', 'LS14ED', 'skip', '8yd') is None
+    assert len(second.store) == 0
+
+
+def test_memory_store_keeps_the_single_worker_behaviour():
+    fetch, _ = fake_fetch()
+    pricer = SpeculativePricer(fetch, store=MemorySpeculationStore())
+    pricer.speculate('c1', 'LS14ED', 'skip', '8yd')
+    assert pricer.claim('c1', 'LS14ED', 'skip', '8yd')['pricing']['price'] == '£300.00'
+    assert pricer.stats()['store'] == 'memory'
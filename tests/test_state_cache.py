@@ -0,0 +1,71 @@
+import json
+import types
+
+import pytest
+
+import utils.state_cache as sc
+from utils.state_cache import BoundedStateCache, SpillFile, call_finished
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(sc, 'time', types.SimpleNamespace(monotonic=lambda: now.value, time=lambda: now.value))
+    return now
+
+
+def test_idle_entries_expire_and_reads_keep_them_alive(clock):
+    removed = []
+    cache = BoundedStateCache('calls', ttl=60, max_entries=10, on_remove=lambda key, value: removed.append(key))
+    cache['a'] = 1
+    cache['b'] = 2
+    clock.value += 50
+    assert cache.get('a') == 1
+    clock.value += 20
+    assert cache.peek('b') == 2  # peek neither refreshes nor evicts
+    assert cache.sweep() == 1
+    assert 'a' in cache and 'b' not in cache
+    assert removed == ['b'] and cache.evicted_ttl == 1
+
+
+def test_least_recently_used_goes_first_when_full(clock):
+    cache = BoundedStateCache('calls', ttl=0, max_entries=2)
+    cache['a'] = 1
+    cache['b'] = 2
+    cache.get('a')
+    cache['c'] = 3
+    assert [key for key, _ in cache.items()] == ['a', 'c']
+    assert cache.evicted_lru == 1
+
+
+def test_backdated_put_keeps_its_remaining_ttl(clock):
+    cache = BoundedStateCache('calls', ttl=60, max_entries=10)
+    cache.put('replayed', 1, age=50)
+    clock.value += 11
+    assert cache.get('replayed') is None
+
+
+def test_only_finished_entries_spill(clock, tmp_path):
+    spill = SpillFile('live_calls.jsonl', directory=str(tmp_path))
+    cache = BoundedStateCache('calls', ttl=0, max_entries=1, spill=spill, is_finished=call_finished)
+    cache['done'] = {'status': 'completed'}
+    cache['active'] = {'status': 'active'}
+    cache['next'] = {'status': 'active'}
+
+    lines = [json.loads(line) for line in (tmp_path / 'live_calls.jsonl').read_text().splitlines()]
+    assert [line['id'] for line in lines] == ['done']
+    assert lines[0]['data'] == {'status': 'completed'}
+    assert spill.spilled == 1
+
+
+def test_pop_and_delete_call_on_remove():
+    removed = []
+    cache = BoundedStateCache('calls', ttl=0, max_entries=0, on_remove=lambda key, value: removed.append((key, value)))
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache.pop('a') == 1
+    del cache['b']
+    assert cache.pop('missing', 'default') == 'default'
+    assert removed == [('a', 1), ('b', 2)]
+    with pytest.raises(KeyError):
+        cache['a']
@@ -0,0 +1,63 @@
+from utils.time_series import RollingCounters, window_label
+
+
+class Clock:
+    def __init__(self, now=1_700_000_000):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def counters(clock):
+    return RollingCounters(windows=[300, 3600], resolution=60, clock=clock)
+
+
+def test_counts_leave_each_window_as_it_passes():
+    clock = Clock()
+    rolling = counters(clock)
+    rolling.add('calls', 3)
+    assert rolling.totals('calls') == {300: 3, 3600: 3}
+
+    clock.now += 300
+    assert rolling.totals('calls') == {300: 0, 3600: 3}
+    clock.now += 3300
+    assert rolling.totals('calls') == {300: 0, 3600: 0}
+
+
+def test_idle_longer_than_every_window_resets():
+    clock = Clock()
+    rolling = counters(clock)
+    rolling.add('calls')
+    clock.now += 10 * 3600
+    rolling.add('calls')
+    assert rolling.totals('calls') == {300: 1, 3600: 1}
+
+
+def test_backdated_counts_land_in_their_own_bucket():
+    clock = Clock()
+    rolling = counters(clock)
+    rolling.add('completed', at=clock.now - 600)
+    assert rolling.totals('completed') == {300: 0, 3600: 1}
+    assert rolling.series('completed', 900)[-11] == 1
+
+    # Already older than the longest window - dropped
+    rolling.add('completed', at=clock.now - 7200)
+    assert rolling.totals('completed') == {300: 0, 3600: 1}
+
+    clock.now += 3000
+    assert rolling.totals('completed') == {300: 0, 3600: 0}
+
+
+def test_series_is_oldest_first():
+    clock = Clock()
+    rolling = counters(clock)
+    rolling.add('calls')
+    clock.now += 60
+    rolling.add('calls', 2)
+    assert rolling.series('calls', 300) == [0, 0, 0, 1, 2]
+    assert rolling.series('missing', 120) == [0, 0]
+
+
+def test_window_labels():
+    assert [window_label(seconds) for seconds in (300, 3600, 86400, 45)] == ['5m', '1h', '24h', '45s']
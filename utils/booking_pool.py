@@ -0,0 +1,149 @@
+import os
+import time
+import threading
+from collections import deque
+
+# Booking reference pool configuration - NO HARDCODING
+BOOKING_POOL_SIZE = int(os.getenv('WASTEKING_BOOKING_POOL_SIZE', '4'))
+BOOKING_REF_MAX_AGE = float(os.getenv('WASTEKING_BOOKING_REF_MAX_AGE', '600'))
+BOOKING_POOL_RETRY_DELAY = float(os.getenv('WASTEKING_BOOKING_POOL_RETRY_DELAY', '5'))
+# Stop topping up after this long without a pricing turn - an idle worker shouldn't create refs just to expire them
+BOOKING_POOL_IDLE_TIMEOUT = float(os.getenv('WASTEKING_BOOKING_POOL_IDLE_TIMEOUT', str(BOOKING_REF_MAX_AGE)))
+
+
+class BookingRefPool:
+    """Per-worker pool of pre-created booking refs, refilled by a background thread.
+
+    Refills are driven by demand: the pool tops itself up only while pricing turns keep taking refs,
+    and lets the remaining refs expire once the worker has been idle for idle_timeout.
+    """
+
+    def __init__(self, create_fn, size=BOOKING_POOL_SIZE, max_age=BOOKING_REF_MAX_AGE,
+                 retry_delay=BOOKING_POOL_RETRY_DELAY, idle_timeout=BOOKING_POOL_IDLE_TIMEOUT):
+        self.create_fn = create_fn
+        self.size = size
+        self.max_age = max_age
+        self.retry_delay = retry_delay
+        self.idle_timeout = idle_timeout
+        self._last_demand = None  # monotonic time of the last acquire(); None until the first pricing turn
+        self._refs = deque()  # (created_at, booking_ref), oldest on the left
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self.created = 0
+        self.used = 0
+        self.misses = 0
+        self.discarded = 0
+        self.refill_failures = 0
+        self.last_refill_ms = None
+        self._refill_ms_total = 0.0
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork_in_child)
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def acquire(self):
+        """Pop a fresh booking ref in O(1), or None if the pool is empty"""
+        if not self.enabled:
+            return None
+        self._ensure_refiller()
+        booking_ref = None
+        with self._lock:
+            self._last_demand = time.monotonic()
+            self._discard_expired()
+            if self._refs:
+                # Newest first - the oldest refs are the next to expire anyway
+                _, booking_ref = self._refs.pop()
+                self.used += 1
+            else:
+                self.misses += 1
+        self._wakeup.set()
+        return booking_ref
+
+    def start(self):
+        """Start the refiller - the pool fills from the first pricing turn on"""
+        if self.enabled:
+            self._ensure_refiller()
+
+    def _discard_expired(self):
+        cutoff = time.monotonic() - self.max_age
+        while self._refs and self._refs[0][0] < cutoff:
+            self._refs.popleft()
+            self.discarded += 1
+
+    def _after_fork_in_child(self):
+        # Refs inherited from the gunicorn master belong to the parent - never hand them out twice
+        self._refs = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self._last_demand = None
+
+    def _ensure_refiller(self):
+        pid = os.getpid()
+        if self._thread is not None and self._thread_pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._thread_pid != pid or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._refill_loop, name='booking-ref-pool', daemon=True)
+                self._thread_pid = pid
+                self._thread.start()
+                print(f"📋 BOOKING REF POOL STARTED (pid={pid}, size={self.size})")
+
+    def _idle(self):
+        return self._last_demand is None or time.monotonic() - self._last_demand > self.idle_timeout
+
+    def _refill_loop(self):
+        while True:
+            with self._lock:
+                self._discard_expired()
+                needed = self.size - len(self._refs)
+                idle = self._idle()
+            if needed <= 0 or idle:
+                # Wake up on demand, or in time to notice the oldest ref expiring
+                self._wakeup.wait(timeout=max(self.max_age / 4, 1))
+                self._wakeup.clear()
+                continue
+
+            started = time.monotonic()
+            try:
+                result = self.create_fn()
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            elapsed_ms = (time.monotonic() - started) * 1000
+
+            if result.get('success') and result.get('booking_ref'):
+                with self._lock:
+                    self._refs.append((time.monotonic(), result['booking_ref']))
+                    self.created += 1
+                    self.last_refill_ms = elapsed_ms
+                    self._refill_ms_total += elapsed_ms
+            else:
+                with self._lock:
+                    self.refill_failures += 1
+                print(f"⚠️ BOOKING REF POOL REFILL FAILED: {result.get('error')}")
+                time.sleep(self.retry_delay)
+
+    def stats(self):
+        with self._lock:
+            finished = self.used + self.discarded
+            return {
+                'enabled': self.enabled,
+                'depth': len(self._refs),
+                'target_depth': self.size,
+                'max_age_seconds': self.max_age,
+                'idle': self._idle(),
+                'idle_timeout_seconds': self.idle_timeout,
+                'created': self.created,
+                'used': self.used,
+                'misses': self.misses,
+                'discarded': self.discarded,
+                'refill_failures': self.refill_failures,
+                'last_refill_ms': self.last_refill_ms,
+                'avg_refill_ms': (self._refill_ms_total / self.created) if self.created else None,
+                'waste_rate': (self.discarded / finished * 100) if finished else 0
+            }
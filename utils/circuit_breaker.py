@@ -0,0 +1,190 @@
+import os
+import time
+import bisect
+import threading
+from collections import deque
+
+# Circuit breaker configuration - NO HARDCODING
+BREAKER_ENABLED = os.getenv('WASTEKING_BREAKER_ENABLED', 'true').lower() == 'true'
+BREAKER_WINDOW = float(os.getenv('WASTEKING_BREAKER_WINDOW', '60'))
+BREAKER_MIN_REQUESTS = int(os.getenv('WASTEKING_BREAKER_MIN_REQUESTS', '5'))
+BREAKER_FAILURE_RATE = float(os.getenv('WASTEKING_BREAKER_FAILURE_RATE', '50'))
+BREAKER_OPEN_SECONDS = float(os.getenv('WASTEKING_BREAKER_OPEN_SECONDS', '30'))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv('WASTEKING_BREAKER_HALF_OPEN_PROBES', '1'))
+
+# Adaptive timeout: multiple of observed p99 latency, never above the configured timeout
+ADAPTIVE_TIMEOUT_ENABLED = os.getenv('WASTEKING_ADAPTIVE_TIMEOUT', 'true').lower() == 'true'
+ADAPTIVE_TIMEOUT_MULTIPLIER = float(os.getenv('WASTEKING_ADAPTIVE_TIMEOUT_MULTIPLIER', '3'))
+ADAPTIVE_TIMEOUT_MIN = float(os.getenv('WASTEKING_ADAPTIVE_TIMEOUT_MIN', '2'))
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = int(os.getenv('WASTEKING_ADAPTIVE_TIMEOUT_MIN_SAMPLES', '20'))
+LATENCY_SAMPLES = int(os.getenv('WASTEKING_LATENCY_SAMPLES', '200'))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class Probe:
+    """Ticket for a half-open trial request - only its own outcome may close or re-open the circuit"""
+    __slots__ = ('generation',)
+
+    def __init__(self, generation):
+        self.generation = generation
+
+
+class EndpointBreaker:
+    """Failure-rate circuit breaker and latency tracker for one API endpoint"""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.state = CLOSED
+        self.opened_at = None
+        self.probes_in_flight = 0
+        self._generation = 0  # bumped on every HALF_OPEN, so a late probe from an earlier one is ignored
+        self._outcomes = deque()  # (finished_at, ok) inside the failure-rate window
+        # Latencies of every finished call, failures and timeouts included - a slow API must be able
+        # to push the adaptive timeout back up, not just successes that happened to beat it
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._sorted_latencies = []  # same samples, kept sorted so p99 is an index lookup
+        self._p99 = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.times_opened = 0
+
+    def _trim(self, now):
+        cutoff = now - BREAKER_WINDOW
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+
+    def _failure_rate(self):
+        if not self._outcomes:
+            return 0.0
+        failures = sum(1 for _, ok in self._outcomes if not ok)
+        return failures / len(self._outcomes) * 100
+
+    def allow(self):
+        """Ticket for a request that may go upstream now - True, a Probe while half-open, False to fail fast"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == OPEN and now - self.opened_at >= BREAKER_OPEN_SECONDS:
+                self.state = HALF_OPEN
+                self.probes_in_flight = 0
+                self._generation += 1
+                print(f"🟡 CIRCUIT HALF-OPEN for {self.endpoint} - probing")
+            if self.state == HALF_OPEN and self.probes_in_flight < BREAKER_HALF_OPEN_PROBES:
+                self.probes_in_flight += 1
+                return Probe(self._generation)
+            self.rejected += 1
+            return False
+
+    def _is_current_probe(self, ticket):
+        return isinstance(ticket, Probe) and ticket.generation == self._generation and self.state == HALF_OPEN
+
+    def _add_latency(self, latency):
+        if len(self._latencies) == self._latencies.maxlen:
+            oldest = self._latencies[0]
+            del self._sorted_latencies[bisect.bisect_left(self._sorted_latencies, oldest)]
+        self._latencies.append(latency)
+        bisect.insort(self._sorted_latencies, latency)
+        ordered = self._sorted_latencies
+        self._p99 = ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)]
+
+    def record(self, ok, latency, ticket=True):
+        now = time.monotonic()
+        with self._lock:
+            self._add_latency(latency)
+            if self.state == HALF_OPEN:
+                # Calls let through before the circuit opened can still be finishing - only the probe decides
+                if not self._is_current_probe(ticket):
+                    return
+                self.probes_in_flight = max(self.probes_in_flight - 1, 0)
+                if ok:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    print(f"🟢 CIRCUIT CLOSED for {self.endpoint}")
+                else:
+                    self._open(now)
+                return
+            self._outcomes.append((now, ok))
+            self._trim(now)
+            if (self.state == CLOSED and len(self._outcomes) >= BREAKER_MIN_REQUESTS
+                    and self._failure_rate() >= BREAKER_FAILURE_RATE):
+                self._open(now)
+
+    def release(self, ticket):
+        """Call abandoned before it had an outcome (cancelled) - frees a probe's slot without judging the API"""
+        with self._lock:
+            if self._is_current_probe(ticket):
+                self.probes_in_flight = max(self.probes_in_flight - 1, 0)
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.times_opened += 1
+        print(f"🔴 CIRCUIT OPEN for {self.endpoint} - failing fast for {BREAKER_OPEN_SECONDS}s")
+
+    def p99(self):
+        return self._p99
+
+    def read_timeout(self, configured, ticket=True):
+        """Adaptive read timeout from observed p99, capped at the configured timeout"""
+        if isinstance(ticket, Probe):
+            # A probe decides whether the API is back - give it the full configured timeout
+            return configured
+        if not ADAPTIVE_TIMEOUT_ENABLED or len(self._latencies) < ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+            return configured
+        return min(configured, max(ADAPTIVE_TIMEOUT_MIN, self._p99 * ADAPTIVE_TIMEOUT_MULTIPLIER))
+
+    def snapshot(self):
+        p99 = self.p99()
+        with self._lock:
+            self._trim(time.monotonic())
+            return {
+                'endpoint': self.endpoint,
+                'state': self.state,
+                'failure_rate': round(self._failure_rate(), 1),
+                'window_requests': len(self._outcomes),
+                'p99_ms': round(p99 * 1000, 1) if p99 is not None else None,
+                'rejected': self.rejected,
+                'times_opened': self.times_opened
+            }
+
+
+class CircuitBreaker:
+    """Per-endpoint breakers for the SMP API"""
+
+    def __init__(self):
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint):
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(endpoint, EndpointBreaker(endpoint))
+        return breaker
+
+    def allow(self, endpoint):
+        return not BREAKER_ENABLED or self.get(endpoint).allow()
+
+    def record(self, endpoint, ok, latency, ticket=True):
+        """Outcome of a call; pass the ticket allow() returned so only a probe can settle a half-open circuit"""
+        self.get(endpoint).record(ok, latency, ticket)
+
+    def release(self, endpoint, ticket):
+        """Call cancelled before it had an outcome - gives back the probe slot allow() handed it"""
+        self.get(endpoint).release(ticket)
+
+    def timeout(self, endpoint, configured, ticket=True):
+        """(connect, read) timeout with the read part adapted to observed latency"""
+        connect_timeout, read_timeout = configured
+        read_timeout = self.get(endpoint).read_timeout(read_timeout, ticket)
+        return (min(connect_timeout, read_timeout), read_timeout)
+
+    def snapshot(self):
+        return [breaker.snapshot() for breaker in list(self._breakers.values())]
+
+
+circuit_breaker = CircuitBreaker()
@@ -0,0 +1,64 @@
+import os
+import time
+import threading
+
+# Conversation id layout: "conv" + 12 hex ms timestamp + 5 hex sequence + 6 hex thread id + 4 hex random node
+ID_PREFIX = os.getenv('WASTEKING_CONVERSATION_ID_PREFIX', 'conv')
+# Per-millisecond sequence; a thread that runs out carries into the next millisecond
+_SEQUENCE_MAX = 0xfffff
+
+
+class ConversationIdGenerator:
+    """Unique across threads, workers and hosts, sortable by creation time (strictly increasing per thread).
+
+    Lock-free: each thread counts in its own millisecond with its own sequence, and puts its OS thread
+    id in the id - live threads on one host never share one, so threads never need to agree on anything.
+    """
+
+    def __init__(self, prefix=ID_PREFIX):
+        self.prefix = prefix
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # Random bits for other hosts, drawn again in every worker; thread state starts afresh too
+        self._host = f"{int.from_bytes(os.urandom(2), 'big'):04x}"
+        self._local = threading.local()
+
+    def _thread_state(self):
+        local = self._local
+        local.node = f"{threading.get_native_id() & 0xffffff:06x}{self._host}"
+        local.millis = 0
+        local.sequence = 0
+        return local
+
+    def next_id(self):
+        millis = int(time.time() * 1000)
+        local = self._local
+        if not hasattr(local, 'node'):
+            local = self._thread_state()
+        if millis > local.millis:
+            # New millisecond - the sequence starts again, so it never wraps or masks
+            local.millis, local.sequence = millis, 0
+        elif local.sequence < _SEQUENCE_MAX:
+            # Same millisecond, or the clock stepped back - keep counting on the last timestamp
+            local.sequence += 1
+        else:
+            local.millis, local.sequence = local.millis + 1, 0
+        return f"{self.prefix}{local.millis:012x}{local.sequence:05x}{local.node}"
+
+    __call__ = next_id
+
+    def created_at(self, conversation_id):
+        """Creation time (epoch seconds) of an id from this scheme, or None for older ids"""
+        stamp = conversation_id[len(self.prefix):len(self.prefix) + 12]
+        if not conversation_id.startswith(self.prefix) or len(conversation_id) != len(self.prefix) + 27:
+            return None
+        try:
+            return int(stamp, 16) / 1000
+        except ValueError:
+            return None
+
+
+conversation_ids = ConversationIdGenerator()
@@ -0,0 +1,121 @@
+import os
+import sys
+
+# Conversation state configuration - NO HARDCODING
+# Transcript lines kept per conversation - older lines roll off
+HISTORY_MAX_LINES = int(os.getenv('WASTEKING_HISTORY_MAX_LINES', '40'))
+
+# Collected values shared by thousands of conversations - one string object each
+INTERNED_FIELDS = ('service', 'type')
+
+_MISSING = object()
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class History(list):
+    """Transcript ring buffer - a plain list (JSON-ready, no block overhead) that drops its oldest lines"""
+
+    __slots__ = ('maxlen',)
+
+    def __init__(self, lines=(), maxlen=HISTORY_MAX_LINES):
+        super().__init__(lines)
+        self.maxlen = maxlen
+        self._trim()
+
+    def append(self, line):
+        super().append(line)
+        self._trim()
+
+    def extend(self, lines):
+        super().extend(lines)
+        self._trim()
+
+    def _trim(self):
+        if self.maxlen and len(self) > self.maxlen:
+            del self[:len(self) - self.maxlen]
+
+
+class ConversationState:
+    """Compact per-conversation state with a fixed field set - reads and writes like the old dict"""
+
+    FIELDS = (
+        'history', 'collected_data', 'stage', 'price', 'booking_ref', 'booking_bound', 'bound_type',
+        'price_matrix', 'comparison', 'grab_transferred', 'booking_completed'
+    )
+    __slots__ = (
+        'history', 'collected_data', '_stage', 'price', 'booking_ref', 'booking_bound', 'bound_type',
+        'price_matrix', 'comparison', 'grab_transferred', 'booking_completed'
+    )
+
+    def __init__(self, history=(), collected_data=None, stage='initial', **fields):
+        self.history = History(history)
+        self.collected_data = {}
+        self.collect(collected_data or {})
+        self.stage = stage
+        for field in self.FIELDS[3:]:
+            setattr(self, field, fields.pop(field, None))
+        if fields:
+            raise KeyError(f"Not ConversationState fields: {', '.join(fields)}")
+
+    @property
+    def stage(self):
+        return self._stage
+
+    @stage.setter
+    def stage(self, value):
+        self._stage = _intern(value)
+
+    def collect(self, new_data):
+        """Merge newly extracted customer data into collected_data"""
+        for key, value in new_data.items():
+            self.collected_data[key] = _intern(value) if key in INTERNED_FIELDS else value
+
+    # Dict-style access - a field holding None counts as missing, like an absent key did
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self.FIELDS else None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(f"'{key}' is not a ConversationState field")
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def pop(self, key, default=_MISSING):
+        value = self.get(key)
+        if value is None:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        setattr(self, key, None)
+        return value
+
+    def keys(self):
+        return [field for field in self.FIELDS if getattr(self, field) is not None]
+
+    def to_dict(self):
+        """Plain dict for JSON - unset fields are left out"""
+        data = {field: getattr(self, field) for field in self.keys()}
+        data['history'] = list(self.history)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data
+        return cls(**data)
+
+    def __repr__(self):
+        return f"ConversationState({self.to_dict()!r})"
@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from utils.state_cache import (
+    BoundedStateCache, SpillFile, conversation_finished, CONVERSATION_TTL, CONVERSATION_MAX_ENTRIES
+)
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# Conversation store configuration - NO HARDCODING
+CONVERSATION_STORE = os.getenv('WASTEKING_CONVERSATION_STORE', 'sqlite').lower()
+CONVERSATION_DB = os.getenv('WASTEKING_CONVERSATION_DB', os.path.join(tempfile.gettempdir(), 'wasteking_conversations.db'))
+CONVERSATION_LOCK_STRIPES = int(os.getenv('WASTEKING_CONVERSATION_LOCK_STRIPES', '1024'))
+CONVERSATION_DB_BUSY_TIMEOUT_MS = int(os.getenv('WASTEKING_CONVERSATION_DB_BUSY_TIMEOUT_MS', '5000'))
+# How often a worker sweeps idle / excess conversations out of the shared table
+CONVERSATION_SWEEP_INTERVAL = float(os.getenv('WASTEKING_CONVERSATION_SWEEP_INTERVAL', '60'))
+
+
+class ConversationStore:
+    """Conversation state by id, with dict-style access and a per-conversation lock"""
+
+    backend = 'base'
+
+    def __init__(self, lock_stripes=CONVERSATION_LOCK_STRIPES, ttl=CONVERSATION_TTL, max_entries=CONVERSATION_MAX_ENTRIES,
+                 state_type=None):
+        self.state_type = state_type  # class with to_dict()/from_dict() for stored states, or None for dicts
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.spill = SpillFile('conversations.jsonl')
+        self._stripes = [threading.Lock() for _ in range(max(lock_stripes, 1))]
+        self._stats_lock = threading.Lock()
+        self.gets = 0
+        self.puts = 0
+        self._get_us_total = 0.0
+        self._put_us_total = 0.0
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork_in_child)
+
+    def _stripe(self, conversation_id):
+        return zlib.crc32(str(conversation_id).encode()) % len(self._stripes)
+
+    @contextmanager
+    def lock(self, conversation_id):
+        """Hold this conversation for one whole turn, so concurrent turns cannot overwrite each other"""
+        stripe = self._stripe(conversation_id)
+        with self._stripes[stripe]:
+            self._lock_shared(stripe)
+            try:
+                yield
+            finally:
+                self._unlock_shared(stripe)
+
+    def get(self, conversation_id, default=None):
+        started = time.perf_counter()
+        state = self._load(conversation_id)
+        elapsed_us = (time.perf_counter() - started) * 1e6
+        with self._stats_lock:
+            self.gets += 1
+            self._get_us_total += elapsed_us
+        return default if state is None else state
+
+    def put(self, conversation_id, state):
+        started = time.perf_counter()
+        self._save(conversation_id, state)
+        elapsed_us = (time.perf_counter() - started) * 1e6
+        with self._stats_lock:
+            self.puts += 1
+            self._put_us_total += elapsed_us
+
+    def __getitem__(self, conversation_id):
+        state = self.get(conversation_id)
+        if state is None:
+            raise KeyError(conversation_id)
+        return state
+
+    def __setitem__(self, conversation_id, state):
+        self.put(conversation_id, state)
+
+    def __delitem__(self, conversation_id):
+        self._delete(conversation_id)
+
+    def __contains__(self, conversation_id):
+        return self._load(conversation_id) is not None
+
+    def pop(self, conversation_id, default=None):
+        state = self._load(conversation_id)
+        if state is None:
+            return default
+        self._delete(conversation_id)
+        return state
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'backend': self.backend,
+                'entries': len(self),
+                'gets': self.gets,
+                'puts': self.puts,
+                'avg_get_us': (self._get_us_total / self.gets) if self.gets else None,
+                'avg_put_us': (self._put_us_total / self.puts) if self.puts else None,
+                'lock_stripes': len(self._stripes),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                **self._eviction_stats(),
+                'spill_enabled': self.spill.enabled,
+                'spilled': self.spill.spilled
+            }
+
+    def _eviction_stats(self):
+        return {'evicted_ttl': 0, 'evicted_lru': 0}
+
+    def _after_fork_in_child(self):
+        # A lock held by another thread at fork time would never be released in the child
+        self._stripes = [threading.Lock() for _ in self._stripes]
+        self._stats_lock = threading.Lock()
+
+    def _lock_shared(self, stripe):
+        pass
+
+    def _unlock_shared(self, stripe):
+        pass
+
+    def _load(self, conversation_id):
+        raise NotImplementedError
+
+    def _save(self, conversation_id, state):
+        raise NotImplementedError
+
+    def _delete(self, conversation_id):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class MemoryConversationStore(ConversationStore):
+    """In-process store - one worker only, lost on restart"""
+
+    backend = 'memory'
+
+    def __init__(self, lock_stripes=CONVERSATION_LOCK_STRIPES, ttl=CONVERSATION_TTL, max_entries=CONVERSATION_MAX_ENTRIES,
+                 state_type=None):
+        super().__init__(lock_stripes, ttl, max_entries, state_type)
+        self._states = BoundedStateCache('conversations', ttl, max_entries, self.spill, conversation_finished)
+
+    def _eviction_stats(self):
+        return {'evicted_ttl': self._states.evicted_ttl, 'evicted_lru': self._states.evicted_lru}
+
+    def _load(self, conversation_id):
+        return self._states.get(conversation_id)
+
+    def _save(self, conversation_id, state):
+        self._states[conversation_id] = state
+
+    def _delete(self, conversation_id):
+        self._states.pop(conversation_id, None)
+
+    def __len__(self):
+        return len(self._states)
+
+
+class SQLiteConversationStore(ConversationStore):
+    """SQLite (WAL) store shared by every worker on the host - survives worker hopping and restarts"""
+
+    backend = 'sqlite'
+
+    def __init__(self, path=CONVERSATION_DB, lock_stripes=CONVERSATION_LOCK_STRIPES, ttl=CONVERSATION_TTL,
+                 max_entries=CONVERSATION_MAX_ENTRIES, state_type=None):
+        super().__init__(lock_stripes, ttl, max_entries, state_type)
+        self.path = path
+        self.evicted_ttl = 0
+        self.evicted_lru = 0
+        self._last_sweep = 0.0
+        self._local = threading.local()
+        self._lock_fd = None
+        self._lock_fd_pid = None
+        self._lock_fd_guard = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS conversations_updated_at ON conversations (updated_at)")
+        print(f"🗄️ CONVERSATION STORE: sqlite at {path}")
+
+    def _connection(self):
+        # One connection per thread per worker - sqlite handles must never cross a fork
+        pid = os.getpid()
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != pid:
+            connection = sqlite3.connect(self.path, timeout=CONVERSATION_DB_BUSY_TIMEOUT_MS / 1000,
+                                         isolation_level=None, check_same_thread=False)
+            connection.execute(f"PRAGMA busy_timeout={CONVERSATION_DB_BUSY_TIMEOUT_MS}")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = pid
+        return connection
+
+    def _lock_file(self):
+        pid = os.getpid()
+        if self._lock_fd is None or self._lock_fd_pid != pid:
+            with self._lock_fd_guard:
+                if self._lock_fd is None or self._lock_fd_pid != pid:
+                    self._lock_fd = os.open(self.path + '.locks', os.O_RDWR | os.O_CREAT, 0o600)
+                    self._lock_fd_pid = pid
+        return self._lock_fd
+
+    def _lock_shared(self, stripe):
+        # One byte per stripe: other workers block only on the same conversation stripe
+        if FCNTL_AVAILABLE:
+            fcntl.lockf(self._lock_file(), fcntl.LOCK_EX, 1, stripe)
+
+    def _unlock_shared(self, stripe):
+        if FCNTL_AVAILABLE:
+            fcntl.lockf(self._lock_file(), fcntl.LOCK_UN, 1, stripe)
+
+    def _after_fork_in_child(self):
+        super()._after_fork_in_child()
+        self._local = threading.local()
+        self._lock_fd = None
+        self._lock_fd_pid = None
+        self._lock_fd_guard = threading.Lock()
+
+    def _load(self, conversation_id):
+        row = self._connection().execute(
+            "SELECT state FROM conversations WHERE id = ?", (str(conversation_id),)
+        ).fetchone()
+        if not row:
+            return None
+        state = json.loads(row[0])
+        return self.state_type.from_dict(state) if self.state_type is not None else state
+
+    def _save(self, conversation_id, state):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO conversations (id, state, updated_at) VALUES (?, ?, ?)",
+            (str(conversation_id), json.dumps(state.to_dict() if hasattr(state, 'to_dict') else state,
+                                              separators=(',', ':'), default=str), time.time())
+        )
+        if time.time() - self._last_sweep >= CONVERSATION_SWEEP_INTERVAL:
+            self.sweep()
+
+    def sweep(self):
+        """Drop conversations idle past the TTL, then the least recently updated ones over the cap"""
+        self._last_sweep = time.time()
+        connection = self._connection()
+        if self.ttl:
+            cutoff = time.time() - self.ttl
+            self._spill_rows(connection.execute(
+                "SELECT id, state FROM conversations WHERE updated_at < ?", (cutoff,)).fetchall())
+            self.evicted_ttl += connection.execute(
+                "DELETE FROM conversations WHERE updated_at < ?", (cutoff,)).rowcount
+        if self.max_entries:
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                self._spill_rows(connection.execute(
+                    "SELECT id, state FROM conversations ORDER BY updated_at LIMIT ?", (excess,)).fetchall())
+                self.evicted_lru += connection.execute(
+                    "DELETE FROM conversations WHERE id IN "
+                    "(SELECT id FROM conversations ORDER BY updated_at LIMIT ?)", (excess,)).rowcount
+
+    def _spill_rows(self, rows):
+        if not self.spill.enabled:
+            return
+        for conversation_id, state_json in rows:
+            state = json.loads(state_json)
+            if conversation_finished(state):
+                self.spill.write(conversation_id, state)
+
+    def _eviction_stats(self):
+        return {'evicted_ttl': self.evicted_ttl, 'evicted_lru': self.evicted_lru}
+
+    def _delete(self, conversation_id):
+        self._connection().execute("DELETE FROM conversations WHERE id = ?", (str(conversation_id),))
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+
+def create_conversation_store(backend=CONVERSATION_STORE, state_type=None):
+    """Store named by WASTEKING_CONVERSATION_STORE, falling back to memory if sqlite cannot open"""
+    if backend == 'sqlite':
+        try:
+            return SQLiteConversationStore(state_type=state_type)
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️ SQLITE CONVERSATION STORE UNAVAILABLE ({e}) - using in-memory store")
+    elif backend != 'memory':
+        print(f"⚠️ Unknown WASTEKING_CONVERSATION_STORE '{backend}' - using in-memory store")
+    return MemoryConversationStore(state_type=state_type)
@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import deque
+from utils.conversation_store import CONVERSATION_STORE, CONVERSATION_DB, CONVERSATION_DB_BUSY_TIMEOUT_MS
+from utils.state_cache import LIVE_CALLS_TTL
+from utils.time_series import ANALYTICS_WINDOWS
+
+# Dashboard event log configuration - NO HARDCODING
+# Call updates kept so a starting worker can rebuild its dashboard - covers live calls and every analytics window
+DASHBOARD_EVENTS_RETENTION = float(os.getenv('WASTEKING_DASHBOARD_EVENTS_RETENTION',
+                                             str(max(LIVE_CALLS_TTL, *ANALYTICS_WINDOWS))))
+# How often a worker with live feed clients picks up calls that other workers updated
+DASHBOARD_SYNC_INTERVAL = float(os.getenv('WASTEKING_DASHBOARD_SYNC_INTERVAL', '1'))
+# How often the log is trimmed to the retention period
+DASHBOARD_TRIM_INTERVAL = float(os.getenv('WASTEKING_DASHBOARD_TRIM_INTERVAL', '60'))
+
+
+class MemoryDashboardEvents:
+    """One worker's own call updates - with the memory conversation store there is only one worker"""
+
+    backend = 'memory'
+    shared = False
+
+    def __init__(self):
+        self._events = deque()  # (seq, call, metrics, at) not yet read back
+        self._seq = 0
+        self._totals = {}
+        self._lock = threading.Lock()
+        self.since = time.time()
+
+    def append(self, call, metrics, at):
+        """Record one call update and the analytics keys it counts towards; returns its sequence number"""
+        with self._lock:
+            self._seq += 1
+            self._events.append((self._seq, call, metrics, at))
+            for key in metrics:
+                self._totals[key] = self._totals.get(key, 0) + 1
+            return self._seq
+
+    def read_since(self, seq):
+        with self._lock:
+            events = [event for event in self._events if event[0] > seq]
+            self._events.clear()
+            return events
+
+    def snapshot(self):
+        """(last sequence number, all-time totals) as of the same moment"""
+        with self._lock:
+            return self._seq, dict(self._totals)
+
+
+class SQLiteDashboardEvents:
+    """Call updates from every worker in the shared conversation database, in one order all workers replay"""
+
+    backend = 'sqlite'
+    shared = True
+
+    def __init__(self, path=CONVERSATION_DB, retention=DASHBOARD_EVENTS_RETENTION):
+        self.path = path
+        self.retention = retention
+        self._local = threading.local()
+        self._last_trim = 0.0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS dashboard_events ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, call TEXT NOT NULL, metrics TEXT NOT NULL, at REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS dashboard_events_at ON dashboard_events (at)")
+        # All-time counts, bumped in the same transaction as the event that caused them
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS dashboard_totals ("
+            "service TEXT NOT NULL, metric TEXT NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (service, metric))"
+        )
+        connection.execute("CREATE TABLE IF NOT EXISTS dashboard_meta (key TEXT PRIMARY KEY, value REAL NOT NULL)")
+        connection.execute("INSERT OR IGNORE INTO dashboard_meta (key, value) VALUES ('counting_since', ?)", (time.time(),))
+        self.since = connection.execute("SELECT value FROM dashboard_meta WHERE key = 'counting_since'").fetchone()[0]
+
+    def _connection(self):
+        # One connection per thread per worker - sqlite handles must never cross a fork
+        pid = os.getpid()
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != pid:
+            connection = sqlite3.connect(self.path, timeout=CONVERSATION_DB_BUSY_TIMEOUT_MS / 1000,
+                                         isolation_level=None, check_same_thread=False)
+            connection.execute(f"PRAGMA busy_timeout={CONVERSATION_DB_BUSY_TIMEOUT_MS}")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = pid
+        return connection
+
+    def append(self, call, metrics, at):
+        """Record one call update and the analytics keys it counts towards; returns its sequence number"""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            seq = connection.execute(
+                "INSERT INTO dashboard_events (call, metrics, at) VALUES (?, ?, ?)",
+                (json.dumps(call, separators=(',', ':'), default=str), json.dumps(metrics), at)
+            ).lastrowid
+            connection.executemany(
+                "INSERT INTO dashboard_totals (service, metric, count) VALUES (?, ?, 1) "
+                "ON CONFLICT (service, metric) DO UPDATE SET count = count + 1", metrics
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        if at - self._last_trim >= DASHBOARD_TRIM_INTERVAL:
+            self._last_trim = at
+            connection.execute("DELETE FROM dashboard_events WHERE at < ?", (at - self.retention,))
+        return seq
+
+    def read_since(self, seq):
+        rows = self._connection().execute(
+            "SELECT seq, call, metrics, at FROM dashboard_events WHERE seq > ? ORDER BY seq", (seq,)
+        ).fetchall()
+        return [(row[0], json.loads(row[1]), [tuple(key) for key in json.loads(row[2])], row[3]) for row in rows]
+
+    def snapshot(self):
+        """(last sequence number, all-time totals) as of the same moment"""
+        connection = self._connection()
+        connection.execute("BEGIN")
+        try:
+            seq = connection.execute("SELECT COALESCE(MAX(seq), 0) FROM dashboard_events").fetchone()[0]
+            totals = {(service, metric): count for service, metric, count in
+                      connection.execute("SELECT service, metric, count FROM dashboard_totals")}
+        finally:
+            connection.execute("COMMIT")
+        return seq, totals
+
+
+def create_dashboard_events(backend=CONVERSATION_STORE):
+    """Shared sqlite log alongside the conversations, or this worker's own updates when conversations are in memory"""
+    if backend == 'sqlite':
+        try:
+            return SQLiteDashboardEvents()
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️ SQLITE DASHBOARD EVENTS UNAVAILABLE ({e}) - each worker's dashboard shows only its own calls")
+    return MemoryDashboardEvents()
@@ -0,0 +1,77 @@
+import re
+from typing import NamedTuple, Optional, Tuple
+
+# Words the name patterns pick up that are never a customer's name
+NAME_STOPWORDS = ['yes', 'no', 'there', 'what', 'how', 'confirmed', 'phone', 'please']
+
+# Cheap precondition per field: a message this does not match cannot match any of the field's patterns,
+# so most turns ("yes please", "what can I put in it?") skip the field without running its patterns
+FIELD_CUES = {
+    'postcode': r'\d',
+    'phone': r'\d{4}'
+}
+
+
+class ExtractedField(NamedTuple):
+    """One customer detail found in a message"""
+    name: str
+    value: str
+    span: Tuple[int, int]  # (start, end) of the matched text in the original message
+    pattern: int  # index of the field pattern that matched
+
+
+def parse_postcode(groups):
+    postcode = ''.join(groups).replace(' ', '').upper()
+    return postcode if len(postcode) >= 5 else None
+
+
+def parse_phone(groups):
+    phone = ''.join(groups)
+    return phone if len(phone) >= 10 else None
+
+
+def parse_name(groups, stopwords=NAME_STOPWORDS):
+    name = groups[0].strip().title()
+    return name if name.lower() not in stopwords else None
+
+
+FIELD_PARSERS = {'postcode': parse_postcode, 'phone': parse_phone, 'firstName': parse_name}
+
+
+class Extractor:
+    """Postcode, phone and name patterns compiled once and run as one pipeline per message.
+
+    Each field keeps its priority rules: the first pattern in its list that matches wins, at its
+    leftmost match, and a match its parser rejects (e.g. "Yes" as a name) falls through to the next pattern.
+    """
+
+    def __init__(self, field_patterns, parsers=FIELD_PARSERS, cues=FIELD_CUES):
+        self.parsers = parsers
+        self._fields = []
+        for field, patterns in field_patterns.items():
+            compiled = [re.compile(pattern) for pattern in patterns]
+            self._fields.append((
+                field,
+                re.compile(cues[field]) if field in cues else None,
+                [(pattern, tuple(range(1, pattern.groups + 1))) for pattern in compiled]
+            ))
+
+    def extract(self, message) -> dict:
+        """Field name -> ExtractedField for every field found in the message"""
+        found = {}
+        for field, cue, patterns in self._fields:
+            if cue is not None and cue.search(message) is None:
+                continue
+            parse = self.parsers[field]
+            for index, (compiled, groups) in enumerate(patterns):
+                match = compiled.search(message)
+                if match is None:
+                    continue
+                matched = [number for number in groups if match.group(number)]
+                if not matched:
+                    continue
+                value = parse([match.group(number) for number in matched])
+                if value is not None:
+                    found[field] = ExtractedField(field, value, (match.start(matched[0]), match.end(matched[-1])), index)
+                    break
+        return found
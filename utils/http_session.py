@@ -0,0 +1,83 @@
+import os
+import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# Pooled HTTP session configuration - NO HARDCODING
+POOL_CONNECTIONS = int(os.getenv('WASTEKING_POOL_CONNECTIONS', '4'))
+POOL_MAXSIZE = int(os.getenv('WASTEKING_POOL_MAXSIZE', '16'))
+POOL_BLOCK = os.getenv('WASTEKING_POOL_BLOCK', 'false').lower() == 'true'
+CONNECT_TIMEOUT = float(os.getenv('WASTEKING_CONNECT_TIMEOUT', '5'))
+DEFAULT_TIMEOUT = float(os.getenv('WASTEKING_TIMEOUT', '15'))
+
+# Per-endpoint read timeouts, e.g. '{"api/booking/create": 8}'
+try:
+    ENDPOINT_TIMEOUTS = json.loads(os.getenv('WASTEKING_ENDPOINT_TIMEOUTS', '{}'))
+except ValueError:
+    print("⚠️ WASTEKING_ENDPOINT_TIMEOUTS is not valid JSON - using default timeout")
+    ENDPOINT_TIMEOUTS = {}
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def _build_session():
+    """Create a keep-alive session with a bounded connection pool"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        pool_block=POOL_BLOCK,
+        max_retries=0
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+
+def get_session():
+    """Return this worker's pooled session, rebuilding it after a fork"""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            # Sockets inherited from the gunicorn master must never be shared
+            _session = _build_session()
+            _session_pid = pid
+            print(f"🔌 HTTP SESSION POOL READY (pid={pid}, maxsize={POOL_MAXSIZE})")
+    return _session
+
+
+def reset_session():
+    """Drop the current session so the next request opens a fresh pool"""
+    global _session, _session_pid
+    with _session_lock:
+        old_session, old_pid = _session, _session_pid
+        _session = None
+        _session_pid = None
+    if old_session is not None and old_pid == os.getpid():
+        old_session.close()
+
+
+def get_timeout(endpoint):
+    """(connect, read) timeout tuple for an endpoint"""
+    read_timeout = float(ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT))
+    return (min(CONNECT_TIMEOUT, read_timeout), read_timeout)
+
+
+def _after_fork_in_child():
+    global _session, _session_pid, _session_lock
+    # Never close the parent's sockets from the child - just forget them
+    _session = None
+    _session_pid = None
+    _session_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
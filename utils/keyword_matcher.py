@@ -0,0 +1,89 @@
+import os
+import re
+from functools import lru_cache
+
+# Keyword matcher configuration - NO HARDCODING
+# Recent messages whose scan is kept, so every check in one turn shares a single pass
+KEYWORD_SCAN_CACHE_SIZE = int(os.getenv('WASTEKING_KEYWORD_SCAN_CACHE_SIZE', '256'))
+
+_END = ''  # trie key marking the end of a phrase
+
+
+class KeywordHits(dict):
+    """Categories found in one message -> matched phrases in table order; shared between callers, read-only"""
+
+    __slots__ = ()
+
+    def any(self, *categories):
+        for category in categories:
+            if category in self:
+                return True
+        return False
+
+
+class KeywordMatcher:
+    """Every keyword table compiled into one trie-shaped regex - a single pass over a message finds every category.
+
+    Matches are plain substrings of the lower-cased message, exactly like `phrase in message.lower()`.
+    """
+
+    def __init__(self, tables, cache_size=KEYWORD_SCAN_CACHE_SIZE):
+        self.tables = {category: tuple(phrase.lower() for phrase in phrases) for category, phrases in tables.items()}
+        self._build()
+        self.scan = lru_cache(maxsize=cache_size)(self._scan) if cache_size else self._scan
+
+    def _build(self):
+        trie = {}
+        for category, phrases in self.tables.items():
+            for phrase in phrases:
+                node = trie
+                for ch in phrase:
+                    node = node.setdefault(ch, {})
+                node.setdefault(_END, set()).add((category, phrase))
+
+        # Phrases starting at the same place are all prefixes of the longest one there, so the
+        # longest match at each position (greedy, zero-width lookahead) tells us every phrase found
+        self._outputs = {}
+        self._collect_outputs(trie, '', ())
+        self._pattern = re.compile(f"(?=({self._trie_pattern(trie)}))")
+        self.states = self._count_nodes(trie)
+
+    def _collect_outputs(self, node, prefix, inherited):
+        if _END in node:
+            inherited = inherited + tuple(sorted(node[_END]))
+            self._outputs[prefix] = inherited
+        for ch, child in node.items():
+            if ch != _END:
+                self._collect_outputs(child, prefix + ch, inherited)
+
+    def _trie_pattern(self, node):
+        branches = [re.escape(ch) + self._trie_pattern(child) for ch, child in sorted(node.items()) if ch != _END]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # A phrase ending here makes the rest optional; greedy ? still prefers the longer phrase
+        return f"(?:{body})?" if _END in node else body
+
+    def _count_nodes(self, node):
+        return 1 + sum(self._count_nodes(child) for ch, child in node.items() if ch != _END)
+
+    def _scan(self, text):
+        found = {}
+        outputs = self._outputs
+        for longest in set(self._pattern.findall(text.lower())):
+            for category, phrase in outputs[longest]:
+                found.setdefault(category, set()).add(phrase)
+        return KeywordHits(
+            (category, tuple(phrase for phrase in self.tables[category] if phrase in phrases))
+            for category, phrases in found.items()
+        )
+
+    def stats(self):
+        cache = self.scan.cache_info() if hasattr(self.scan, 'cache_info') else None
+        return {
+            'categories': len(self.tables),
+            'phrases': sum(len(phrases) for phrases in self.tables.values()),
+            'trie_nodes': self.states,
+            'scan_cache_hits': cache.hits if cache else 0,
+            'scan_cache_misses': cache.misses if cache else 0
+        }
@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import queue
+import threading
+
+# Live dashboard feed configuration - NO HARDCODING
+# Streams per worker; keep it below gunicorn --threads so streams never starve normal requests
+LIVE_FEED_MAX_CLIENTS = int(os.getenv('WASTEKING_LIVE_FEED_MAX_CLIENTS', '8'))
+# Events buffered per client - a client that falls further behind is resynced with a fresh snapshot
+LIVE_FEED_CLIENT_BUFFER = int(os.getenv('WASTEKING_LIVE_FEED_CLIENT_BUFFER', '100'))
+# Keep-alive comment on an idle stream so proxies don't drop it
+LIVE_FEED_HEARTBEAT = float(os.getenv('WASTEKING_LIVE_FEED_HEARTBEAT', '15'))
+# Streams are closed after this long and the browser reconnects, so a vanished client can't hold a thread
+LIVE_FEED_MAX_STREAM_SECONDS = float(os.getenv('WASTEKING_LIVE_FEED_MAX_STREAM_SECONDS', '300'))
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class FeedClient:
+    """One connected stream: its own bounded buffer, flagged for resync when the buffer overflows"""
+
+    def __init__(self, buffer_size):
+        self.events = queue.Queue(maxsize=buffer_size)
+        self.overflowed = False
+        self.connected_at = time.time()
+
+
+class LiveFeed:
+    """Server-Sent Events fan-out - publish never blocks, slow clients get a snapshot instead of a backlog"""
+
+    def __init__(self, max_clients=LIVE_FEED_MAX_CLIENTS, buffer_size=LIVE_FEED_CLIENT_BUFFER,
+                 heartbeat=LIVE_FEED_HEARTBEAT, max_stream_seconds=LIVE_FEED_MAX_STREAM_SECONDS):
+        self.max_clients = max_clients
+        self.buffer_size = buffer_size
+        self.heartbeat = heartbeat
+        self.max_stream_seconds = max_stream_seconds
+        self._clients = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        self.resyncs = 0
+        self.rejected = 0
+
+    @property
+    def has_clients(self):
+        return bool(self._clients)
+
+    def subscribe(self):
+        """A new FeedClient, or None when the worker already has max_clients streams"""
+        with self._lock:
+            if len(self._clients) >= self.max_clients:
+                self.rejected += 1
+                return None
+            client = FeedClient(self.buffer_size)
+            self._clients.add(client)
+        print(f"📡 LIVE FEED: client connected ({len(self._clients)}/{self.max_clients})")
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.discard(client)
+
+    def publish(self, event, data):
+        """Queue one delta for every client - O(clients), never waits on a slow one"""
+        if not self._clients:
+            return
+        chunk = sse_event(event, data)
+        with self._lock:
+            clients = list(self._clients)
+            self.published += 1
+        for client in clients:
+            if client.overflowed:
+                continue
+            try:
+                client.events.put_nowait(chunk)
+            except queue.Full:
+                client.overflowed = True
+                self.resyncs += 1
+
+    def stream(self, client, snapshot_fn):
+        """SSE body for one client: a snapshot, then deltas as they happen"""
+        try:
+            yield "retry: 3000\n" + sse_event('snapshot', snapshot_fn())
+            deadline = time.monotonic() + self.max_stream_seconds
+            while time.monotonic() < deadline:
+                if client.overflowed:
+                    # Too far behind - drop the backlog and start again from current state
+                    while not client.events.empty():
+                        client.events.get_nowait()
+                    client.overflowed = False
+                    yield sse_event('snapshot', snapshot_fn())
+                    continue
+                try:
+                    yield client.events.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield ": ping\n\n"
+        finally:
+            self.unsubscribe(client)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'clients': len(self._clients),
+                'max_clients': self.max_clients,
+                'buffer_size': self.buffer_size,
+                'published': self.published,
+                'resyncs': self.resyncs,
+                'rejected': self.rejected
+            }
@@ -0,0 +1,113 @@
+import os
+import re
+import threading
+from utils.price_cache import normalise_postcode
+
+# Postcode index configuration - NO HARDCODING
+# One area (LS), outward code (LS1) or full postcode (LS1 4ED) per line; '#' starts a comment
+POSTCODE_INDEX_FILE = os.getenv(
+    'WASTEKING_POSTCODE_INDEX',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'postcodes', 'areas.txt')
+)
+
+# Royal Mail format: A9 / A99 / AA9 / AA99 / A9A / AA9A outward code, then digit + two letters.
+# Letters are restricted by position (no Q V X first, no I J Z second; inward never uses C I K M O V)
+POSTCODE_FORMAT = re.compile(
+    r'^(?:[A-PR-UWYZ][0-9][0-9]?|[A-PR-UWYZ][A-HK-Y][0-9][0-9]?|[A-PR-UWYZ][0-9][A-HJKPSTUW]|[A-PR-UWYZ][A-HK-Y][0-9][ABEHMNPRVWXY])'
+    r'[0-9][ABD-HJLNP-UW-Z]{2}$'
+)
+_AREA = re.compile(r'^[A-Z]+')
+
+# Longest entry is a full postcode without its space
+_RECORD_WIDTH = 7
+
+
+class PostcodeIndex:
+    """Sorted fixed-width byte array of known areas / outward codes / postcodes - O(log n) lookups, ~7 bytes an entry.
+
+    A postcode is valid when it is well formed and the index holds the postcode itself, its outward
+    code or its area - the file decides how precise the check is.
+    """
+
+    def __init__(self, path=POSTCODE_INDEX_FILE):
+        self.path = path
+        self._records = b''
+        self._count = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.rejected_format = 0
+        self.rejected_unknown = 0
+        self.load(path)
+
+    def load(self, path):
+        # Padded byte records straight from the file - no intermediate set of str for a full national file
+        records = []
+        try:
+            with open(path) as f:
+                for line in f:
+                    code = normalise_postcode(line.split('#', 1)[0].strip())
+                    if 0 < len(code) <= _RECORD_WIDTH and code.isascii():
+                        records.append(code.encode('ascii').ljust(_RECORD_WIDTH))
+        except OSError as e:
+            print(f"⚠️ POSTCODE INDEX UNAVAILABLE ({e}) - checking postcode format only")
+        records.sort()
+        unique = [record for i, record in enumerate(records) if i == 0 or record != records[i - 1]]
+        self._records = b''.join(unique)
+        self._count = len(unique)
+        self.path = path
+        if unique:
+            print(f"📮 POSTCODE INDEX: {self._count} entries from {path} ({len(self._records)} bytes)")
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, code):
+        key = code.encode('ascii').ljust(_RECORD_WIDTH)
+        records = self._records
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record = records[mid * _RECORD_WIDTH:(mid + 1) * _RECORD_WIDTH]
+            if record < key:
+                lo = mid + 1
+            elif record > key:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def validate(self, postcode):
+        """Normalised postcode (e.g. 'LS14ED') if it is a real UK postcode as far as the index knows, else None"""
+        code = normalise_postcode(postcode)
+        with self._lock:
+            self.lookups += 1
+        if not POSTCODE_FORMAT.match(code):
+            with self._lock:
+                self.rejected_format += 1
+            return None
+        if self._count:
+            outward = code[:-3]
+            if code not in self and outward not in self and _AREA.match(outward).group() not in self:
+                with self._lock:
+                    self.rejected_unknown += 1
+                return None
+        return code
+
+    @staticmethod
+    def display(code):
+        """'LS14ED' -> 'LS1 4ED'"""
+        return f"{code[:-3]} {code[-3:]}" if code and len(code) > 3 else code
+
+    def stats(self):
+        with self._lock:
+            return {
+                'path': self.path,
+                'entries': self._count,
+                'bytes': len(self._records),
+                'lookups': self.lookups,
+                'rejected_format': self.rejected_format,
+                'rejected_unknown': self.rejected_unknown
+            }
+
+
+postcode_index = PostcodeIndex()
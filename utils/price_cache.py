@@ -0,0 +1,117 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# Price quote cache configuration - NO HARDCODING
+PRICE_CACHE_ENABLED = os.getenv('WASTEKING_PRICE_CACHE_ENABLED', 'true').lower() == 'true'
+PRICE_CACHE_TTL = float(os.getenv('WASTEKING_PRICE_CACHE_TTL', '300'))
+# Hard legal guard: a price older than this is NEVER served, whatever TTL a caller asks for
+PRICE_CACHE_MAX_AGE = float(os.getenv('WASTEKING_PRICE_CACHE_MAX_AGE', '900'))
+PRICE_CACHE_SIZE = int(os.getenv('WASTEKING_PRICE_CACHE_SIZE', '2048'))
+# Services whose resultItems list every size, so the requested type is not part of the key
+TYPELESS_SERVICES = [s.strip() for s in os.getenv('WASTEKING_PRICE_CACHE_TYPELESS', 'skip').split(',') if s.strip()]
+
+
+def normalise_postcode(postcode):
+    return (postcode or '').replace(' ', '').upper()
+
+
+def price_key(postcode, service, skip_type=None):
+    """Cache key for a pricing lookup"""
+    if service in TYPELESS_SERVICES:
+        skip_type = None
+    return (normalise_postcode(postcode), service or '', skip_type or '')
+
+
+class PriceCache:
+    """Bounded TTL + LRU cache of full resultItems lists from api/booking/update"""
+
+    def __init__(self, ttl=PRICE_CACHE_TTL, max_age=PRICE_CACHE_MAX_AGE, max_entries=PRICE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (stored_at, result_items)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, postcode, service, skip_type=None, ttl=None):
+        """Return cached resultItems or None; ttl may shorten but never exceed max_age"""
+        entry = self.get_entry(postcode, service, skip_type, ttl)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, postcode, service, skip_type=None, ttl=None):
+        """Return (resultItems, age in seconds) or None"""
+        key = price_key(postcode, service, skip_type)
+        limit = min(self.ttl if ttl is None else ttl, self.max_age)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, result_items = entry
+            if now - stored_at > limit:
+                if now - stored_at > min(self.ttl, self.max_age):
+                    del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result_items, now - stored_at
+
+    def put(self, postcode, service, skip_type, result_items):
+        key = price_key(postcode, service, skip_type)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), list(result_items))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, postcode=None, service=None):
+        """Drop entries matching postcode and/or service; no arguments clears everything"""
+        postcode = normalise_postcode(postcode) if postcode else None
+        with self._lock:
+            if postcode is None and service is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                doomed = [k for k in self._entries
+                          if (postcode is None or k[0] == postcode) and (service is None or k[1] == service)]
+                for key in doomed:
+                    del self._entries[key]
+                removed = len(doomed)
+            self.invalidations += removed
+        return removed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'max_age_seconds': self.max_age,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': (self.hits / lookups * 100) if lookups else 0
+            }
+
+
+def quote_is_fresh(quoted_at):
+    """True while a quote may be re-presented without asking the API again"""
+    if not quoted_at:
+        return False
+    return time.time() - quoted_at <= min(PRICE_CACHE_TTL, PRICE_CACHE_MAX_AGE)
+
+
+price_cache = PriceCache()
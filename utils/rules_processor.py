@@ -1,32 +1,204 @@
 import os
 import json
 import re
-import PyPDF2
-from typing import Dict, Any, List
+import hashlib
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 from datetime import datetime
+from utils.rules_registry import RulesRegistry
+from utils.keyword_matcher import KeywordMatcher
+
+# Rules configuration - NO HARDCODING
+_RULES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'rules')
+RULES_PDF_PATH = os.getenv('WASTEKING_RULES_PDF', os.path.join(_RULES_DIR, 'all rules.pdf'))
+# Compiled rules artifact - rebuilt automatically whenever the PDF hash or the schema version changes
+RULES_CACHE_PATH = os.getenv('WASTEKING_RULES_CACHE', os.path.join(_RULES_DIR, 'compiled_rules.json'))
+
+# Bump whenever the _extract_* parsers change so existing artifacts are recompiled
+RULES_SCHEMA_VERSION = 1
+
+# Hardcoded price patterns - LEGAL COMPLIANCE
+PRICE_PATTERNS = [
+    r'£\d+',           # £123
+    r'£\d+\.\d+',      # £123.45
+    r'\d+\s*pounds?',  # 123 pounds
+    r'costs?\s*£',     # costs £
+    r'price\s*is\s*£', # price is £
+]
+# Every price pattern needs one of these, so a response without them skips the patterns entirely
+PRICE_CUES = ['£', 'pound']
+ILLEGAL_PRICE_PHRASES = [
+    "skip costs £", "mav costs £", "grab costs £",
+    "price is £", "that'll be £", "total is £"
+]
+
+# Words in a response that mean the exact script should have been used
+SCRIPT_TRIGGERS = {
+    "permit_script": ["road", "permit", "council"],
+    "mav_suggestion": ["8-yard", "light materials"],
+    "grab_6_wheeler": ["6-wheeler", "6 wheel"],
+    "grab_8_wheeler": ["8-wheeler", "8 wheel"],
+    "heavy_materials": ["heavy materials", "soil", "rubble"],
+    "sofa_prohibited": ["sofa", "upholstered"]
+}
+
+# Exact scripts each agent type is held to
+AGENT_SCRIPTS = {
+    "skip": ["heavy_materials", "sofa_prohibited", "permit_script", "mav_suggestion"],
+    "mav": ["time_restriction", "sunday_collection"],
+    "grab": ["grab_6_wheeler", "grab_8_wheeler"]
+}
+
+
+def hash_file(path) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ResponseValidator:
+    """Every response check for one agent type compiled into a single keyword pass.
+
+    Same violations, in the same order, as the original checks: testing corrections, hardcoded
+    prices, exact scripts, V-A-T spelling, bundled questions. The price patterns only run when
+    the pass finds a price cue.
+    """
+
+    def __init__(self, rules_data: Dict[str, Any], agent_type: Optional[str]):
+        self.agent_type = agent_type
+        corrections = rules_data.get("testing_corrections", [])
+        scripts = {k: v for k, v in rules_data.get("exact_scripts", {}).items() if k in AGENT_SCRIPTS.get(agent_type, ())}
+        
+        self._corrections = [(f"wrong_{i}", correction["wrong"]) for i, correction in enumerate(corrections)]
+        self._scripts = [(f"script_{name}", name, text) for name, text in scripts.items() if SCRIPT_TRIGGERS.get(name)]
+        self._price_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in PRICE_PATTERNS]
+        self._matcher = KeywordMatcher({
+            **{category: [wrong] for category, wrong in self._corrections},
+            "price_cue": PRICE_CUES,
+            "price_phrase": ILLEGAL_PRICE_PHRASES,
+            **{category: SCRIPT_TRIGGERS[name] for category, name, _ in self._scripts},
+            "vat": ["vat"],
+            "vat_spelled": ["v-a-t"]
+        }, cache_size=0)
+    
+    def validate(self, response: str) -> List[str]:
+        hits = self._matcher.scan(response)
+        violations = [f"CRITICAL: Used wrong phrase - {wrong}" for category, wrong in self._corrections if category in hits]
+        
+        # Hardcoded prices (LEGAL COMPLIANCE)
+        price_violations = []
+        if "price_cue" in hits:
+            for pattern in self._price_patterns:
+                matches = pattern.findall(response)
+                if matches:
+                    price_violations.append(f"ILLEGAL HARDCODED PRICE DETECTED: {matches}")
+        for phrase in hits.get("price_phrase", ()):
+            price_violations.append(f"ILLEGAL PRICE PHRASE: {phrase}")
+        if price_violations:
+            print(f"🚨 LEGAL VIOLATION DETECTED: {price_violations}")
+            violations.extend(price_violations)
+        
+        for category, name, text in self._scripts:
+            if category in hits and text not in response:
+                violations.append(f"Exact script not used for {name}")
+        
+        if "vat" in hits and "vat_spelled" not in hits:
+            violations.append("VAT not spelled as V-A-T")
+        
+        # Bundled questions (LOCK 3)
+        if response.count('?') > 1:
+            violations.append("LOCK 3 VIOLATION: Multiple questions bundled together")
+        
+        return violations
+
+
+def compile_validators(rules_data: Dict[str, Any]) -> Dict[str, Any]:
+    """One validator per agent type (None = any other type) - rebuilt with every rules snapshot"""
+    return {"validators": {agent_type: ResponseValidator(rules_data, agent_type) for agent_type in (*AGENT_SCRIPTS, None)}}
+
 
 class RulesProcessor:
-    def __init__(self):
-        self.pdf_path = "data/rules/all rules.pdf"
-        self.rules_data = self._load_all_rules()
+    def __init__(self, pdf_path=RULES_PDF_PATH, cache_path=RULES_CACHE_PATH):
+        self.pdf_path = pdf_path
+        self.cache_path = cache_path
+        self.pdf_hash = None
+        self.rules_source = "hardcoded"
+        # Compiled PDF rules are the defaults; the rules file's "rules_processor" section hot-reloads over them
+        self.registry = RulesRegistry("rules_processor", self._load_all_rules(), compile_validators)
+    
+    def start(self):
+        """Hot-reload the rules file in this worker - call once at app startup, not per request or build step"""
+        self.registry.start()
+    
+    @property
+    def rules_data(self) -> Dict[str, Any]:
+        """Current rule set - a snapshot that is swapped, never mutated, when the rules file changes"""
+        return self.registry.current.rules
     
     def _load_all_rules(self) -> Dict[str, Any]:
-        """Load rules from PDF first, fallback to hardcoded if PDF not available"""
-        pdf_text = self._load_rules_from_pdf()
+        """Load the compiled rules artifact, re-parsing the PDF only when it has changed; hardcoded if no PDF"""
+        if not Path(self.pdf_path).exists():
+            print("PDF not found, using hardcoded rules...")
+            return self._get_hardcoded_rules()
+        
+        self.pdf_hash = hash_file(self.pdf_path)
+        rules = self._load_compiled_rules(self.pdf_hash)
+        if rules is not None:
+            print(f"📚 RULES: loaded compiled rules {self.cache_path} (pdf {self.pdf_hash[:12]})")
+            self.rules_source = "PDF"
+            return rules
         
+        pdf_text = self._load_rules_from_pdf()
         if pdf_text:
             print("Loading rules from PDF...")
-            return self._parse_wasteking_pdf(pdf_text)
+            rules = self._parse_wasteking_pdf(pdf_text)
+            self._save_compiled_rules(self.pdf_hash, rules)
+            self.rules_source = "PDF"
+            return rules
         else:
-            print("PDF not found, using hardcoded rules...")
+            print("PDF not readable, using hardcoded rules...")
             return self._get_hardcoded_rules()
     
+    def _load_compiled_rules(self, pdf_hash: str) -> Optional[Dict[str, Any]]:
+        """Rules from the artifact if it was compiled from this exact PDF by this schema version"""
+        try:
+            with open(self.cache_path) as f:
+                artifact = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if artifact.get("version") != RULES_SCHEMA_VERSION or artifact.get("pdf_sha256") != pdf_hash:
+            print(f"📚 RULES: compiled rules are stale - re-parsing {self.pdf_path}")
+            return None
+        return artifact.get("rules")
+    
+    def _save_compiled_rules(self, pdf_hash: str, rules: Dict[str, Any]):
+        """Write the artifact atomically so concurrently starting workers never read half a file"""
+        artifact = {
+            "version": RULES_SCHEMA_VERSION,
+            "pdf_sha256": pdf_hash,
+            "compiled_at": datetime.now().isoformat(),
+            "rules": rules
+        }
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(artifact, f, indent=1, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+            print(f"📚 RULES: compiled {self.pdf_path} -> {self.cache_path}")
+        except OSError as e:
+            print(f"⚠️ RULES: could not write compiled rules ({e})")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    
     def _load_rules_from_pdf(self) -> str:
         """Extract text from the WasteKing rules PDF"""
         try:
-            if not Path(self.pdf_path).exists():
-                return ""
+            import PyPDF2  # only needed when the compiled rules are missing or stale
             
             with open(self.pdf_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
@@ -316,26 +488,13 @@ class RulesProcessor:
         violations = []
         
         # Check for any hardcoded price patterns
-        price_patterns = [
-            r'£\d+',           # £123
-            r'£\d+\.\d+',      # £123.45
-            r'\d+\s*pounds?',  # 123 pounds
-            r'costs?\s*£',     # costs £
-            r'price\s*is\s*£', # price is £
-        ]
-        
-        for pattern in price_patterns:
+        for pattern in PRICE_PATTERNS:
             matches = re.findall(pattern, response, re.IGNORECASE)
             if matches:
                 violations.append(f"ILLEGAL HARDCODED PRICE DETECTED: {matches}")
         
         # Check for specific hardcoded price phrases
-        illegal_phrases = [
-            "skip costs £", "mav costs £", "grab costs £",
-            "price is £", "that'll be £", "total is £"
-        ]
-        
-        for phrase in illegal_phrases:
+        for phrase in ILLEGAL_PRICE_PHRASES:
             if phrase in response.lower():
                 violations.append(f"ILLEGAL PRICE PHRASE: {phrase}")
         
@@ -351,85 +510,58 @@ class RulesProcessor:
     
     def get_rules_for_agent(self, agent_type: str) -> Dict[str, Any]:
         """Get specific rules for an agent type"""
+        rules_data = self.rules_data  # one snapshot for the whole lookup
         base_rules = {
-            **self.rules_data["lock_rules"],
-            "office_hours": self.rules_data["office_hours"],
-            "transfer_rules": self.rules_data["transfer_rules"],
-            "pricing_rules": self.rules_data["pricing_rules"]  # Always include pricing rules
+            **rules_data["lock_rules"],
+            "office_hours": rules_data["office_hours"],
+            "transfer_rules": rules_data["transfer_rules"],
+            "pricing_rules": rules_data["pricing_rules"]  # Always include pricing rules
         }
         
         if agent_type == "skip":
             return {
                 **base_rules,
-                **self.rules_data["skip_rules"],
-                "exact_scripts": {k: v for k, v in self.rules_data["exact_scripts"].items() 
-                                if k in ["heavy_materials", "sofa_prohibited", "permit_script", "mav_suggestion"]},
-                "prohibited_items": self.rules_data["prohibited_items"]
+                **rules_data["skip_rules"],
+                "exact_scripts": {k: v for k, v in rules_data["exact_scripts"].items() 
+                                if k in AGENT_SCRIPTS["skip"]},
+                "prohibited_items": rules_data["prohibited_items"]
             }
         elif agent_type == "mav":
             return {
                 **base_rules,
-                **self.rules_data["mav_rules"],
-                "exact_scripts": {k: v for k, v in self.rules_data["exact_scripts"].items()
-                                if k in ["time_restriction", "sunday_collection"]}
+                **rules_data["mav_rules"],
+                "exact_scripts": {k: v for k, v in rules_data["exact_scripts"].items()
+                                if k in AGENT_SCRIPTS["mav"]}
             }
         elif agent_type == "grab":
             return {
                 **base_rules,
-                **self.rules_data["grab_rules"],
-                "exact_scripts": {k: v for k, v in self.rules_data["exact_scripts"].items()
-                                if k in ["grab_6_wheeler", "grab_8_wheeler"]}
+                **rules_data["grab_rules"],
+                "exact_scripts": {k: v for k, v in rules_data["exact_scripts"].items()
+                                if k in AGENT_SCRIPTS["grab"]}
             }
         else:
             return base_rules
     
     def validate_response_against_rules(self, response: str, agent_type: str) -> Dict[str, Any]:
-        """Validate agent response against business rules"""
-        rules = self.get_rules_for_agent(agent_type)
-        violations = []
-        
-        # Check for critical testing corrections
-        for correction in self.rules_data.get("testing_corrections", []):
-            if correction["wrong"].lower() in response.lower():
-                violations.append(f"CRITICAL: Used wrong phrase - {correction['wrong']}")
-        
-        # Check for hardcoded prices (LEGAL COMPLIANCE)
-        price_check = self.validate_no_hardcoded_prices(response)
-        if not price_check["legal_compliant"]:
-            violations.extend(price_check["violations"])
-        
-        # Check exact scripts
-        if "exact_scripts" in rules:
-            for script_name, script_text in rules["exact_scripts"].items():
-                if self._should_use_script(response, script_name) and script_text not in response:
-                    violations.append(f"Exact script not used for {script_name}")
-        
-        # Check VAT spelling
-        if "vat" in response.lower() and "v-a-t" not in response.lower():
-            violations.append("VAT not spelled as V-A-T")
-        
-        # Check for bundled questions (LOCK 3)
-        question_count = response.count('?')
-        if question_count > 1:
-            violations.append("LOCK 3 VIOLATION: Multiple questions bundled together")
+        """Validate agent response against business rules - one precompiled pass, safe on every reply"""
+        validators = self.registry.current.validators
+        violations = validators.get(agent_type, validators[None]).validate(response)
         
         return {
             "compliant": len(violations) == 0,
             "violations": violations,
             "agent_type": agent_type,
-            "rules_source": "PDF" if Path(self.pdf_path).exists() else "hardcoded"
+            "rules_source": self.rules_source
         }
     
     def _should_use_script(self, response: str, script_name: str) -> bool:
         """Check if response should use specific exact script"""
-        triggers = {
-            "permit_script": ["road", "permit", "council"],
-            "mav_suggestion": ["8-yard", "light materials"],
-            "grab_6_wheeler": ["6-wheeler", "6 wheel"],
-            "grab_8_wheeler": ["8-wheeler", "8 wheel"],
-            "heavy_materials": ["heavy materials", "soil", "rubble"],
-            "sofa_prohibited": ["sofa", "upholstered"]
-        }
-        
-        script_triggers = triggers.get(script_name, [])
+        script_triggers = SCRIPT_TRIGGERS.get(script_name, [])
         return any(trigger in response.lower() for trigger in script_triggers)
+
+
+if __name__ == "__main__":
+    # Build step: python -m utils.rules_processor compiles the rules artifact ahead of deploy
+    processor = RulesProcessor()
+    print(f"📚 RULES: {processor.rules_source} rules, pdf {processor.pdf_hash}, artifact {processor.cache_path}")
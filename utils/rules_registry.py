@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import threading
+
+# Rules registry configuration - NO HARDCODING
+# JSON overrides for the hardcoded rules, one section per registry: {"app": {"MAV_RULES": {...}}, "agents": {...}}
+RULES_FILE = os.getenv(
+    'WASTEKING_RULES_FILE',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'rules', 'rules.json')
+)
+# How often the watcher checks the rules file for changes; 0 disables hot reload
+RULES_RELOAD_INTERVAL = float(os.getenv('WASTEKING_RULES_RELOAD_INTERVAL', '5'))
+
+
+def merge_rules(base, override):
+    """Copy-on-write merge: dicts along the overridden paths are new, everything else is shared with base"""
+    if not isinstance(base, dict) or not isinstance(override, dict):
+        return override
+    merged = dict(base)
+    for key, value in override.items():
+        merged[key] = merge_rules(base.get(key), value)
+    return merged
+
+
+class RulesSnapshot:
+    """One immutable rule set plus everything compiled from it; rule sets are attributes (snapshot.MAV_RULES)"""
+
+    def __init__(self, version, rules, compiled, source):
+        self.version = version
+        self.rules = rules
+        self.source = source
+        self.loaded_at = time.time()
+        self.__dict__.update(rules)
+        self.__dict__.update(compiled)
+
+
+class RulesRegistry:
+    """Hardcoded rules overlaid with the rules file, recompiled and swapped in whole when the file changes.
+
+    Readers take `registry.current` once and use that snapshot for the rest of their work - a plain
+    attribute read, no lock. Snapshots are never mutated; a reload builds a new one and replaces the
+    reference, so requests in flight finish on the rules they started with.
+    """
+
+    def __init__(self, name, defaults, compile_fn=None, path=RULES_FILE, interval=RULES_RELOAD_INTERVAL):
+        self.name = name
+        self.defaults = defaults
+        self.compile_fn = compile_fn
+        self.path = path
+        self.interval = interval
+        self._lock = threading.Lock()  # serialises reloads only
+        self._signature = None
+        self._thread = None
+        self._thread_pid = None
+        self._watching = False
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_error = None
+        self.current = self._compile(self.defaults, 0, 'hardcoded')
+        self.reload()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork_in_child)
+
+    def _compile(self, rules, version, source):
+        compiled = self.compile_fn(rules) if self.compile_fn else {}
+        return RulesSnapshot(version, rules, compiled, source)
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def reload(self, force=False):
+        """Swap in a recompiled snapshot if the rules file changed; a bad file keeps the current rules"""
+        with self._lock:
+            signature = self._file_signature()
+            if signature == self._signature and not force:
+                return False
+            try:
+                if signature is None:
+                    rules, source = self.defaults, 'hardcoded'
+                else:
+                    with open(self.path) as f:
+                        overrides = json.load(f).get(self.name, {})
+                    unknown = set(overrides) - set(self.defaults)
+                    if unknown:
+                        raise ValueError(f"unknown rule sets {sorted(unknown)}")
+                    rules, source = merge_rules(self.defaults, overrides), self.path
+                snapshot = self._compile(rules, self.current.version + 1, source)
+            except Exception as e:
+                self._signature = signature  # don't retry the same broken file every poll
+                self.reload_errors += 1
+                self.last_error = str(e)
+                print(f"⚠️ RULES RELOAD FAILED ({self.name}): {e} - keeping rules v{self.current.version}")
+                return False
+            self._signature = signature
+            self.current = snapshot
+            self.reloads += 1
+            self.last_error = None
+            print(f"📚 RULES ({self.name}): v{snapshot.version} from {source}")
+            return True
+
+    def start(self):
+        """Watch the rules file in this worker"""
+        if self.interval > 0:
+            self._watching = True
+            self._ensure_watcher()
+
+    def _after_fork_in_child(self):
+        # Threads don't survive fork - a preloaded registry restarts its watcher in every worker
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+        if self._watching:
+            self._ensure_watcher()
+
+    def _ensure_watcher(self):
+        pid = os.getpid()
+        if self._thread is not None and self._thread_pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._thread_pid != pid or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._watch_loop, name=f'rules-watcher-{self.name}', daemon=True)
+                self._thread_pid = pid
+                self._thread.start()
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"⚠️ RULES WATCHER ERROR ({self.name}): {e}")
+
+    def stats(self):
+        snapshot = self.current
+        return {
+            'name': self.name,
+            'version': snapshot.version,
+            'source': snapshot.source,
+            'loaded_at': snapshot.loaded_at,
+            'path': self.path,
+            'watching': self._thread is not None and self._thread.is_alive(),
+            'reload_interval': self.interval,
+            'reloads': self.reloads,
+            'reload_errors': self.reload_errors,
+            'last_error': self.last_error
+        }
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce identical in-flight calls so only one goes upstream and the rest share its result"""
+
+    def __init__(self, name):
+        self.name = name
+        self._flights = {}  # key -> _Flight (threads)
+        self._async_flights = {}  # (loop id, key) -> asyncio.Future
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key, fn):
+        """Run fn() once per key at a time; returns (result, shared)"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.followers += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    async def do_async(self, key, coro_fn):
+        """Async variant of do() for callers on one event loop"""
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        with self._lock:
+            future = self._async_flights.get(flight_key)
+            leader = future is None
+            if leader:
+                future = self._async_flights[flight_key] = loop.create_future()
+                self.leaders += 1
+            else:
+                self.followers += 1
+
+        if not leader:
+            # shield: a cancelled follower must not cancel the shared call
+            return await asyncio.shield(future), True
+
+        try:
+            result = await coro_fn()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # mark retrieved in case nobody was waiting
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._async_flights[flight_key]
+
+    def stats(self):
+        with self._lock:
+            total = self.leaders + self.followers
+            return {
+                'name': self.name,
+                'upstream_calls': self.leaders,
+                'coalesced_calls': self.followers,
+                'in_flight': len(self._flights) + len(self._async_flights),
+                'dedupe_ratio': (self.followers / total * 100) if total else 0
+            }
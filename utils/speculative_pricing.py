@@ -0,0 +1,361 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from collections import OrderedDict
+from utils.price_cache import price_key
+from utils.conversation_store import CONVERSATION_STORE, CONVERSATION_DB, CONVERSATION_DB_BUSY_TIMEOUT_MS
+
+# Speculative pricing configuration - NO HARDCODING
+SPECULATIVE_PRICING_ENABLED = os.getenv('WASTEKING_SPECULATIVE_PRICING', 'true').lower() == 'true'
+SPECULATIVE_SERVICES = [s.strip() for s in os.getenv('WASTEKING_SPECULATIVE_SERVICES', 'skip,mav').split(',') if s.strip()]
+SPECULATIVE_MAX_IN_FLIGHT = int(os.getenv('WASTEKING_SPECULATIVE_MAX_IN_FLIGHT', '8'))
+SPECULATIVE_MAX_PENDING = int(os.getenv('WASTEKING_SPECULATIVE_MAX_PENDING', '1000'))
+# A speculative quote older than this is thrown away rather than shown
+SPECULATIVE_MAX_AGE = float(os.getenv('WASTEKING_SPECULATIVE_MAX_AGE', '300'))
+# How long a pricing turn waits for a speculation that is still in flight
+SPECULATIVE_WAIT = float(os.getenv('WASTEKING_SPECULATIVE_WAIT', '15'))
+# How often a worker checks the shared store for a quote another worker is still fetching
+SPECULATIVE_POLL_INTERVAL = float(os.getenv('WASTEKING_SPECULATIVE_POLL_INTERVAL', '0.05'))
+
+
+class _Speculation:
+    """One conversation's background quote - key, token (which run it is), wall-clock start, quote once done"""
+    __slots__ = ('key', 'token', 'started_at', 'quote')
+
+    def __init__(self, key, token, started_at, quote=None):
+        self.key = key
+        self.token = token
+        self.started_at = started_at
+        self.quote = quote
+
+
+class MemorySpeculationStore:
+    """In-process speculations - one worker only; the next turn must land on the same worker to use them"""
+
+    backend = 'memory'
+
+    def __init__(self):
+        self._speculations = OrderedDict()  # conversation_id -> _Speculation, oldest first
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork_in_child)
+
+    def get(self, conversation_id):
+        with self._lock:
+            return self._speculations.get(conversation_id)
+
+    def put(self, conversation_id, speculation):
+        with self._lock:
+            self._speculations.pop(conversation_id, None)
+            self._speculations[conversation_id] = speculation
+
+    def finish(self, conversation_id, token, quote):
+        with self._lock:
+            speculation = self._speculations.get(conversation_id)
+            if speculation is not None and speculation.token == token:
+                speculation.quote = quote
+
+    def take(self, conversation_id, token):
+        """Remove this run if it is still there and finished; True for the one caller that got it"""
+        with self._lock:
+            speculation = self._speculations.get(conversation_id)
+            if speculation is None or speculation.token != token or speculation.quote is None:
+                return False
+            del self._speculations[conversation_id]
+            return True
+
+    def delete(self, conversation_id, token=None):
+        with self._lock:
+            speculation = self._speculations.get(conversation_id)
+            if speculation is None or (token is not None and speculation.token != token):
+                return False
+            del self._speculations[conversation_id]
+            return True
+
+    def expire(self, cutoff, max_pending):
+        """Drop runs started before cutoff, then the oldest over max_pending; returns how many went"""
+        dropped = 0
+        with self._lock:
+            while self._speculations:
+                conversation_id, speculation = next(iter(self._speculations.items()))
+                if speculation.started_at >= cutoff and len(self._speculations) <= max_pending:
+                    break
+                del self._speculations[conversation_id]
+                dropped += 1
+        return dropped
+
+    def __len__(self):
+        return len(self._speculations)
+
+    def _after_fork_in_child(self):
+        # Speculations running in the parent never finish in the child
+        self._speculations = OrderedDict()
+        self._lock = threading.Lock()
+
+
+class SQLiteSpeculationStore:
+    """Speculations in the shared conversation database, so a quote started on one worker is used on another"""
+
+    backend = 'sqlite'
+
+    def __init__(self, path=CONVERSATION_DB):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS speculations ("
+            "id TEXT PRIMARY KEY, key TEXT NOT NULL, token TEXT NOT NULL, started_at REAL NOT NULL, quote TEXT)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS speculations_started_at ON speculations (started_at)")
+
+    def _connection(self):
+        # One connection per thread per worker - sqlite handles must never cross a fork
+        pid = os.getpid()
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != pid:
+            connection = sqlite3.connect(self.path, timeout=CONVERSATION_DB_BUSY_TIMEOUT_MS / 1000,
+                                         isolation_level=None, check_same_thread=False)
+            connection.execute(f"PRAGMA busy_timeout={CONVERSATION_DB_BUSY_TIMEOUT_MS}")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = pid
+        return connection
+
+    def get(self, conversation_id):
+        row = self._connection().execute(
+            "SELECT key, token, started_at, quote FROM speculations WHERE id = ?", (str(conversation_id),)
+        ).fetchone()
+        if not row:
+            return None
+        return _Speculation(tuple(row[0].split('|')), row[1], row[2], json.loads(row[3]) if row[3] is not None else None)
+
+    def put(self, conversation_id, speculation):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO speculations (id, key, token, started_at, quote) VALUES (?, ?, ?, ?, NULL)",
+            (str(conversation_id), '|'.join(speculation.key), speculation.token, speculation.started_at)
+        )
+
+    def finish(self, conversation_id, token, quote):
+        self._connection().execute(
+            "UPDATE speculations SET quote = ? WHERE id = ? AND token = ?",
+            (json.dumps(quote, separators=(',', ':'), default=str), str(conversation_id), token)
+        )
+
+    def take(self, conversation_id, token):
+        """Remove this run if it is still there and finished; True for the one caller that got it"""
+        return self._connection().execute(
+            "DELETE FROM speculations WHERE id = ? AND token = ? AND quote IS NOT NULL", (str(conversation_id), token)
+        ).rowcount == 1
+
+    def delete(self, conversation_id, token=None):
+        if token is None:
+            cursor = self._connection().execute("DELETE FROM speculations WHERE id = ?", (str(conversation_id),))
+        else:
+            cursor = self._connection().execute(
+                "DELETE FROM speculations WHERE id = ? AND token = ?", (str(conversation_id), token))
+        return cursor.rowcount == 1
+
+    def expire(self, cutoff, max_pending):
+        """Drop runs started before cutoff, then the oldest over max_pending; returns how many went"""
+        connection = self._connection()
+        dropped = connection.execute("DELETE FROM speculations WHERE started_at < ?", (cutoff,)).rowcount
+        excess = len(self) - max_pending
+        if excess > 0:
+            dropped += connection.execute(
+                "DELETE FROM speculations WHERE id IN "
+                "(SELECT id FROM speculations ORDER BY started_at LIMIT ?)", (excess,)).rowcount
+        return dropped
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM speculations").fetchone()[0]
+
+
+def create_speculation_store(backend=CONVERSATION_STORE):
+    """Shared sqlite store alongside the conversations, or in-memory when conversations are in memory too"""
+    if backend == 'sqlite':
+        try:
+            return SQLiteSpeculationStore()
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️ SQLITE SPECULATION STORE UNAVAILABLE ({e}) - speculations stay on the worker that started them")
+    return MemorySpeculationStore()
+
+
+class SpeculativePricer:
+    """Per-conversation background pricing, started as soon as postcode and service are known"""
+
+    def __init__(self, fetch_fn, max_in_flight=SPECULATIVE_MAX_IN_FLIGHT, max_pending=SPECULATIVE_MAX_PENDING,
+                 max_age=SPECULATIVE_MAX_AGE, wait=SPECULATIVE_WAIT, store=None):
+        self.fetch_fn = fetch_fn  # (postcode, service, skip_type) -> {'booking': ..., 'pricing': ...}
+        self.max_in_flight = max_in_flight
+        self.max_pending = max_pending
+        self.max_age = max_age
+        self.wait = wait
+        self.store = store if store is not None else create_speculation_store()
+        self._done = {}  # token -> Event for the runs this worker is fetching
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        # Counters are this worker's; pending is every worker's
+        self.started = 0
+        self.used = 0
+        self.wasted = 0
+        self.skipped = 0
+        self.ready_on_claim = 0
+        self.waited_on_claim = 0
+        self._wait_ms_total = 0.0
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork_in_child)
+
+    @property
+    def enabled(self):
+        return SPECULATIVE_PRICING_ENABLED and self.max_in_flight > 0
+
+    def speculate(self, conversation_id, postcode, service, skip_type=None):
+        """Start pricing this conversation in the background; False if nothing new was started"""
+        if not self.enabled or not postcode or service not in SPECULATIVE_SERVICES:
+            return False
+        key = price_key(postcode, service, skip_type)
+        self._discard_expired()
+        current = self.store.get(conversation_id)
+        if current is not None and current.key == key:
+            return False
+        with self._lock:
+            if self._in_flight >= self.max_in_flight:
+                self.skipped += 1
+                return False
+            self._in_flight += 1
+            self.started += 1
+        if current is not None and self.store.delete(conversation_id, current.token):
+            # Postcode or service changed - the earlier guess is no use now
+            self._count_wasted()
+        speculation = _Speculation(key, uuid.uuid4().hex, time.time())
+        done = self._done[speculation.token] = threading.Event()
+        self.store.put(conversation_id, speculation)
+
+        print(f"🔮 SPECULATIVE PRICING for {service} {skip_type or 'default'} at {postcode} (conversation {conversation_id})")
+        thread = threading.Thread(target=self._run, args=(conversation_id, speculation.token, done, postcode, service, skip_type),
+                                  name='speculative-pricing', daemon=True)
+        thread.start()
+        return True
+
+    def _run(self, conversation_id, token, done, postcode, service, skip_type):
+        try:
+            quote = self.fetch_fn(postcode, service, skip_type)
+        except Exception as e:
+            quote = {'booking': {"success": False, "error": str(e)}, 'pricing': None}
+        try:
+            self.store.finish(conversation_id, token, quote)
+        except Exception as e:
+            print(f"❌ SPECULATIVE PRICING NOT STORED: {e}")
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._done.pop(token, None)
+            done.set()
+
+    def pending(self, conversation_id, postcode, service, skip_type=None):
+        """True if a speculation for exactly this lookup is waiting to be claimed"""
+        speculation = self.store.get(conversation_id)
+        return speculation is not None and speculation.key == price_key(postcode, service, skip_type)
+
+    def claim(self, conversation_id, postcode, service, skip_type=None):
+        """Take this conversation's speculative quote if it matches, waiting for it if still in flight"""
+        speculation = self.store.get(conversation_id)
+        if speculation is None:
+            return None
+        if speculation.key != price_key(postcode, service, skip_type):
+            if self.store.delete(conversation_id, speculation.token):
+                self._count_wasted()
+            return None
+
+        ready = speculation.quote is not None
+        started = time.monotonic()
+        if not ready:
+            speculation = self._wait_for(conversation_id, speculation.token)
+            if speculation is None:
+                print(f"⌛ SPECULATIVE PRICING NOT READY after {self.wait}s - pricing normally")
+                return None
+        if time.time() - speculation.started_at > self.max_age:
+            if self.store.delete(conversation_id, speculation.token):
+                self._count_wasted()
+            return None
+        if not self.store.take(conversation_id, speculation.token):
+            # A concurrent turn for the same conversation got it first
+            return None
+
+        with self._lock:
+            self.used += 1
+            if ready:
+                self.ready_on_claim += 1
+            else:
+                self.waited_on_claim += 1
+                self._wait_ms_total += (time.monotonic() - started) * 1000
+        print(f"🔮 SPECULATIVE QUOTE USED ({'ready' if ready else 'waited'}) for conversation {conversation_id}")
+        return speculation.quote
+
+    def _wait_for(self, conversation_id, token):
+        """The finished run, or None once it is replaced, gone, or still running after self.wait"""
+        deadline = time.monotonic() + self.wait
+        while True:
+            done = self._done.get(token)
+            remaining = deadline - time.monotonic()
+            if done is not None:
+                # Ours - no need to poll the store
+                done.wait(timeout=max(remaining, 0))
+            speculation = self.store.get(conversation_id)
+            if speculation is None or speculation.token != token:
+                return None
+            if speculation.quote is not None:
+                return speculation
+            if remaining <= 0:
+                if self.store.delete(conversation_id, token):
+                    self._count_wasted()
+                return None
+            if done is None:
+                # Another worker is fetching it - poll the shared store
+                time.sleep(min(SPECULATIVE_POLL_INTERVAL, remaining))
+
+    def discard(self, conversation_id):
+        """Drop a speculation that will never be claimed, e.g. after a transfer"""
+        if self.store.delete(conversation_id):
+            self._count_wasted()
+
+    def _count_wasted(self, count=1):
+        with self._lock:
+            self.wasted += count
+
+    def _discard_expired(self):
+        dropped = self.store.expire(time.time() - self.max_age, self.max_pending)
+        if dropped:
+            self._count_wasted(dropped)
+
+    def _after_fork_in_child(self):
+        # Speculations running in the parent never finish in the child
+        self._done = {}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def stats(self):
+        self._discard_expired()
+        pending = len(self.store)
+        with self._lock:
+            finished = self.used + self.wasted
+            return {
+                'enabled': self.enabled,
+                'services': SPECULATIVE_SERVICES,
+                'store': self.store.backend,
+                'started': self.started,
+                'used': self.used,
+                'wasted': self.wasted,
+                'skipped': self.skipped,
+                'pending': pending,
+                'in_flight': self._in_flight,
+                'ready_on_claim': self.ready_on_claim,
+                'waited_on_claim': self.waited_on_claim,
+                'avg_wait_ms': (self._wait_ms_total / self.waited_on_claim) if self.waited_on_claim else None,
+                'use_rate': (self.used / finished * 100) if finished else 0
+            }
@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+# Bounded state cache configuration - NO HARDCODING
+CONVERSATION_TTL = float(os.getenv('WASTEKING_CONVERSATION_TTL', '3600'))
+CONVERSATION_MAX_ENTRIES = int(os.getenv('WASTEKING_CONVERSATION_MAX_ENTRIES', '10000'))
+LIVE_CALLS_TTL = float(os.getenv('WASTEKING_LIVE_CALLS_TTL', '3600'))
+LIVE_CALLS_MAX_ENTRIES = int(os.getenv('WASTEKING_LIVE_CALLS_MAX_ENTRIES', '500'))
+# Finished calls evicted from memory are appended here as JSON lines - empty disables spilling
+SPILL_DIR = os.getenv('WASTEKING_SPILL_DIR', '')
+
+FINISHED_STAGES = ['completed', 'transfer_completed']
+
+_MISSING = object()
+
+
+class SpillFile:
+    """Append-only JSON-lines file for finished calls pushed out of memory"""
+
+    def __init__(self, name, directory=SPILL_DIR):
+        self.path = os.path.join(directory, name) if directory else None
+        self._lock = threading.Lock()
+        self.spilled = 0
+        self.failures = 0
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def write(self, key, value):
+        if not self.enabled:
+            return False
+        if hasattr(value, 'to_dict'):
+            value = value.to_dict()
+        line = json.dumps({'id': key, 'evicted_at': time.time(), 'data': value}, default=str)
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, 'a') as f:
+                    f.write(line + '\n')
+                self.spilled += 1
+            return True
+        except OSError as e:
+            self.failures += 1
+            print(f"⚠️ SPILL TO {self.path} FAILED: {e}")
+            return False
+
+
+class BoundedStateCache:
+    """Dict-like cache with an idle TTL and an LRU max-entries cap; finished entries can spill to disk"""
+
+    def __init__(self, name, ttl, max_entries, spill=None, is_finished=None, on_remove=None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.spill = spill
+        self.is_finished = is_finished
+        # Called as on_remove(key, value) with the lock held whenever an entry leaves (evicted, popped, deleted)
+        self.on_remove = on_remove
+        self._entries = OrderedDict()  # key -> (touched_at, value), least recently used first
+        self._lock = threading.RLock()
+        self.evicted_ttl = 0
+        self.evicted_lru = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if self.ttl and now - entry[0] > self.ttl:
+                self._evict(key, expired=True)
+                return default
+            self._entries[key] = (now, entry[1])
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def peek(self, key, default=None):
+        """Value without refreshing its TTL or LRU position - for read-only views like dashboards"""
+        with self._lock:
+            entry = self._entries.get(key)
+        return default if entry is None else entry[1]
+
+    def put(self, key, value, age=0):
+        """Store a value; age (seconds) backdates it, e.g. when replaying an update made elsewhere earlier"""
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (now - age, value)
+            self._entries.move_to_end(key)
+            self._evict_expired(now)
+            while self.max_entries and len(self._entries) > self.max_entries:
+                self._evict(next(iter(self._entries)), expired=False)
+
+    @property
+    def lock(self):
+        """Re-entrant lock guarding the cache - hold it to keep derived state in step with the entries"""
+        return self._lock
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and self.on_remove is not None:
+                self.on_remove(key, entry[1])
+        return default if entry is None else entry[1]
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def __delitem__(self, key):
+        with self._lock:
+            _, value = self._entries.pop(key)
+            if self.on_remove is not None:
+                self.on_remove(key, value)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._entries)
+
+    def values(self):
+        with self._lock:
+            return [value for _, value in self._entries.values()]
+
+    def items(self):
+        with self._lock:
+            return [(key, value) for key, (_, value) in self._entries.items()]
+
+    def sweep(self):
+        """Drop everything idle past the TTL; returns how many went"""
+        with self._lock:
+            before = len(self._entries)
+            self._evict_expired(time.monotonic())
+            return before - len(self._entries)
+
+    def _evict_expired(self, now):
+        if not self.ttl:
+            return
+        while self._entries:
+            key, (touched_at, _) = next(iter(self._entries.items()))
+            if now - touched_at <= self.ttl:
+                break
+            self._evict(key, expired=True)
+
+    def _evict(self, key, expired):
+        _, value = self._entries.pop(key)
+        if expired:
+            self.evicted_ttl += 1
+        else:
+            self.evicted_lru += 1
+        if self.on_remove is not None:
+            self.on_remove(key, value)
+        if self.spill is not None and self.is_finished is not None and self.is_finished(value):
+            self.spill.write(key, value)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'name': self.name,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'evicted_ttl': self.evicted_ttl,
+                'evicted_lru': self.evicted_lru,
+                'spill_enabled': self.spill is not None and self.spill.enabled,
+                'spilled': self.spill.spilled if self.spill is not None else 0
+            }
+
+
+def conversation_finished(state):
+    return state.get('stage') in FINISHED_STAGES or bool(state.get('booking_completed'))
+
+
+def call_finished(call):
+    return call.get('status') == 'completed'
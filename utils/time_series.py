@@ -0,0 +1,97 @@
+import os
+import time
+import threading
+
+# Rolling analytics configuration - NO HARDCODING
+# Bucket width in seconds; windows are whole numbers of buckets
+ANALYTICS_RESOLUTION = int(os.getenv('WASTEKING_ANALYTICS_RESOLUTION', '60'))
+# Windows reported, in seconds - the longest sets how many buckets each series keeps
+ANALYTICS_WINDOWS = [int(seconds) for seconds in os.getenv('WASTEKING_ANALYTICS_WINDOWS', '300,3600,86400').split(',')]
+
+
+def window_label(seconds):
+    if seconds % 86400 == 0:
+        return f"{seconds // 86400 * 24}h"
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600}h"
+    if seconds % 60 == 0:
+        return f"{seconds // 60}m"
+    return f"{seconds}s"
+
+
+class RollingCounters:
+    """Fixed-memory ring buffers of per-bucket counts with running sums for every window.
+
+    add() and totals() are O(1); moving to a new bucket subtracts the buckets that just left each
+    window, so nothing is ever rescanned. Memory per series is one list of `slots` ints.
+    """
+
+    def __init__(self, windows=ANALYTICS_WINDOWS, resolution=ANALYTICS_RESOLUTION, clock=time.time):
+        self.resolution = resolution
+        self.windows = sorted(windows)
+        self._spans = [max(1, seconds // resolution) for seconds in self.windows]  # buckets per window
+        self.slots = self._spans[-1]
+        self.clock = clock
+        self._buckets = {}  # series key -> ring of counts, bucket number % slots
+        self._sums = {}  # series key -> running total per window
+        self._bucket = int(clock() // resolution)
+        self._lock = threading.Lock()
+
+    def _advance(self):
+        bucket = int(self.clock() // self.resolution)
+        if bucket <= self._bucket:
+            return
+        if bucket - self._bucket >= self.slots:
+            # Idle longer than the longest window - everything has aged out
+            for key in self._buckets:
+                self._buckets[key] = [0] * self.slots
+                self._sums[key] = [0] * len(self._spans)
+        else:
+            for step in range(self._bucket + 1, bucket + 1):
+                for key, ring in self._buckets.items():
+                    sums = self._sums[key]
+                    for i, span in enumerate(self._spans):
+                        # The bucket `span` steps back is leaving this window
+                        sums[i] -= ring[(step - span) % self.slots]
+                    ring[step % self.slots] = 0
+        self._bucket = bucket
+
+    def add(self, key, count=1, at=None):
+        """Count now, or at an earlier epoch time that is still inside the longest window"""
+        with self._lock:
+            self._advance()
+            age = self._bucket - int(at // self.resolution) if at is not None else 0
+            if age >= self.slots:
+                return
+            age = max(age, 0)
+            ring = self._buckets.get(key)
+            if ring is None:
+                ring = self._buckets[key] = [0] * self.slots
+                self._sums[key] = [0] * len(self._spans)
+            ring[(self._bucket - age) % self.slots] += count
+            sums = self._sums[key]
+            for i, span in enumerate(self._spans):
+                # Only the windows that still reach back to that bucket
+                if age < span:
+                    sums[i] += count
+
+    def totals(self, key):
+        """Window seconds -> count over that window for one series"""
+        with self._lock:
+            self._advance()
+            sums = self._sums.get(key)
+            return {seconds: sums[i] if sums else 0 for i, seconds in enumerate(self.windows)}
+
+    def keys(self):
+        with self._lock:
+            return list(self._buckets)
+
+    def series(self, key, window):
+        """Per-bucket counts across one window, oldest first - O(buckets in the window)"""
+        span = min(max(1, window // self.resolution), self.slots)
+        with self._lock:
+            self._advance()
+            ring = self._buckets.get(key)
+            if ring is None:
+                return [0] * span
+            return [ring[step % self.slots] for step in range(self._bucket - span + 1, self._bucket + 1)]
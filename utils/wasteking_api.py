@@ -1,7 +1,14 @@
 import os
-import requests
 import json
+import time
+import threading
 from datetime import datetime
+from utils.http_session import get_session, get_timeout
+from utils.price_cache import price_cache, price_key, normalise_postcode, quote_is_fresh, PRICE_CACHE_ENABLED
+from utils.single_flight import SingleFlight
+from utils.booking_pool import BookingRefPool
+from utils.speculative_pricing import SpeculativePricer
+from utils.circuit_breaker import circuit_breaker
 
 # WasteKing API Configuration - NO HARDCODING
 BASE_URL = os.getenv('WASTEKING_BASE_URL', 'https://wk-smp-api-dev.azurewebsites.net')
@@ -9,51 +16,201 @@ ACCESS_TOKEN = os.getenv('WASTEKING_ACCESS_TOKEN', 'wk-KZPY-tGF-@d.Aby9fpvMC_VVW
 
 def wasteking_request(endpoint, payload, method="POST"):
     """WasteKing API request function - NO HARDCODING"""
+    ticket = circuit_breaker.allow(endpoint)
+    if not ticket:
+        return circuit_open_result(endpoint)
+    
+    started = time.monotonic()
     try:
         url = f"{BASE_URL}/{endpoint}"
-        headers = {
-            "Content-Type": "application/json",
-            "x-wasteking-request": ACCESS_TOKEN
-        }
+        headers = request_headers()
         
         print(f"🌐 API REQUEST: {method} {url}")
         print(f"📦 PAYLOAD: {json.dumps(payload, indent=2)}")
         
+        session = get_session()
+        timeout = circuit_breaker.timeout(endpoint, get_timeout(endpoint), ticket)
         if method == "POST":
-            response = requests.post(url, json=payload, headers=headers, timeout=15)
+            response = session.post(url, json=payload, headers=headers, timeout=timeout)
         else:
-            response = requests.get(url, params=payload, headers=headers, timeout=15)
-        
-        print(f"📊 RESPONSE: {response.status_code} - {response.text}")
+            response = session.get(url, params=payload, headers=headers, timeout=timeout)
         
-        if response.status_code in [200, 201]:
-            try:
-                return {"success": True, **response.json()}
-            except:
-                return {"success": True, "response": response.text}
-        else:
-            return {"success": False, "error": f"HTTP {response.status_code}", "response": response.text}
+        # Only 5xx means the SMP API itself is degraded
+        circuit_breaker.record(endpoint, response.status_code < 500, time.monotonic() - started, ticket)
+        return parse_response(response.status_code, response.text)
             
     except Exception as e:
+        circuit_breaker.record(endpoint, False, time.monotonic() - started, ticket)
         print(f"❌ API ERROR: {str(e)}")
         return {"success": False, "error": str(e)}
+    except BaseException:
+        # Interrupted mid-call - a half-open probe must still hand its slot back
+        circuit_breaker.release(endpoint, ticket)
+        raise
+
+def circuit_open_result(endpoint):
+    """Fail fast while the SMP API is degraded so the agent can transfer the caller"""
+    print(f"⛔ CIRCUIT OPEN - skipping {endpoint}")
+    return {"success": False, "error": f"Circuit open for {endpoint}", "circuit_open": True}
+
+def request_headers():
+    return {
+        "Content-Type": "application/json",
+        "x-wasteking-request": ACCESS_TOKEN
+    }
+
+def parse_response(status_code, text):
+    """Turn an HTTP status + body into the API result dict"""
+    print(f"📊 RESPONSE: {status_code} - {text}")
+    
+    if status_code in [200, 201]:
+        try:
+            return {"success": True, **json.loads(text)}
+        except (ValueError, TypeError):
+            return {"success": True, "response": text}
+    else:
+        return {"success": False, "error": f"HTTP {status_code}", "response": text}
+
+CREATE_BOOKING_PAYLOAD = {"type": "chatbot", "source": "wasteking.co.uk"}
 
 def create_booking():
     """Step 1: Create booking reference - NO HARDCODING"""
     print("📋 STEP 1: Creating booking...")
-    payload = {"type": "chatbot", "source": "wasteking.co.uk"}
-    result = wasteking_request("api/booking/create", payload)
-    
+    result = wasteking_request("api/booking/create", CREATE_BOOKING_PAYLOAD)
+    return handle_create_booking_result(result)
+
+def handle_create_booking_result(result):
     if result.get('success'):
         booking_ref = result.get('bookingRef') or result.get('booking_ref')
         print(f"✅ BOOKING REF: {booking_ref}")
         return {"success": True, "booking_ref": booking_ref}
     return result
 
-def get_pricing(booking_ref, postcode, service, skip_type=None):
+booking_pool = BookingRefPool(create_booking)
+
+def acquire_booking():
+    """Step 1 (fast path): take a pre-created booking ref from the pool, else create one"""
+    booking_ref = booking_pool.acquire()
+    if booking_ref:
+        print(f"⚡ BOOKING REF FROM POOL: {booking_ref}")
+        return {"success": True, "booking_ref": booking_ref}
+    return create_booking()
+
+def price_matrix(result_items):
+    """Every fixed REAL price in a resultItems list, by type - 'call' and £0.00 are left out"""
+    return {
+        item.get('type'): item.get('price')
+        for item in result_items
+        if item.get('price') and item.get('price') != 'call' and item.get('price') != '£0.00'
+    }
+
+def select_price(result_items, postcode, skip_type=None, quoted_at=None):
+    """Pick the REAL price for the requested type from a resultItems list - NO HARDCODING"""
+    matrix = price_matrix(result_items)
+    quote = {"success": True, "price_matrix": matrix, "quoted_at": quoted_at or time.time()}
+    
+    # Find the exact type requested if specified
+    if skip_type and skip_type in matrix:
+        print(f"✅ FOUND REAL PRICE {skip_type} for {postcode}: {matrix[skip_type]}")
+        return {**quote, "price": matrix[skip_type], "type": skip_type}
+    
+    # If no specific type or type not found, get first available priced item
+    for item_type, price in matrix.items():
+        print(f"✅ FOUND REAL PRICE {item_type} for {postcode}: {price}")
+        return {**quote, "price": price, "type": item_type}
+    
+    print(f"❌ No fixed REAL prices available for {postcode} - all require phone quote")
+    return {"success": False, "error": f"No fixed prices for {postcode} - API returned 'call' only"}
+
+def get_pricing(booking_ref, postcode, service, skip_type=None, *, use_cache=True):
     """Step 2: Get pricing with booking ref - REAL API PRICES ONLY, NO HARDCODING"""
     print(f"💰 STEP 2: Getting REAL price for {service} {skip_type or 'default'} at {postcode}...")
     
+    if not use_cache:
+        payload = pricing_payload(booking_ref, postcode, service, skip_type)
+        result = wasteking_request("api/booking/update", payload)
+        return handle_pricing_result(result, postcode, service, skip_type)
+    
+    cached = cached_pricing(postcode, service, skip_type)
+    if cached is not None:
+        return cached
+    
+    # Identical lookups already in flight share one upstream call
+    result, shared = pricing_flight.do(
+        price_key(postcode, service, skip_type),
+        lambda: wasteking_request("api/booking/update", pricing_payload(booking_ref, postcode, service, skip_type))
+    )
+    return handle_pricing_result(result, postcode, service, skip_type, shared)
+
+pricing_flight = SingleFlight('pricing')
+
+def cached_pricing(postcode, service, skip_type=None):
+    """Answer a pricing lookup from the price cache, or None on a miss"""
+    if not PRICE_CACHE_ENABLED:
+        return None
+    entry = price_cache.get_entry(postcode, service, skip_type)
+    if entry is None:
+        return None
+    cached_items, age = entry
+    print(f"⚡ PRICE CACHE HIT for {service} {skip_type or 'default'} at {postcode} ({age:.0f}s old)")
+    # The quote is only as fresh as the cached API answer behind it
+    result = select_price(cached_items, postcode, skip_type, quoted_at=time.time() - age)
+    result["cached"] = True
+    return result
+
+def remember_price_matrix(pricing_result, postcode, service):
+    """Conversation-state record of every size one pricing call quoted"""
+    return {
+        "postcode": normalise_postcode(postcode),
+        "service": service,
+        "quoted_at": pricing_result.get('quoted_at'),
+        "prices": dict(pricing_result.get('price_matrix') or {})
+    }
+
+def price_from_matrix(price_matrix, postcode, service, skip_type):
+    """Re-quote a size change from a stored price matrix - None when the API must be asked"""
+    if not price_matrix or not skip_type:
+        return None
+    if price_matrix.get('postcode') != normalise_postcode(postcode) or price_matrix.get('service') != service:
+        return None
+    if not quote_is_fresh(price_matrix.get('quoted_at')):
+        return None
+    price = price_matrix.get('prices', {}).get(skip_type)
+    if not price:
+        return None
+    print(f"🧮 PRICE MATRIX HIT for {service} {skip_type} at {postcode}: {price} - no API call")
+    return {"success": True, "price": price, "type": skip_type, "from_matrix": True}
+
+def fetch_quote(postcode, service, skip_type=None):
+    """Steps 1-2 together: booking ref plus price, as an agent pricing turn needs them"""
+    booking_result = acquire_booking()
+    if not booking_result.get('success'):
+        return {'booking': booking_result, 'pricing': None}
+    pricing_result = get_pricing(booking_result['booking_ref'], postcode, service, skip_type)
+    return {'booking': booking_result, 'pricing': pricing_result}
+
+speculative_pricer = SpeculativePricer(fetch_quote)
+
+def fetch_comparison_quote(postcode, skip_type=None, mav_type=None):
+    """Skip and man & van quotes for one postcode, fetched side by side - takes as long as the slower"""
+    print(f"⚖️ COMPARISON QUOTE: skip {skip_type or 'default'} vs man & van {mav_type or skip_type or 'default'} at {postcode}")
+    started = time.monotonic()
+    quotes = {}
+
+    def fetch_mav():
+        try:
+            quotes['mav'] = fetch_quote(postcode, 'mav', mav_type or skip_type)
+        except Exception as e:
+            quotes['mav'] = {'booking': {"success": False, "error": str(e)}, 'pricing': None}
+
+    mav_thread = threading.Thread(target=fetch_mav, name='comparison-quote', daemon=True)
+    mav_thread.start()
+    quotes['skip'] = fetch_quote(postcode, 'skip', skip_type)
+    mav_thread.join()
+    print(f"⚖️ COMPARISON QUOTE READY in {(time.monotonic() - started) * 1000:.0f}ms")
+    return quotes
+
+def pricing_payload(booking_ref, postcode, service, skip_type=None):
     payload = {
         "bookingRef": booking_ref,
         "search": {
@@ -66,8 +223,16 @@ def get_pricing(booking_ref, postcode, service, skip_type=None):
     if skip_type:
         payload["search"]["type"] = skip_type
         print(f"🔧 INCLUDING TYPE PARAMETER: {skip_type}")
-    
-    result = wasteking_request("api/booking/update", payload)
+    return payload
+
+def handle_pricing_result(result, postcode, service, skip_type=None, shared=False):
+    if shared:
+        # The search went out under another caller's booking ref, like a cache hit
+        print(f"🔗 COALESCED with in-flight pricing for {service} {skip_type or 'default'} at {postcode}")
+        pricing = handle_pricing_result(result, postcode, service, skip_type)
+        if pricing.get('success'):
+            pricing.update({"cached": True, "coalesced": True})
+        return pricing
     
     if result.get('success'):
         # Extract REAL price from resultItems array for specific postcode - NO HARDCODING
@@ -77,33 +242,22 @@ def get_pricing(booking_ref, postcode, service, skip_type=None):
         for item in result_items:
             print(f"   {item.get('type')}: {item.get('price')}")
         
-        # Find the exact type requested if specified
-        if skip_type:
-            for item in result_items:
-                if item.get('type') == skip_type:
-                    price = item.get('price')
-                    if price and price != 'call' and price != '£0.00':
-                        print(f"✅ FOUND REAL PRICE {skip_type} for {postcode}: {price}")
-                        return {"success": True, "price": price, "type": skip_type}
-        
-        # If no specific type or type not found, get first available priced item
-        for item in result_items:
-            price = item.get('price')
-            item_type = item.get('type')
-            if price and price != 'call' and price != '£0.00':
-                print(f"✅ FOUND REAL PRICE {item_type} for {postcode}: {price}")
-                return {"success": True, "price": price, "type": item_type}
+        if result_items and PRICE_CACHE_ENABLED:
+            price_cache.put(postcode, service, skip_type, result_items)
         
-        print(f"❌ No fixed REAL prices available for {postcode} - all require phone quote")
-        return {"success": False, "error": f"No fixed prices for {postcode} - API returned 'call' only"}
+        return select_price(result_items, postcode, skip_type)
     
     print(f"❌ API failed for {postcode}")
-    return {"success": False, "error": "Pricing API call failed"}
+    return {"success": False, "error": "Pricing API call failed", "circuit_open": result.get('circuit_open', False)}
 
 def update_booking_details(booking_ref, customer_data):
     """Step 3: Update booking with customer details - NO HARDCODING"""
     print("📝 STEP 3: Updating customer details...")
-    payload = {
+    result = wasteking_request("api/booking/update", details_payload(booking_ref, customer_data))
+    return handle_details_result(result)
+
+def details_payload(booking_ref, customer_data):
+    return {
         "bookingRef": booking_ref,
         "customer": {
             "firstName": customer_data.get('firstName', ''),
@@ -119,8 +273,8 @@ def update_booking_details(booking_ref, customer_data):
             "notes": f"{customer_data.get('service', '')} booking"
         }
     }
-    result = wasteking_request("api/booking/update", payload)
-    
+
+def handle_details_result(result):
     if result.get('success'):
         print("✅ DETAILS UPDATED")
         return {"success": True}
@@ -129,13 +283,17 @@ def update_booking_details(booking_ref, customer_data):
 def create_payment_link(booking_ref):
     """Step 4: Create payment link - FIXED - NO HARDCODING"""
     print("💳 STEP 4: Creating payment link...")
-    payload = {
+    result = wasteking_request("api/booking/update", payment_link_payload(booking_ref))
+    return handle_payment_link_result(result)
+
+def payment_link_payload(booking_ref):
+    return {
         "bookingRef": booking_ref,
         "action": "quote",
         "postPaymentUrl": "https://wasteking.co.uk/thank-you/"
     }
-    result = wasteking_request("api/booking/update", payload)
-    
+
+def handle_payment_link_result(result):
     if result.get('success'):
         # Check for payment link in response
         payment_link = None
@@ -158,35 +316,70 @@ def create_payment_link(booking_ref):
         print(f"❌ Payment link creation failed: {result}")
         return result
 
-def complete_booking(customer_data):
-    """Complete 4-step booking process - NO HARDCODING"""
-    print("🚀 STARTING COMPLETE BOOKING PROCESS - NO HARDCODED VALUES...")
-    
-    # Validate required data - NO DEFAULTS
+def _missing_required_field(customer_data):
+    """Validate required data - NO DEFAULTS"""
     required_fields = ['firstName', 'phone', 'postcode', 'service']
     for field in required_fields:
         if not customer_data.get(field):
             return {"success": False, "error": f"Missing required field: {field}"}
+    return None
+
+def complete_booking(customer_data):
+    """Complete 4-step booking process - NO HARDCODING"""
+    print("🚀 STARTING COMPLETE BOOKING PROCESS - NO HARDCODED VALUES...")
+    
+    missing = _missing_required_field(customer_data)
+    if missing:
+        return missing
     
     # Step 1: Create booking
-    booking_result = create_booking()
+    booking_result = acquire_booking()
     if not booking_result.get('success'):
         return booking_result
     
     booking_ref = booking_result['booking_ref']
     
     # Step 2: Get pricing - REAL API PRICES ONLY
+    # Bypass the price cache: the search must be bound to this booking ref
     pricing_result = get_pricing(
         booking_ref, 
         customer_data['postcode'], 
         customer_data['service'],
-        customer_data.get('type')  # Include type if provided
+        customer_data.get('type'),  # Include type if provided
+        use_cache=False
     )
     if not pricing_result.get('success'):
         return pricing_result
     
-    price = pricing_result['price']
+    return _finish_booking(customer_data, booking_ref, pricing_result['price'])
+
+def resume_booking(customer_data, booking_ref, price, search_bound=True):
+    """Continue an already-priced booking from its existing booking ref - steps 3-4 only"""
+    print(f"⏩ RESUMING BOOKING {booking_ref} at {price}...")
+    
+    missing = _missing_required_field(customer_data)
+    if missing:
+        return missing
+    if not booking_ref or not price:
+        return {"success": False, "error": "Missing booking ref or price to resume"}
     
+    # A cached quote never reached this booking ref - bind the search before paying
+    if not search_bound:
+        pricing_result = get_pricing(
+            booking_ref,
+            customer_data['postcode'],
+            customer_data['service'],
+            customer_data.get('type'),
+            use_cache=False
+        )
+        if not pricing_result.get('success'):
+            return pricing_result
+        price = pricing_result['price']
+    
+    return _finish_booking(customer_data, booking_ref, price)
+
+def _finish_booking(customer_data, booking_ref, price):
+    """Steps 3-5: details, payment link and SMS for a priced booking ref"""
     # Step 3: Update details
     details_result = update_booking_details(booking_ref, customer_data)
     if not details_result.get('success'):
@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from utils.http_session import POOL_MAXSIZE, get_timeout
+from utils.wasteking_api import (
+    BASE_URL, booking_pool, request_headers, parse_response,
+    CREATE_BOOKING_PAYLOAD, handle_create_booking_result,
+    cached_pricing, pricing_payload, handle_pricing_result, pricing_flight, price_key,
+    details_payload, handle_details_result,
+    payment_link_payload, handle_payment_link_result,
+    _missing_required_field, send_sms, circuit_open_result
+)
+from utils.circuit_breaker import circuit_breaker
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+    print("WARNING: aiohttp not installed - async WasteKing client unavailable")
+
+# Async client configuration - NO HARDCODING
+ASYNC_MAX_IN_FLIGHT = int(os.getenv('WASTEKING_ASYNC_MAX_IN_FLIGHT', '500'))
+ASYNC_POOL_SIZE = int(os.getenv('WASTEKING_ASYNC_POOL_SIZE', str(max(POOL_MAXSIZE, 100))))
+ASYNC_KEEPALIVE = float(os.getenv('WASTEKING_ASYNC_KEEPALIVE', '30'))
+# Agent turns run on the worker's event loop; false keeps every turn on the blocking client
+ASYNC_TURNS_ENABLED = os.getenv('WASTEKING_ASYNC_TURNS', 'true').lower() == 'true'
+# Threads for the blocking parts of a turn (state store, webhooks, SMS, fallbacks) - at least gunicorn --threads
+ASYNC_BLOCKING_THREADS = int(os.getenv('WASTEKING_ASYNC_BLOCKING_THREADS', '32'))
+# A turn still running after this long is cancelled and the request fails
+ASYNC_TURN_TIMEOUT = float(os.getenv('WASTEKING_ASYNC_TURN_TIMEOUT', '90'))
+
+
+class AsyncWasteKingClient:
+    """Asyncio WasteKing client - same steps and results as utils.wasteking_api"""
+
+    def __init__(self, base_url=BASE_URL, max_in_flight=ASYNC_MAX_IN_FLIGHT, pool_size=ASYNC_POOL_SIZE):
+        self.base_url = base_url
+        self.max_in_flight = max_in_flight
+        self.pool_size = pool_size
+        self._session = None
+        self._loop = None
+        self._semaphore = None
+
+    def _get_session(self):
+        # aiohttp sessions are bound to the loop that created them
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=ASYNC_KEEPALIVE)
+            self._session = aiohttp.ClientSession(connector=connector, headers=request_headers())
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+    async def request(self, endpoint, payload, method="POST"):
+        """Async WasteKing API request - same result shape as wasteking_request"""
+        ticket = circuit_breaker.allow(endpoint)
+        if not ticket:
+            return circuit_open_result(endpoint)
+
+        started = time.monotonic()
+        try:
+            url = f"{self.base_url}/{endpoint}"
+            print(f"🌐 ASYNC API REQUEST: {method} {url}")
+            print(f"📦 PAYLOAD: {json.dumps(payload)}")
+
+            session = self._get_session()
+            connect_timeout, read_timeout = circuit_breaker.timeout(endpoint, get_timeout(endpoint), ticket)
+            timeout = aiohttp.ClientTimeout(total=read_timeout, connect=connect_timeout)
+            async with self._semaphore:
+                if method == "POST":
+                    request = session.post(url, json=payload, timeout=timeout)
+                else:
+                    request = session.get(url, params=payload, timeout=timeout)
+                async with request as response:
+                    text = await response.text()
+            circuit_breaker.record(endpoint, response.status < 500, time.monotonic() - started, ticket)
+            return parse_response(response.status, text)
+
+        except Exception as e:
+            circuit_breaker.record(endpoint, False, time.monotonic() - started, ticket)
+            print(f"❌ ASYNC API ERROR: {str(e) or type(e).__name__}")
+            return {"success": False, "error": str(e) or type(e).__name__}
+        except BaseException:
+            # Cancelled (turn timeout, client gone) - a half-open probe must still hand its slot back
+            circuit_breaker.release(endpoint, ticket)
+            raise
+
+    async def create_booking(self):
+        """Step 1: Create booking reference"""
+        print("📋 STEP 1 (async): Creating booking...")
+        result = await self.request("api/booking/create", CREATE_BOOKING_PAYLOAD)
+        return handle_create_booking_result(result)
+
+    async def acquire_booking(self):
+        """Step 1 (fast path): pooled booking ref, else create one"""
+        booking_ref = booking_pool.acquire()
+        if booking_ref:
+            print(f"⚡ BOOKING REF FROM POOL: {booking_ref}")
+            return {"success": True, "booking_ref": booking_ref}
+        return await self.create_booking()
+
+    async def get_pricing(self, booking_ref, postcode, service, skip_type=None, *, use_cache=True):
+        """Step 2: Get pricing with booking ref - REAL API PRICES ONLY"""
+        print(f"💰 STEP 2 (async): Getting REAL price for {service} {skip_type or 'default'} at {postcode}...")
+        if not use_cache:
+            payload = pricing_payload(booking_ref, postcode, service, skip_type)
+            result = await self.request("api/booking/update", payload)
+            return handle_pricing_result(result, postcode, service, skip_type)
+
+        cached = cached_pricing(postcode, service, skip_type)
+        if cached is not None:
+            return cached
+
+        # Identical lookups already in flight share one upstream call
+        result, shared = await pricing_flight.do_async(
+            price_key(postcode, service, skip_type),
+            lambda: self.request("api/booking/update", pricing_payload(booking_ref, postcode, service, skip_type))
+        )
+        return handle_pricing_result(result, postcode, service, skip_type, shared)
+
+    async def fetch_quote(self, postcode, service, skip_type=None):
+        """Steps 1-2 together: booking ref plus price, as an agent pricing turn needs them"""
+        booking_result = await self.acquire_booking()
+        if not booking_result.get('success'):
+            return {'booking': booking_result, 'pricing': None}
+        pricing_result = await self.get_pricing(booking_result['booking_ref'], postcode, service, skip_type)
+        return {'booking': booking_result, 'pricing': pricing_result}
+
+    async def fetch_comparison_quote(self, postcode, skip_type=None, mav_type=None):
+        """Skip and man & van quotes for one postcode, fetched concurrently"""
+        skip_quote, mav_quote = await asyncio.gather(
+            self.fetch_quote(postcode, 'skip', skip_type),
+            self.fetch_quote(postcode, 'mav', mav_type or skip_type)
+        )
+        return {'skip': skip_quote, 'mav': mav_quote}
+
+    async def update_booking_details(self, booking_ref, customer_data):
+        """Step 3: Update booking with customer details"""
+        print("📝 STEP 3 (async): Updating customer details...")
+        result = await self.request("api/booking/update", details_payload(booking_ref, customer_data))
+        return handle_details_result(result)
+
+    async def create_payment_link(self, booking_ref):
+        """Step 4: Create payment link"""
+        print("💳 STEP 4 (async): Creating payment link...")
+        result = await self.request("api/booking/update", payment_link_payload(booking_ref))
+        return handle_payment_link_result(result)
+
+    async def complete_booking(self, customer_data):
+        """Complete 4-step booking process"""
+        print("🚀 STARTING ASYNC COMPLETE BOOKING PROCESS...")
+        missing = _missing_required_field(customer_data)
+        if missing:
+            return missing
+
+        booking_result = await self.acquire_booking()
+        if not booking_result.get('success'):
+            return booking_result
+        booking_ref = booking_result['booking_ref']
+
+        # Bypass the price cache: the search must be bound to this booking ref
+        pricing_result = await self.get_pricing(
+            booking_ref, customer_data['postcode'], customer_data['service'],
+            customer_data.get('type'), use_cache=False
+        )
+        if not pricing_result.get('success'):
+            return pricing_result
+
+        return await self._finish_booking(customer_data, booking_ref, pricing_result['price'])
+
+    async def resume_booking(self, customer_data, booking_ref, price, search_bound=True):
+        """Continue an already-priced booking from its existing booking ref - steps 3-4 only"""
+        print(f"⏩ RESUMING BOOKING {booking_ref} at {price} (async)...")
+        missing = _missing_required_field(customer_data)
+        if missing:
+            return missing
+        if not booking_ref or not price:
+            return {"success": False, "error": "Missing booking ref or price to resume"}
+
+        if not search_bound:
+            pricing_result = await self.get_pricing(
+                booking_ref, customer_data['postcode'], customer_data['service'],
+                customer_data.get('type'), use_cache=False
+            )
+            if not pricing_result.get('success'):
+                return pricing_result
+            price = pricing_result['price']
+
+        return await self._finish_booking(customer_data, booking_ref, price)
+
+    async def _finish_booking(self, customer_data, booking_ref, price):
+        details_result = await self.update_booking_details(booking_ref, customer_data)
+        if not details_result.get('success'):
+            return details_result
+
+        payment_result = await self.create_payment_link(booking_ref)
+        if not payment_result.get('success'):
+            return payment_result
+        payment_link = payment_result['payment_link']
+
+        # Twilio is blocking - keep it off the event loop
+        sms_sent = False
+        if customer_data.get('phone') and payment_link:
+            sms_sent = await asyncio.to_thread(send_sms, customer_data, booking_ref, price, payment_link)
+
+        return {
+            "success": True,
+            "booking_ref": booking_ref,
+            "price": price,
+            "payment_link": payment_link,
+            "sms_sent": sms_sent
+        }
+
+
+async_client = AsyncWasteKingClient() if AIOHTTP_AVAILABLE else None
+
+
+class WorkerLoop:
+    """This worker's event loop on a daemon thread - sync Flask views hand it coroutines and wait for the result"""
+
+    def __init__(self, blocking_threads=ASYNC_BLOCKING_THREADS):
+        self.blocking_threads = blocking_threads
+        self._loop = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork_in_child)
+
+    def _get_loop(self):
+        pid = os.getpid()
+        if self._loop is not None and self._pid == pid:
+            return self._loop
+        with self._lock:
+            if self._loop is None or self._pid != pid:
+                loop = asyncio.new_event_loop()
+                # asyncio.to_thread uses this pool - the default is sized by CPU count, far too small here
+                loop.set_default_executor(ThreadPoolExecutor(self.blocking_threads, thread_name_prefix='wasteking-blocking'))
+                threading.Thread(target=loop.run_forever, name='wasteking-event-loop', daemon=True).start()
+                self._loop, self._pid = loop, pid
+                print(f"🔁 WORKER EVENT LOOP STARTED (pid={pid}, blocking threads={self.blocking_threads})")
+        return self._loop
+
+    def run(self, coro, timeout=ASYNC_TURN_TIMEOUT):
+        """Run a coroutine on the worker loop from any thread and return its result"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._get_loop())
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise
+
+    def _after_fork_in_child(self):
+        # The loop thread doesn't survive fork - the child starts its own on first use
+        self._loop = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+
+worker_loop = WorkerLoop() if AIOHTTP_AVAILABLE else None